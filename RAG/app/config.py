@@ -23,4 +23,20 @@ os.makedirs(DB_DIR, exist_ok=True)
 
 client = chromadb.PersistentClient(path=DB_DIR)
 
+# Chunking
+# Strategy: "sentences" (default), "recursive", "tokens" or "words" (see app/utils/chunker.py)
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "sentences")
+# Token budget per chunk (words per chunk for the "words" strategy)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "512"))
+# Tokens repeated from the end of one chunk at the start of the next
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "64"))
+
+# Parallel ingestion (ingest_all.py)
+# Processes extracting PDF text; defaults to one per CPU core
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+# Pages per extraction task, so the pages of one large PDF are spread over the workers
+EXTRACT_PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", "25"))
+# Extracted page ranges waiting for the embedding stage; extraction pauses when the queue is full
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+
 print(f"ChromaDB initialized at {DB_DIR}")
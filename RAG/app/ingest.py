@@ -1,50 +1,122 @@
-import uuid
-from app.utils.pdf_loader import extract_pdf_text
-from app.utils.chunker import chunk_text
-from app.utils.embeddings import embed_text
-from app.utils.vectorstore import add_to_vectorstore
+import os
+from collections import Counter, deque
+from itertools import islice
+from app.config import CHUNK_OVERLAP, CHUNK_STRATEGY, CHUNK_TOKENS
+from app.utils.pdf_loader import iter_pdf_pages
+from app.utils.chunker import chunk_pages
+from app.utils.embeddings import EMBED_BATCH_SIZE, embed_batches
+from app.utils.manifest import chunk_id, content_hash
+from app.utils.vectorstore import add_to_vectorstore, existing_ids, delete_source, update_metadata
 
-def ingest_pdf(file_path: str):
+def _batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def empty_result() -> dict:
+    return {"pages": 0, "chunks": 0, "embedded": 0, "skipped": 0, "removed": 0, "failed": 0, "chunk_hashes": []}
+
+def ingest_document(file_path: str, source: str = None) -> dict:
     """
     Orchestrates the PDF ingestion process:
-    1. Extract text
-    2. Chunk text
-    3. Embed chunks
-    4. Store in VectorDB
+    1. Read the PDF page by page
+    2-5. Chunk, embed and store the pages as they are read (see ingest_pages)
     """
+    source = source or os.path.basename(file_path)
     print(f"Starting ingestion for: {file_path}")
-    
-    # 1. Extract
-    text = extract_pdf_text(file_path)
-    if not text:
-        print("No text extracted.")
-        return 0
-        
-    # 2. Chunk
-    chunks = chunk_text(text)
-    print(f"Created {len(chunks)} chunks.")
-    if not chunks:
-        return 0
-        
-    embeddings = []
-    ids = []
-    
-    # 3. Embed
-    # Note: For production, batch embedding is better. 
-    # Here we do one by one or we could pass a list if the embed function supports it.
-    # Our embed_text currently does one string. We'll loop.
-    for i, chunk in enumerate(chunks):
+    return ingest_pages(iter_pdf_pages(file_path), source)
+
+def ingest_pages(pages, source: str) -> dict:
+    """
+    Stores a document given as a stream of (page_number, text) pages:
+    2. Chunk the pages as they arrive, deriving each chunk's id from its content
+    3. Embed the chunks not stored yet, in batches
+    4. Store each batch in VectorDB, with the chunk's page and offset as metadata
+    5. Delete chunks of this document that no longer exist
+
+    Every stage is streamed: a batch is written to ChromaDB as soon as it is
+    embedded, while the next pages are still being read and chunked, so memory is
+    bounded by a few batches of chunks rather than by the size of the document.
+
+    Returns counts: pages, chunks, embedded, skipped (already stored), removed,
+    failed, plus the content hash of every chunk.
+    """
+    result = empty_result()
+    hashes = result["chunk_hashes"]
+    seen = Counter()
+    kept_ids = set()
+    # Chunks handed to the embedder, waiting for their embeddings
+    waiting = deque()
+
+    def counted(pages):
+        for page in pages:
+            result["pages"] += 1
+            yield page
+
+    def to_embed():
+        chunks = chunk_pages(counted(pages), CHUNK_STRATEGY, CHUNK_TOKENS, CHUNK_OVERLAP)
+        for group in _batched(chunks, EMBED_BATCH_SIZE):
+            ids, metadatas = [], []
+            for chunk in group:
+                h = content_hash(chunk["text"])
+                ids.append(chunk_id(source, h, seen[h]))
+                seen[h] += 1
+                hashes.append(h)
+                metadatas.append({
+                    "source": source,
+                    "content_hash": h,
+                    "page": chunk["page"],
+                    "end_page": chunk["end_page"],
+                    "offset": chunk["offset"]
+                })
+                if "tokens" in chunk:
+                    metadatas[-1]["tokens"] = chunk["tokens"]
+            kept_ids.update(ids)
+
+            # Unchanged chunks are already stored under the same id; only their position may have moved
+            stored = existing_ids(ids)
+            update_metadata([i for i in ids if i in stored], [m for i, m in zip(ids, metadatas) if i in stored])
+            result["skipped"] += len(stored)
+
+            for chunk, i, metadata in zip(group, ids, metadatas):
+                if i not in stored:
+                    waiting.append((i, metadata))
+                    yield chunk["text"]
+
+    # 2. Chunk + 3. Embed + 4. Store, batch by batch
+    for batch_number, (batch, future) in enumerate(embed_batches(to_embed())):
+        batch_items = [waiting.popleft() for _ in batch]
         try:
-            emb = embed_text(chunk)
-            embeddings.append(emb)
-            ids.append(str(uuid.uuid4()))
+            embeddings = future.result()
         except Exception as e:
-            print(f"Failed to embed chunk {i}: {e}")
-            
-    # 4. Store
-    if embeddings:
-        add_to_vectorstore(documents=chunks, embeddings=embeddings, ids=ids)
-        print(f"Stored {len(embeddings)} chunks in ChromaDB.")
-        return len(embeddings)
-    
-    return 0
+            print(f"Failed to embed batch {batch_number} ({len(batch)} chunks): {e}")
+            result["failed"] += len(batch)
+            continue
+        add_to_vectorstore(
+            documents=batch,
+            embeddings=embeddings,
+            ids=[i for i, _ in batch_items],
+            metadatas=[metadata for _, metadata in batch_items]
+        )
+        result["embedded"] += len(batch)
+
+    result["chunks"] = len(hashes)
+    print(f"Created {result['chunks']} chunks from {result['pages']} pages.")
+    if not hashes:
+        print("No text extracted.")
+        return result
+
+    # 5. Remove chunks that were edited out of the document
+    result["removed"] = delete_source(source, keep_ids=kept_ids)
+
+    print(f"Stored {result['embedded']} new chunks in ChromaDB "
+          f"({result['skipped']} unchanged, {result['removed']} removed).")
+    return result
+
+def ingest_pdf(file_path: str):
+    """
+    Ingest a PDF and return the number of chunks it now has in the VectorDB.
+    Re-ingesting an unchanged PDF embeds nothing.
+    """
+    result = ingest_document(file_path)
+    return result["chunks"] - result["failed"]
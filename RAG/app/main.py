@@ -5,6 +5,7 @@ import uvicorn
 
 from app.ingest import ingest_pdf
 from app.rag import rag_query
+from app.utils.embeddings import query_cache
 
 app = FastAPI(title="Gemini RAG System")
 
@@ -41,5 +42,12 @@ async def ask_endpoint(payload: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/cache/stats")
+async def cache_stats_endpoint():
+    """
+    Query embedding cache hit/miss statistics for this process.
+    """
+    return query_cache.stats()
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,3 +1,304 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # Optional: token counts fall back to a regex approximation
+    tiktoken = None
+
+WORD = re.compile(r"\S+")
+LINE = re.compile(r"[^\n]+")
+BLANK_LINE = re.compile(r"\n[ \t]*\n")
+# A sentence runs up to ., ! or ? (plus closing quotes/brackets) followed by whitespace
+SENTENCE = re.compile(r"\S.*?(?:[.!?][\"')\]]*(?=\s)|\Z)", re.S)
+# Numbered or named section titles: "2.1 Scope", "IV. Results", "Chapter 3", "Appendix A"
+NUMBERED_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*\.?|[IVXLC]+\.|(?:chapter|section|part|appendix)\b)\s*\S", re.I)
+TITLE_SMALL_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with", "&"}
+# Separators of the recursive splitter, coarsest first: paragraphs, lines, sentences, words
+SEPARATORS = (BLANK_LINE, re.compile(r"\n"), re.compile(r"(?<=[.!?])\s+"), re.compile(r"\s+"))
+
+CHUNK_STRATEGIES = ("words", "tokens", "sentences", "recursive")
+DEFAULT_CHUNK_TOKENS = 512
+DEFAULT_CHUNK_OVERLAP = 64
+# Bumped when the chunk boundaries of a strategy change, so ingested PDFs are re-chunked
+CHUNKER_VERSION = 2
+
+# Local tokenizer for chunk budgets. Gemini's own tokenizer is only reachable through
+# the API, so budgets are approximate: tiktoken's cl100k_base if installed, otherwise
+# one token per punctuation mark and per 4 characters of a word.
+_encoding = None
+if tiktoken is not None:
+    try:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:  # The encoding could not be loaded (e.g. offline)
+        _encoding = None
+TOKENIZER = "tiktoken:cl100k_base" if _encoding is not None else "regex"
+TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+# A piece of a page that chunks are packed from
+Unit = namedtuple("Unit", "text tokens page offset heading paragraph")
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate token count of text with the local tokenizer.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode_ordinary(text))
+    return len(TOKEN_PATTERN.findall(text))
+
+@lru_cache(maxsize=65536)
+def _word_tokens(word: str) -> int:
+    return count_tokens(word)
+
+def is_heading(line: str, before_blank: bool = False) -> bool:
+    """
+    Whether a line looks like a section title: short, no closing punctuation, and
+    numbered, markdown or ALL CAPS, or Title Case followed by a blank line (short
+    Title Case lines like "John Smith" or "Kolkata, India" are common in résumés).
+    """
+    line = line.strip()
+    if not line or len(line) > 80 or line.endswith((".", ",", ";", "!", "?")):
+        return False
+    if line.startswith("#"):
+        return True
+    words = line.split()
+    if len(words) > 8:
+        return False
+    if NUMBERED_HEADING.match(line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) > 1 and all(c.isupper() for c in letters):
+        return True
+    return before_blank and len(words) <= 6 and all(
+        w[0].isupper() or not w[0].isalpha() or w.lower() in TITLE_SMALL_WORDS for w in words)
+
+def stream_chunks(pages, chunk_size: int = 500):
+    """
+    Splits a stream of (page_number, text) pages into chunks of `chunk_size` words,
+    yielding each chunk as soon as it is complete.
+
+    Each chunk is a dict with its text, the page it starts on, the character offset of
+    its first word within that page's text, and the page it ends on. Only the words of
+    the chunk being built are held, never the whole document.
+    """
+    words = []
+    start_page = start_offset = end_page = None
+
+    for page_number, text in pages:
+        for match in WORD.finditer(text or ""):
+            if not words:
+                start_page, start_offset = page_number, match.start()
+            words.append(match.group())
+            end_page = page_number
+
+            if len(words) >= chunk_size:
+                yield {"text": " ".join(words), "page": start_page, "offset": start_offset, "end_page": end_page}
+                words = []
+
+    # Add remaining words
+    if words:
+        yield {"text": " ".join(words), "page": start_page, "offset": start_offset, "end_page": end_page}
+
+def _split_word(word: str, max_tokens: int):
+    """
+    Splits a word longer than max_tokens (a URL, base64, a table row without spaces)
+    into pieces of at most max_tokens. Yields (offset in word, piece, tokens).
+    """
+    start = 0
+    while start < len(word):
+        # No tokenizer packs more than 4 characters per token of such text; shrink until it fits
+        end = min(len(word), start + max_tokens * 4)
+        while end - start > 1 and count_tokens(word[start:end]) > max_tokens:
+            end = start + max((end - start) * 3 // 4, 1)
+        yield start, word[start:end], count_tokens(word[start:end])
+        start = end
+
+def _word_units(text: str, start: int, end: int, page: int, max_tokens: int, paragraph: bool = False):
+    """
+    Units of at most max_tokens made of whole words of text[start:end]; a word that
+    alone exceeds max_tokens is split into pieces.
+    """
+    words, tokens, offset = [], 0, None
+    for match in WORD.finditer(text, start, end):
+        word_tokens = _word_tokens(match.group())
+        if word_tokens > max_tokens:
+            if words:
+                yield Unit(" ".join(words), tokens, page, offset, False, paragraph)
+                words, tokens, paragraph = [], 0, False
+            for piece_offset, piece, piece_tokens in _split_word(match.group(), max_tokens):
+                yield Unit(piece, piece_tokens, page, match.start() + piece_offset, False, paragraph)
+                paragraph = False
+            continue
+        if words and tokens + word_tokens > max_tokens:
+            yield Unit(" ".join(words), tokens, page, offset, False, paragraph)
+            words, tokens, paragraph = [], 0, False
+        if not words:
+            offset = match.start()
+        words.append(match.group())
+        tokens += word_tokens
+    if words:
+        yield Unit(" ".join(words), tokens, page, offset, False, paragraph)
+
+def _span_unit(text: str, start: int, end: int, page: int, max_tokens: int, paragraph: bool = False, heading: bool = False):
+    """
+    One unit for text[start:end], or word-sized pieces of it if it exceeds max_tokens.
+    """
+    content = " ".join(text[start:end].split())
+    tokens = count_tokens(content)
+    if tokens <= max_tokens:
+        yield Unit(content, tokens, page, start, heading, paragraph)
+    else:
+        yield from _word_units(text, start, end, page, max_tokens, paragraph)
+
+def _token_units(pages, max_tokens: int):
+    # Every word is a unit, so chunks fill the token budget up to the last word that fits
+    for page_number, text in pages:
+        for match in WORD.finditer(text or ""):
+            word_tokens = _word_tokens(match.group())
+            if word_tokens <= max_tokens:
+                yield Unit(match.group(), word_tokens, page_number, match.start(), False, False)
+                continue
+            for piece_offset, piece, piece_tokens in _split_word(match.group(), max_tokens):
+                yield Unit(piece, piece_tokens, page_number, match.start() + piece_offset, False, False)
+
+def _sentence_units(pages, max_tokens: int):
+    # Headings on their own, and the sentences of the paragraphs between them
+    for page_number, text in pages:
+        text = text or ""
+        block_start = block_end = None
+        block_paragraph = next_paragraph = False
+
+        def sentences():
+            paragraph = block_paragraph
+            for match in SENTENCE.finditer(text, block_start, block_end):
+                yield from _span_unit(text, match.start(), match.end(), page_number, max_tokens, paragraph=paragraph)
+                paragraph = False
+
+        for line in LINE.finditer(text):
+            if not line.group().strip():
+                continue
+            if is_heading(line.group(), BLANK_LINE.match(text, line.end()) is not None):
+                if block_start is not None:
+                    yield from sentences()
+                    block_start = None
+                yield from _span_unit(text, line.start(), line.end(), page_number, max_tokens, paragraph=True, heading=True)
+                next_paragraph = True
+                continue
+            if block_start is not None and BLANK_LINE.search(text, block_end, line.start()):
+                # A blank line ends the paragraph
+                yield from sentences()
+                block_start = None
+                next_paragraph = True
+            if block_start is None:
+                block_start, block_paragraph, next_paragraph = line.start(), next_paragraph, False
+            block_end = line.end()
+
+        if block_start is not None:
+            yield from sentences()
+
+def _recursive_spans(text: str, start: int, end: int, level: int, max_tokens: int):
+    """
+    Splits text[start:end] at the coarsest separator that yields pieces within
+    max_tokens, recursing into pieces that are still too large.
+    Yields (start, end, level) spans.
+    """
+    if level == len(SEPARATORS) or count_tokens(text[start:end]) <= max_tokens:
+        yield start, end, level
+        return
+    pos = start
+    for match in SEPARATORS[level].finditer(text, start, end):
+        if text[pos:match.start()].strip():
+            yield from _recursive_spans(text, pos, match.start(), level + 1, max_tokens)
+        pos = match.end()
+    if text[pos:end].strip():
+        yield from _recursive_spans(text, pos, end, level + 1, max_tokens)
+
+def _recursive_units(pages, max_tokens: int):
+    for page_number, text in pages:
+        text = text or ""
+        previous_end = 0
+        for start, end, _ in _recursive_spans(text, 0, len(text), 0, max_tokens):
+            # Skip leading whitespace so offsets point at the first character
+            start += len(text[start:end]) - len(text[start:end].lstrip())
+            paragraph = BLANK_LINE.search(text, previous_end, start) is not None
+            yield from _span_unit(text, start, end, page_number, max_tokens, paragraph=paragraph)
+            previous_end = end
+
+def _pack(units, max_tokens: int, overlap: int, headings: bool):
+    """
+    Packs units into chunks of at most max_tokens. A chunk that is full carries its
+    last units, up to `overlap` tokens, over into the next one; with `headings`, a
+    heading always starts a new chunk (without overlap).
+    """
+    current, tokens = [], 0
+    for unit in units:
+        starts_section = headings and unit.heading and not all(u.heading for u in current)
+        if current and (starts_section or tokens + unit.tokens > max_tokens):
+            yield _make_chunk(current)
+            if starts_section:
+                current, tokens = [], 0
+            else:
+                # Keep the tail that fits in the overlap and leaves room for the new unit
+                tail, tail_tokens = [], 0
+                for previous in reversed(current):
+                    if tail_tokens + previous.tokens > min(overlap, max_tokens - unit.tokens):
+                        break
+                    tail.insert(0, previous)
+                    tail_tokens += previous.tokens
+                current, tokens = tail, tail_tokens
+        current.append(unit)
+        tokens += unit.tokens
+    if current:
+        yield _make_chunk(current)
+
+def _make_chunk(units: list) -> dict:
+    parts = [units[0].text]
+    for previous, unit in zip(units, units[1:]):
+        parts.append("\n" if unit.paragraph or unit.heading or previous.heading else " ")
+        parts.append(unit.text)
+    return {
+        "text": "".join(parts),
+        "page": units[0].page,
+        "offset": units[0].offset,
+        "end_page": units[-1].page,
+        "tokens": sum(unit.tokens for unit in units)
+    }
+
+def chunk_pages(pages, strategy: str = "sentences", max_tokens: int = DEFAULT_CHUNK_TOKENS, overlap: int = DEFAULT_CHUNK_OVERLAP):
+    """
+    Splits a stream of (page_number, text) pages into chunks, yielding each chunk as
+    soon as it is complete. Chunks are dicts like those of stream_chunks, plus their
+    token count.
+
+    Strategies:
+    - "words": fixed windows of max_tokens words, no overlap (the original chunker)
+    - "tokens": windows of max_tokens tokens overlapping by `overlap` tokens
+    - "sentences": whole sentences packed up to max_tokens, overlapping by whole
+      sentences; a heading always starts a new chunk
+    - "recursive": text split at paragraphs, then lines, sentences and words until the
+      pieces fit, and the pieces packed up to max_tokens with overlap
+    """
+    if strategy == "words":
+        return stream_chunks(pages, max_tokens)
+    if overlap >= max_tokens:
+        raise ValueError(f"Chunk overlap ({overlap}) must be smaller than the chunk size ({max_tokens})")
+    if strategy == "tokens":
+        return _pack(_token_units(pages, max_tokens), max_tokens, overlap, headings=False)
+    if strategy == "sentences":
+        return _pack(_sentence_units(pages, max_tokens), max_tokens, overlap, headings=True)
+    if strategy == "recursive":
+        return _pack(_recursive_units(pages, max_tokens), max_tokens, overlap, headings=False)
+    raise ValueError(f"Unknown chunk strategy: {strategy} (expected one of {', '.join(CHUNK_STRATEGIES)})")
+
+def chunker_signature(strategy: str, max_tokens: int, overlap: int) -> str:
+    """
+    Identifies chunking settings; chunks made with different settings are not comparable.
+    """
+    if strategy == "words":
+        return f"words:{max_tokens}"
+    return f"{strategy}:{max_tokens}:{overlap}:{TOKENIZER}:v{CHUNKER_VERSION}"
+
 def chunk_text(text: str, chunk_size: int = 500) -> list[str]:
     """
     Splits text into chunks of approximately `chunk_size` words.
@@ -5,23 +306,4 @@ def chunk_text(text: str, chunk_size: int = 500) -> list[str]:
     """
     if not text:
         return []
-        
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_count = 0
-    
-    for word in words:
-        current_chunk.append(word)
-        current_count += 1
-        
-        if current_count >= chunk_size:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = []
-            current_count = 0
-            
-    # Add remaining words
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-        
-    return chunks
+    return [chunk["text"] for chunk in stream_chunks([(1, text)], chunk_size)]
@@ -1,36 +1,303 @@
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
 import time
+import unicodedata
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Settings below come from the environment, which may not be loaded yet when this is imported
+load_dotenv()
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+# Batching settings (read here rather than in app.config, since this module is also
+# loaded on its own by the Bikram.AI agent)
+# Gemini accepts at most 100 texts per batch embedding request
+EMBED_BATCH_SIZE = min(int(os.getenv("EMBED_BATCH_SIZE", "100")), 100)
+# Batches embedded at the same time
+EMBED_CONCURRENCY = max(int(os.getenv("EMBED_CONCURRENCY", "4")), 1)
+# Retries of a rate-limited request, with exponential backoff starting at EMBED_RETRY_DELAY seconds
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_RETRY_DELAY = float(os.getenv("EMBED_RETRY_DELAY", "1"))
+EMBED_MAX_RETRY_DELAY = 60
+
+# Query embedding cache: entries kept in memory (0 disables the cache), and an optional
+# SQLite file that keeps embeddings across restarts and is shared by worker processes
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")
+EMBED_CACHE_MAX_ROWS = int(os.getenv("EMBED_CACHE_MAX_ROWS", "100000"))
+# The SQLite file is trimmed back to EMBED_CACHE_MAX_ROWS every this many writes
+EMBED_CACHE_PRUNE_EVERY = 100
+
+# Errors worth retrying: rate limits (429) and a temporarily unavailable service (503)
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+)
+
+def _embed_content(content, task_type: str):
+    """
+    Calls embed_content, retrying with backoff when rate-limited.
+    """
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            result = genai.embed_content(
+                model=EMBEDDING_MODEL,
+                content=content,
+                task_type=task_type
+            )
+            return result['embedding']
+        except RETRYABLE_ERRORS as e:
+            if attempt == EMBED_MAX_RETRIES:
+                raise
+            # Jitter keeps concurrent batches from retrying in lockstep
+            delay = min(EMBED_RETRY_DELAY * 2 ** attempt, EMBED_MAX_RETRY_DELAY)
+            delay += random.uniform(0, EMBED_RETRY_DELAY)
+            print(f"Embedding request throttled ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def normalize_query(text: str) -> str:
+    """
+    Normalizes a query for the cache key: Unicode NFKC and collapsed whitespace.
+    Case is kept, since the embedding of a query depends on it.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text or "")).strip()
+
+class EmbeddingCache:
+    """
+    Embeddings keyed on model, task type and normalized text: an in-memory LRU in
+    front of an optional SQLite file. Vectors are stored as float32.
+    """
+
+    def __init__(self, max_entries: int = 1024, path: str = None, max_rows: int = 100000):
+        self.max_entries = max_entries
+        self.path = path or None
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._writes = 0
+
+        # Metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, text: str, task_type: str) -> str:
+        return hashlib.sha256(f"{EMBEDDING_MODEL}\0{task_type}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _db(self):
+        # SQLite connections must not cross fork(); each process opens its own
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS query_embeddings_last_used ON query_embeddings (last_used)")
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key: str, vector: array):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str):
+        """
+        Returns the cached embedding, or None.
+        """
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector.tolist()
+
+            if self.path:
+                try:
+                    db = self._db()
+                    row = db.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        db.execute("UPDATE query_embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                        db.commit()
+                        vector = array("f")
+                        vector.frombytes(row[0])
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+                        return vector.tolist()
+                except sqlite3.Error as e:
+                    self.disk_errors += 1
+                    print(f"Embedding cache read failed: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, embedding: list[float]):
+        """
+        Stores an embedding in memory and, if configured, in the SQLite file.
+        """
+        vector = array("f", embedding)
+        with self._lock:
+            self._remember(key, vector)
+            if not self.path:
+                return
+            try:
+                db = self._db()
+                db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    (key, vector.tobytes(), time.time())
+                )
+                self._writes += 1
+                if self._writes % EMBED_CACHE_PRUNE_EVERY == 0:
+                    # Drop the least recently used rows beyond max_rows
+                    db.execute(
+                        "DELETE FROM query_embeddings WHERE key IN "
+                        "(SELECT key FROM query_embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (self.max_rows,)
+                    )
+                db.commit()
+            except sqlite3.Error as e:
+                self.disk_errors += 1
+                print(f"Embedding cache write failed: {e}")
+
+    def clear(self):
+        """
+        Removes every cached embedding, in memory and on disk.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                db = self._db()
+                db.execute("DELETE FROM query_embeddings")
+                db.commit()
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters and sizes for this process.
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        disk_entries = None
+        if self.path:
+            try:
+                with self._lock:
+                    disk_entries = self._db().execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            except sqlite3.Error:
+                pass
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "path": self.path,
+            "disk_entries": disk_entries,
+            "max_rows": self.max_rows if self.path else None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "disk_errors": self.disk_errors
+        }
+
+query_cache = EmbeddingCache(EMBED_CACHE_SIZE, EMBED_CACHE_PATH, EMBED_CACHE_MAX_ROWS)
 
 def embed_text(text: str) -> list[float]:
     """
     Embeds text using Gemini 'models/text-embedding-004'.
     """
-    # Simple retry logic or error handling could be added here
     try:
         # Task type 'retrieval_document' is good for storing in vector db
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="retrieval_document"
-        )
-        return result['embedding']
+        return _embed_content(text, "retrieval_document")
     except Exception as e:
         print(f"Error embedding text: {e}")
         # Return empty list or raise, decided to re-raise for visibility during ingest
         raise e
 
+def embed_batch(texts: list[str], task_type: str = "retrieval_document") -> list[list[float]]:
+    """
+    Embeds up to EMBED_BATCH_SIZE texts in a single request.
+    Returns one embedding per text, in order.
+    """
+    if not texts:
+        return []
+    return _embed_content(list(texts), task_type)
+
+def _batched(texts, batch_size: int):
+    batch = []
+    for text in texts:
+        batch.append(text)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def embed_batches(texts, task_type: str = "retrieval_document", batch_size: int = None, concurrency: int = None):
+    """
+    Embeds an iterable of texts batch by batch, several batches at a time.
+
+    Yields (batch, future) pairs in input order, where future.result() is the list of
+    embeddings of the batch (or raises the error that failed it). At most `concurrency`
+    batches are in flight, so texts are pulled from the iterable only as fast as they
+    are embedded and the caller can store one batch while the next ones are embedding.
+    """
+    batch_size = min(batch_size or EMBED_BATCH_SIZE, 100)
+    concurrency = max(concurrency or EMBED_CONCURRENCY, 1)
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed") as executor:
+        for batch in _batched(texts, batch_size):
+            pending.append((batch, executor.submit(embed_batch, batch, task_type)))
+            if len(pending) >= concurrency:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+def embed_texts(texts: list[str], task_type: str = "retrieval_document", batch_size: int = None, concurrency: int = None) -> list[list[float]]:
+    """
+    Embeds a list of texts with batched, concurrent requests.
+    Returns one embedding per text, in order.
+    """
+    embeddings = []
+    for _, future in embed_batches(texts, task_type, batch_size, concurrency):
+        embeddings.extend(future.result())
+    return embeddings
+
 def embed_query(text: str) -> list[float]:
     """
     Embeds query using Gemini 'models/text-embedding-004'.
     Task type 'retrieval_query' is appropriate for search queries.
+    Repeated queries are served from query_cache without a request.
     """
+    if query_cache.enabled:
+        key = query_cache.key(text, "retrieval_query")
+        cached = query_cache.get(key)
+        if cached is not None:
+            return cached
     try:
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="retrieval_query"
-        )
-        return result['embedding']
+        embedding = _embed_content(text, "retrieval_query")
     except Exception as e:
         print(f"Error embedding query: {e}")
         raise e
+    if query_cache.enabled:
+        query_cache.put(key, embedding)
+    return embedding
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import Counter
+from app.config import DB_DIR
+
+# Record of what has been ingested: per PDF, the file hash and the content hash of each chunk
+MANIFEST_PATH = os.path.join(DB_DIR, "ingest_manifest.json")
+
+def file_sha256(path: str) -> str:
+    """
+    SHA-256 of a file's bytes, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def content_hash(text: str) -> str:
+    """
+    SHA-256 of a chunk's text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_id(source: str, hash_: str, occurrence: int = 0) -> str:
+    """
+    Deterministic ChromaDB id of a chunk.
+
+    An id depends only on the document name and the chunk's content, so an unchanged
+    chunk keeps its id across runs. A chunk repeated within the document gets an
+    occurrence number so its copies do not collide.
+    """
+    key = f"{source}\0{hash_}\0{occurrence}".encode("utf-8")
+    return hashlib.sha256(key).hexdigest()[:32]
+
+def chunk_ids(source: str, hashes: list[str]) -> list[str]:
+    """
+    Ids of all the chunks of a document, given their content hashes in order.
+    """
+    seen = Counter()
+    ids = []
+    for h in hashes:
+        ids.append(chunk_id(source, h, seen[h]))
+        seen[h] += 1
+    return ids
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    """
+    Load the ingest manifest; empty if there is none yet.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"files": {}}
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    """
+    Write the ingest manifest atomically, so an interrupted run never leaves half a file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+def delete_manifest(path: str = MANIFEST_PATH):
+    """
+    Forget everything ingested (used when the vector store is cleared).
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,3 +1,4 @@
+from collections import deque
 from pypdf import PdfReader
 
 def extract_pdf_text(path: str) -> str:
@@ -6,12 +7,83 @@ def extract_pdf_text(path: str) -> str:
     """
     try:
         reader = PdfReader(path)
-        text = ""
-        for page in reader.pages:
-            content = page.extract_text()
-            if content:
-                text += content + "\n"
-        return text
+        # Collect the pages and join once; growing one string page by page is quadratic
+        pages = [page.extract_text() for page in reader.pages]
+        return "".join(content + "\n" for content in pages if content)
     except Exception as e:
         print(f"Error reading PDF {path}: {e}")
         return ""
+
+def iter_pdf_pages(path: str):
+    """
+    Yields (page_number, text) for each page of a PDF, reading one page at a time.
+    Page numbers start at 1.
+    """
+    reader = PdfReader(path)
+    for index, page in enumerate(reader.pages):
+        yield index + 1, page.extract_text() or ""
+
+def count_pages(path: str) -> int:
+    """
+    Number of pages in a PDF.
+    """
+    return len(PdfReader(path).pages)
+
+def extract_page_range(path: str, start: int, stop: int) -> list[str]:
+    """
+    Extracts the text of pages [start, stop) of a PDF.
+    Runs in worker processes, so each call opens its own reader.
+    """
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def extract_pdfs(paths, executor, pages_per_task: int = 25, window: int = 8):
+    """
+    Extracts many PDFs on a process pool, split into page ranges so the pages of a
+    large PDF are extracted in parallel too.
+
+    Yields (path, first_page, texts, error) for each page range, in document order;
+    first_page starts at 1 and error is set (texts None) if the range failed. A PDF
+    without pages yields one empty range, so every path is reported. At most `window`
+    ranges are in flight, so memory stays bounded however large the PDFs are.
+    """
+    def tasks():
+        for path in paths:
+            try:
+                page_count = count_pages(path)
+            except Exception as e:
+                yield path, None, None, e
+                continue
+            if page_count == 0:
+                yield path, 1, None, None
+                continue
+            for start in range(0, page_count, pages_per_task):
+                stop = min(start + pages_per_task, page_count)
+                yield path, start + 1, executor.submit(extract_page_range, path, start, stop), None
+
+    def collect(path, first_page, future, error):
+        if future is None:
+            return path, first_page, None if error else [], error
+        try:
+            return path, first_page, future.result(), None
+        except Exception as e:
+            return path, first_page, None, e
+
+    pending = deque()
+    for task in tasks():
+        pending.append(task)
+        if len(pending) >= window:
+            yield collect(*pending.popleft())
+    while pending:
+        yield collect(*pending.popleft())
+
+def pages_from_ranges(ranges):
+    """
+    Turns the page ranges of one PDF, as yielded by extract_pdfs, into (page_number, text)
+    pairs. Raises the error of a range that could not be extracted.
+    """
+    for _, first_page, texts, error in ranges:
+        if error:
+            raise error
+        for index, text in enumerate(texts):
+            yield first_page + index, text
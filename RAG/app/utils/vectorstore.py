@@ -8,17 +8,60 @@ def get_collection():
     """
     return client.get_or_create_collection(name=COLLECTION_NAME)
 
-def add_to_vectorstore(documents: list[str], embeddings: list[list[float]], ids: list[str]):
+def add_to_vectorstore(documents: list[str], embeddings: list[list[float]], ids: list[str], metadatas: list[dict] = None):
     """
     Add documents and their embeddings to the collection.
+    Existing ids are overwritten, so re-ingesting a chunk never duplicates it.
     """
     collection = get_collection()
-    collection.add(
+    collection.upsert(
         documents=documents,
         embeddings=embeddings,
-        ids=ids
+        ids=ids,
+        metadatas=metadatas
     )
 
+def update_metadata(ids: list[str], metadatas: list[dict]):
+    """
+    Replace the metadata of stored chunks without re-embedding them.
+    """
+    if ids:
+        collection = get_collection()
+        collection.update(ids=ids, metadatas=metadatas)
+
+def existing_ids(ids: list[str]) -> set[str]:
+    """
+    Return which of the given ids are already stored.
+    """
+    if not ids:
+        return set()
+    collection = get_collection()
+    return set(collection.get(ids=ids, include=[])['ids'])
+
+def delete_source(source: str, keep_ids: set[str] = frozenset()) -> int:
+    """
+    Delete the chunks of a document, except keep_ids.
+    Returns the number of chunks deleted.
+    """
+    collection = get_collection()
+    stored = collection.get(where={"source": source}, include=[])['ids']
+    stale = [i for i in stored if i not in keep_ids]
+    if stale:
+        collection.delete(ids=stale)
+    return len(stale)
+
+def delete_untracked() -> int:
+    """
+    Delete chunks stored without a source (ingested before content-based ids).
+    Returns the number of chunks deleted.
+    """
+    collection = get_collection()
+    stored = collection.get(include=["metadatas"])
+    untracked = [i for i, meta in zip(stored['ids'], stored['metadatas']) if not meta or 'source' not in meta]
+    if untracked:
+        collection.delete(ids=untracked)
+    return len(untracked)
+
 def query_vectorstore(query_embedding: list[float], n_results: int = 5):
     """
     Query the collection for top matching documents.
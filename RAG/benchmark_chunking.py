@@ -0,0 +1,216 @@
+"""
+Chunking Benchmark
+
+Compares the chunking strategies of app/utils/chunker.py on a generated fixture
+corpus: sectioned documents with wrapped lines and page breaks, each section
+holding one "fact" sentence that a matching question asks about.
+
+For every strategy it reports:
+- throughput: pages/s and chunks/s
+- chunk sizes: chunk count and average tokens per chunk
+- retrieval quality: recall@1/3/5 of a local BM25 ranker (a chunk counts as a hit
+  when it contains the whole fact sentence), how many chunks must be retrieved for
+  90% recall, and the tokens those chunks add to a prompt
+
+BM25 stands in for the Gemini embeddings so the benchmark runs offline and for free;
+it rewards the same thing: facts kept intact inside focused chunks.
+
+Usage:
+    python benchmark_chunking.py
+
+Options:
+    --tokens N        Token budget per chunk (default: 512)
+    --overlap N       Overlap in tokens (default: 64)
+    --docs N          Documents in the fixture corpus (default: 20)
+    --pdfs            Also measure throughput on the PDFs in pdfs/
+"""
+
+import math
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from app.utils.chunker import CHUNK_STRATEGIES, TOKENIZER, chunk_pages, count_tokens
+
+SEED = 7
+LINE_WIDTH = 90
+LINES_PER_PAGE = 45
+RECALL_TARGET = 0.9
+TERM = re.compile(r"\w+")
+
+def make_vocabulary(rng, size):
+    """Pseudo-words, sampled with a Zipf-like skew so a few are very common."""
+    syllables = ["ka", "lo", "mi", "ra", "ten", "vo", "shi", "del", "an", "por", "qu", "es", "tri", "num", "bel", "og"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(1, 3))))
+    words = sorted(words)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return words, weights
+
+def make_corpus(docs, seed=SEED):
+    """
+    Build the fixture corpus.
+
+    Returns:
+        (documents, questions): documents are lists of (page_number, text) pages,
+        questions are (question, fact sentence) pairs
+    """
+    rng = random.Random(seed)
+    words, weights = make_vocabulary(rng, 600)
+    units = ["capacity", "latency", "budget", "range", "weight", "voltage", "rating", "margin"]
+    documents, questions = [], []
+
+    def sentence(low=8, high=22):
+        text = " ".join(rng.choices(words, weights, k=rng.randint(low, high)))
+        return text[0].upper() + text[1:] + rng.choice([".", ".", ".", "?", "!"])
+
+    for d in range(docs):
+        sections = []
+        names = []
+        for s in range(rng.randint(5, 8)):
+            title = " ".join(w.capitalize() for w in rng.choices(words, k=rng.randint(1, 4)))
+            paragraphs = [[sentence() for _ in range(rng.randint(3, 8))] for _ in range(rng.randint(3, 6))]
+            name = f"{rng.choice(words)}{d}x{s}"
+            unit = rng.choice(units)
+            fact = f"The measured {unit} of the {name} assembly is {rng.randint(10, 9999)} units."
+            paragraph = rng.choice(paragraphs)
+            paragraph.insert(rng.randrange(len(paragraph) + 1), fact)
+            questions.append((f"What is the measured {unit} of the {name} assembly?", fact))
+            names.append(name)
+            sections.append((f"{s + 1}. {title}", paragraphs))
+
+        # Distractors: every assembly is also mentioned, without its fact, in other sections
+        for name in names:
+            for _ in range(2):
+                _, paragraphs = rng.choice(sections)
+                paragraph = rng.choice(paragraphs)
+                distractor = f"Notes on the {name} assembly mention the {rng.choice(units)} {sentence(4, 10).lower()}"
+                paragraph.insert(rng.randrange(len(paragraph) + 1), distractor)
+
+        lines = []
+        for heading, paragraphs in sections:
+            lines.append(heading)
+            for paragraph in paragraphs:
+                # Wrap like extracted PDF text; paragraphs are only sometimes separated by a blank line
+                line = ""
+                for word in " ".join(paragraph).split():
+                    if line and len(line) + 1 + len(word) > LINE_WIDTH:
+                        lines.append(line)
+                        line = word
+                    else:
+                        line = f"{line} {word}" if line else word
+                lines.append(line)
+                if rng.random() < 0.5:
+                    lines.append("")
+        pages = [(i // LINES_PER_PAGE + 1, "\n".join(lines[i:i + LINES_PER_PAGE]))
+                 for i in range(0, len(lines), LINES_PER_PAGE)]
+        documents.append(pages)
+    return documents, questions
+
+class BM25:
+    """Minimal BM25 ranker over chunk texts."""
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1, self.b = k1, b
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for index, text in enumerate(texts):
+            terms = Counter(t.lower() for t in TERM.findall(text))
+            self.lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings[term].append((index, tf))
+        self.average_length = sum(self.lengths) / max(len(self.lengths), 1)
+        count = len(texts)
+        self.idf = {term: math.log(1 + (count - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self.postings.items()}
+
+    def rank(self, query, k):
+        scores = defaultdict(float)
+        for term in set(t.lower() for t in TERM.findall(query)):
+            for index, tf in self.postings.get(term, ()):
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[index] / self.average_length)
+                scores[index] += self.idf[term] * tf * (self.k1 + 1) / norm
+        return sorted(scores, key=scores.get, reverse=True)[:k]
+
+def normalize(text):
+    return " ".join(text.split())
+
+def run_strategy(strategy, documents, questions, max_tokens, overlap):
+    """Chunk the corpus with one strategy and measure speed and retrieval quality."""
+    pages = sum(len(doc) for doc in documents)
+    started = time.perf_counter()
+    chunks = [chunk for doc in documents for chunk in chunk_pages(iter(doc), strategy, max_tokens, overlap)]
+    elapsed = max(time.perf_counter() - started, 1e-9)
+
+    texts = [normalize(chunk["text"]) for chunk in chunks]
+    tokens = [count_tokens(text) for text in texts]
+    ranker = BM25(texts)
+    depth = 20
+    first_hits = []
+    for question, fact in questions:
+        fact = normalize(fact)
+        ranked = ranker.rank(question, depth)
+        first_hits.append(next((rank for rank, index in enumerate(ranked, 1) if fact in texts[index]), None))
+
+    def recall(k):
+        return sum(1 for hit in first_hits if hit and hit <= k) / len(questions)
+
+    needed = next((k for k in range(1, depth + 1) if recall(k) >= RECALL_TARGET), None)
+    average_tokens = sum(tokens) / len(tokens)
+    return {
+        "strategy": strategy,
+        "pages_per_s": pages / elapsed,
+        "chunks_per_s": len(chunks) / elapsed,
+        "chunks": len(chunks),
+        "avg_tokens": average_tokens,
+        "recall": [recall(k) for k in (1, 3, 5)],
+        "k_needed": needed,
+        "prompt_tokens": needed * average_tokens if needed else None,
+        "intact": sum(1 for _, fact in questions if any(normalize(fact) in t for t in texts)) / len(questions)
+    }
+
+def benchmark_pdfs(max_tokens, overlap):
+    """Chunking throughput on the PDFs in pdfs/ (text is extracted once, up front)."""
+    from app.utils.pdf_loader import iter_pdf_pages
+    pdf_files = sorted((Path(__file__).parent / "pdfs").glob("*.pdf"))
+    if not pdf_files:
+        print("No PDF files found in pdfs/")
+        return
+    documents = [list(iter_pdf_pages(str(pdf))) for pdf in pdf_files]
+    pages = sum(len(doc) for doc in documents)
+    print(f"PDFs: {len(pdf_files)} file(s), {pages} pages")
+    for strategy in CHUNK_STRATEGIES:
+        started = time.perf_counter()
+        count = sum(1 for doc in documents for _ in chunk_pages(iter(doc), strategy, max_tokens, overlap))
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"  {strategy:<10} {pages / elapsed:>10.1f} pages/s {count / elapsed:>10.1f} chunks/s {count:>6} chunks")
+
+def option(name, default):
+    if name in sys.argv:
+        return int(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+if __name__ == "__main__":
+    max_tokens = option("--tokens", 512)
+    overlap = option("--overlap", 64)
+    documents, questions = make_corpus(option("--docs", 20))
+
+    print(f"Fixture corpus: {len(documents)} documents, {sum(len(d) for d in documents)} pages, "
+          f"{len(questions)} questions")
+    print(f"Budget: {max_tokens} tokens, overlap {overlap} ({TOKENIZER} tokenizer; 'words' uses {max_tokens} words)")
+    print()
+    print(f"{'strategy':<10} {'pages/s':>9} {'chunks/s':>9} {'chunks':>7} {'tok/chunk':>9} "
+          f"{'intact':>7} {'R@1':>6} {'R@3':>6} {'R@5':>6} {'k@90%':>6} {'prompt tok':>10}")
+    for strategy in CHUNK_STRATEGIES:
+        r = run_strategy(strategy, documents, questions, max_tokens, overlap)
+        k_needed = r["k_needed"] if r["k_needed"] else "-"
+        prompt = f"{r['prompt_tokens']:.0f}" if r["prompt_tokens"] else "-"
+        print(f"{r['strategy']:<10} {r['pages_per_s']:>9.0f} {r['chunks_per_s']:>9.0f} {r['chunks']:>7} "
+              f"{r['avg_tokens']:>9.0f} {r['intact']:>7.0%} {r['recall'][0]:>6.0%} {r['recall'][1]:>6.0%} "
+              f"{r['recall'][2]:>6.0%} {k_needed:>6} {prompt:>10}")
+
+    if "--pdfs" in sys.argv:
+        print()
+        benchmark_pdfs(max_tokens, overlap)
@@ -5,6 +5,7 @@ import os
 sys.path.append(os.getcwd())
 
 from app.config import client
+from app.utils.manifest import delete_manifest
 
 COLLECTION_NAME = "pdf_docs"
 
@@ -17,6 +18,7 @@ def clear_db():
     
     try:
         client.delete_collection(name=COLLECTION_NAME)
+        delete_manifest()
         print("✅ Success: Collection deleted. The database is now empty.")
     except ValueError:
         print(f"⚠️  Collection '{COLLECTION_NAME}' does not exist (it might have already been deleted).")
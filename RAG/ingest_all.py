@@ -2,20 +2,36 @@
 Batch PDF Ingestion Script
 
 This script ingests all PDF files from the pdfs/ directory into the ChromaDB vector store.
-Run this whenever you add new PDFs to the pdfs/ folder.
+Run this whenever you add, change or remove PDFs in the pdfs/ folder.
+
+Ingestion is incremental: a manifest (db/ingest_manifest.json) records the hash of
+every ingested file and of each of its chunks. Unchanged files are skipped, only the
+new or edited chunks of changed files are embedded, and the chunks of removed files
+are deleted.
 
 Usage:
     python ingest_all.py
     
 Options:
-    --clear    Clear the database before ingesting (fresh start)
+    --clear        Clear the database before ingesting (fresh start)
+    --workers N    Processes extracting PDF text (default: one per CPU core)
 """
 
 import os
+import queue
 import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from app.ingest import ingest_pdf
-from app.utils.vectorstore import get_collection
+from app.config import CHUNK_OVERLAP, CHUNK_STRATEGY, CHUNK_TOKENS, EXTRACT_PAGES_PER_TASK, INGEST_QUEUE_SIZE, INGEST_WORKERS
+from app.ingest import ingest_pages
+from app.utils.chunker import chunker_signature
+from app.utils.pdf_loader import extract_pdfs, pages_from_ranges
+from app.utils.manifest import chunk_ids, delete_manifest, file_sha256, load_manifest, save_manifest
+from app.utils.vectorstore import delete_source, delete_untracked, existing_ids, get_collection
 
 def clear_database():
     """Clear all documents from the vector store."""
@@ -28,15 +44,91 @@ def clear_database():
             print(f"✓ Cleared {len(all_docs['ids'])} existing documents from database")
         else:
             print("✓ Database is already empty")
+        delete_manifest()
     except Exception as e:
         print(f"Error clearing database: {e}")
 
-def ingest_all_pdfs(clear_first=False):
+def is_unchanged(pdf_file, entry, sha256):
+    """
+    Check a PDF, whose file hash is sha256, against its manifest entry: same file hash,
+    and all its chunks still stored.
+    """
+    if not entry or entry.get("sha256") != sha256:
+        return False
+    # The vector store may have been cleared behind the manifest's back
+    ids = chunk_ids(pdf_file.name, entry.get("chunk_hashes", []))
+    return len(existing_ids(ids)) == len(ids)
+
+class IngestProgress:
+    """Tracks ingested files and reports progress and throughput."""
+    
+    def __init__(self, total_files):
+        self.total_files = total_files
+        self.files = 0
+        self.pages = 0
+        self.chunks = 0
+        self.embedded = 0
+        self.started = time.perf_counter()
+    
+    def update(self, pages, chunks, embedded):
+        """Record one finished file and print where the run stands."""
+        self.files += 1
+        self.pages += pages
+        self.chunks += chunks
+        self.embedded += embedded
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        eta = (self.total_files - self.files) * elapsed / self.files
+        print(f"[{self.files}/{self.total_files}] {self.pages / elapsed:.1f} pages/s, "
+              f"{self.chunks / elapsed:.1f} chunks/s, {self.embedded / elapsed:.1f} embeddings/s, "
+              f"ETA {eta:.0f}s")
+    
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return (f"Ingested {self.pages} pages into {self.chunks} chunks in {elapsed:.1f}s "
+                f"({self.pages / max(elapsed, 1e-9):.1f} pages/s)")
+
+def extract_in_background(pdf_files, workers=None):
+    """
+    Extract PDFs on a process pool, yielding their page ranges in order as
+    (pdf_file, first_page, texts, error), like extract_pdfs.
+    
+    A producer thread feeds extracted page ranges into a bounded queue; when the
+    embedding stage falls behind, the queue fills up and extraction pauses. At most
+    INGEST_QUEUE_SIZE ranges wait in the queue and 2 x workers are being extracted,
+    so memory is bounded by that window of pages, not by the size of the PDFs.
+    """
+    if not pdf_files:
+        return
+    workers = workers or INGEST_WORKERS
+    ranges = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    done = object()
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Start the workers now, before any thread exists, so forking them is safe
+        executor.submit(os.getpid).result()
+        
+        def produce():
+            try:
+                for item in extract_pdfs(pdf_files, executor, EXTRACT_PAGES_PER_TASK, window=2 * workers):
+                    ranges.put(item)
+            except Exception as e:
+                print(f"Error extracting PDFs: {e}")
+            finally:
+                ranges.put(done)
+        
+        producer = threading.Thread(target=produce, name="pdf-extract", daemon=True)
+        producer.start()
+        while (item := ranges.get()) is not done:
+            yield item
+        producer.join()
+
+def ingest_all_pdfs(clear_first=False, workers=None):
     """
     Ingest all PDF files from the pdfs/ directory.
     
     Args:
         clear_first (bool): If True, clear the database before ingesting
+        workers (int): Processes extracting PDF text (default: INGEST_WORKERS)
     """
     # Get the pdfs directory
     pdfs_dir = Path(__file__).parent / "pdfs"
@@ -48,10 +140,6 @@ def ingest_all_pdfs(clear_first=False):
     # Find all PDF files
     pdf_files = list(pdfs_dir.glob("*.pdf"))
     
-    if not pdf_files:
-        print(f"No PDF files found in {pdfs_dir}")
-        return
-    
     print(f"Found {len(pdf_files)} PDF file(s) to ingest:")
     for pdf in pdf_files:
         print(f"  - {pdf.name}")
@@ -63,24 +151,85 @@ def ingest_all_pdfs(clear_first=False):
         clear_database()
         print()
     
-    # Ingest each PDF
+    manifest = load_manifest()
+    files = manifest["files"]
+    if not files:
+        # First incremental run: drop chunks from earlier runs, which had random ids
+        legacy = delete_untracked()
+        if legacy:
+            print(f"Removed {legacy} chunks ingested without content-based ids; re-ingesting them")
+            print()
+    
+    # Delete the chunks of PDFs that were removed from the folder
+    present = {pdf.name for pdf in pdf_files}
+    removed_files = 0
+    for name in sorted(set(files) - present):
+        removed = delete_source(name)
+        del files[name]
+        save_manifest(manifest)
+        removed_files += 1
+        print(f"✓ Removed {name}: {removed} chunks deleted")
+    
+    # Chunks made with other chunking settings do not match the current ones: re-chunk every PDF
+    chunker = chunker_signature(CHUNK_STRATEGY, CHUNK_TOKENS, CHUNK_OVERLAP)
+    if manifest.get("chunker") != chunker:
+        if files:
+            print(f"Chunking settings changed ({manifest.get('chunker', 'words:500')} -> {chunker}); re-chunking all PDFs")
+            print()
+        files.clear()
+        manifest["chunker"] = chunker
+        save_manifest(manifest)
+    
+    # Find the new or changed PDFs
     total_chunks = 0
+    embedded = 0
     successful = 0
+    unchanged = 0
     failed = 0
+    changed = {}
     
     for pdf_file in pdf_files:
         try:
-            print(f"{'='*60}")
-            chunks = ingest_pdf(str(pdf_file))
-            if chunks > 0:
+            sha256 = file_sha256(pdf_file)
+            if is_unchanged(pdf_file, files.get(pdf_file.name), sha256):
+                unchanged += 1
+                total_chunks += len(files[pdf_file.name]["chunk_hashes"])
+                print(f"- Unchanged: {pdf_file.name}")
+            else:
+                changed[pdf_file] = sha256
+        except Exception as e:
+            failed += 1
+            print(f"✗ Error reading {pdf_file.name}: {e}")
+    print()
+    
+    # Ingest them: worker processes extract the pages while this process chunks, embeds and stores them
+    progress = IngestProgress(len(changed))
+    for pdf_file, ranges in groupby(extract_in_background(list(changed), workers), key=itemgetter(0)):
+        print(f"{'='*60}")
+        print(f"Starting ingestion for: {pdf_file}")
+        try:
+            result = ingest_pages(pages_from_ranges(ranges), pdf_file.name)
+            chunks = result["chunks"] - result["failed"]
+            embedded += result["embedded"]
+            if result["chunks"] > 0 and not result["failed"]:
+                # Only fully stored files are recorded, so failures are retried next run
+                files[pdf_file.name] = {"sha256": changed[pdf_file], "chunk_hashes": result["chunk_hashes"]}
+                save_manifest(manifest)
                 total_chunks += chunks
                 successful += 1
-                print(f"✓ Successfully ingested {pdf_file.name}: {chunks} chunks")
+                print(f"✓ Successfully ingested {pdf_file.name}: {chunks} chunks "
+                      f"({result['embedded']} embedded, {result['skipped']} unchanged)")
             else:
                 failed += 1
-                print(f"✗ Failed to ingest {pdf_file.name}: No chunks created")
+                total_chunks += chunks
+                if result["chunks"] == 0:
+                    print(f"✗ Failed to ingest {pdf_file.name}: No chunks created")
+                else:
+                    print(f"✗ Failed to ingest {pdf_file.name}: {result['failed']} chunks could not be embedded")
+            progress.update(result["pages"], result["chunks"], result["embedded"])
         except Exception as e:
             failed += 1
+            progress.update(0, 0, 0)
             print(f"✗ Error ingesting {pdf_file.name}: {e}")
         print()
     
@@ -90,8 +239,13 @@ def ingest_all_pdfs(clear_first=False):
     print(f"{'='*60}")
     print(f"Total PDFs processed: {len(pdf_files)}")
     print(f"  ✓ Successful: {successful}")
+    print(f"  - Unchanged: {unchanged}")
     print(f"  ✗ Failed: {failed}")
+    print(f"PDFs removed: {removed_files}")
+    print(f"Chunks embedded this run: {embedded}")
     print(f"Total chunks stored: {total_chunks}")
+    if changed:
+        print(progress.summary())
     print(f"{'='*60}")
 
 if __name__ == "__main__":
@@ -106,4 +260,8 @@ if __name__ == "__main__":
             sys.exit(0)
         print()
     
-    ingest_all_pdfs(clear_first=clear_first)
+    workers = None
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+    
+    ingest_all_pdfs(clear_first=clear_first, workers=workers)
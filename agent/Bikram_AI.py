@@ -22,10 +22,10 @@ agent_dir = Path(__file__).parent
 if str(agent_dir) not in sys.path:
     sys.path.insert(0, str(agent_dir))
 
-from bikram_ai import get_bikram_ai_response
+from bikram_ai import get_bikram_ai_response, stream_bikram_ai_response
 
 # Re-export for backward compatibility
-__all__ = ['get_bikram_ai_response']
+__all__ = ['get_bikram_ai_response', 'stream_bikram_ai_response']
 
 
 
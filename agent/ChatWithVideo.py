@@ -3,9 +3,8 @@ import re
 from flask import jsonify
 import markdown
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled
-from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
+from agent.github_models import get_chat_client
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,11 +23,8 @@ if not GITHUB_TOKEN:
     client = None
 else:
     try:
-        # Azure AI Inference client configuration
-        client = ChatCompletionsClient(
-            endpoint=ENDPOINT,
-            credential=AzureKeyCredential(GITHUB_TOKEN),
-        )
+        # Shared, pooled client for GitHub Models
+        client = get_chat_client(MODEL_NAME, endpoint=ENDPOINT, token=GITHUB_TOKEN)
     except Exception as e:
         print(f"Error initializing Azure AI client for ChatWithVideo: {e}")
         client = None
@@ -83,6 +79,11 @@ def get_transcript(video_id):
         traceback.print_exc()
         return {"success": False, "error": f"Error fetching transcript: {str(e)}"}
 
+SUMMARY_SYSTEM_PROMPT = "You're an advanced AI designed to summarize YouTube videos. Extract key information from the transcript including Title of the video, speaker, main topics, key takeaways, Timestamps for Notable Moments, Quotes and Impactful Statements, Analysis Sentiment if possible and notable insights. Format your response using Markdown with proper headings, bullet points, add interactive & appropriate emojis and sections for easy reading. Include a brief overview, key points, and conclusion."
+
+# Note appended to every video summary
+QUESTION_HINT_HTML = "<br><br><p style='color: #a0a0a0; font-style: italic;'>💬 You can now ask me questions about this video!</p>"
+
 def summarize_transcript(transcript):
     """Use GPT-4o to summarize the transcript."""
     if client is None:
@@ -91,7 +92,7 @@ def summarize_transcript(transcript):
     try:
         response = client.complete(
             messages=[
-                SystemMessage("You're an advanced AI designed to summarize YouTube videos. Extract key information from the transcript including Title of the video, speaker, main topics, key takeaways, Timestamps for Notable Moments, Quotes and Impactful Statements, Analysis Sentiment if possible and notable insights. Format your response using Markdown with proper headings, bullet points, add interactive & appropriate emojis and sections for easy reading. Include a brief overview, key points, and conclusion."),
+                SystemMessage(SUMMARY_SYSTEM_PROMPT),
                 UserMessage(transcript),
             ],
             temperature=0.7,
@@ -106,6 +107,42 @@ def summarize_transcript(transcript):
         traceback.print_exc()
         return {"success": False, "error": f"Summarization error: {str(e)}"}
 
+def _build_question_messages(question, session_id):
+    """Build the chat messages for a question about the video stored for this session."""
+    transcript = video_memory[session_id]['transcript']
+    
+    # Build conversation history for context
+    conversation_history = video_memory[session_id].get('conversation_history', [])
+    
+    # Create messages for the AI
+    messages = [
+        SystemMessage(
+            "You are an AI assistant specialized in answering questions about YouTube videos. "
+            "You have access to the full transcript of a video. Use this transcript to provide accurate, "
+            "detailed answers to the user's questions. If the information is not in the transcript, "
+            "say so honestly. Format your responses using Markdown for better readability."
+        ),
+        UserMessage(f"Here is the video transcript:\n\n{transcript}\n\n")
+    ]
+    
+    # Add conversation history
+    for msg in conversation_history[-6:]:  # Keep last 3 exchanges (6 messages)
+        if msg['role'] == 'user':
+            messages.append(UserMessage(msg['content']))
+        else:
+            messages.append(SystemMessage(f"Previous response: {msg['content']}"))
+    
+    # Add current question
+    messages.append(UserMessage(question))
+    return messages
+
+def _remember_exchange(session_id, question, answer):
+    """Store a question/answer pair in the session's video conversation history."""
+    conversation_history = video_memory[session_id].get('conversation_history', [])
+    conversation_history.append({'role': 'user', 'content': question})
+    conversation_history.append({'role': 'assistant', 'content': answer})
+    video_memory[session_id]['conversation_history'] = conversation_history
+
 def answer_question_about_video(question, session_id):
     """Answer questions about the video using the stored transcript."""
     if client is None:
@@ -118,33 +155,8 @@ def answer_question_about_video(question, session_id):
             "error": "No video transcript found in memory. Please analyze a video first."
         }
     
-    transcript = video_memory[session_id]['transcript']
-    video_id = video_memory[session_id].get('video_id', 'unknown')
-    
     try:
-        # Build conversation history for context
-        conversation_history = video_memory[session_id].get('conversation_history', [])
-        
-        # Create messages for the AI
-        messages = [
-            SystemMessage(
-                "You are an AI assistant specialized in answering questions about YouTube videos. "
-                "You have access to the full transcript of a video. Use this transcript to provide accurate, "
-                "detailed answers to the user's questions. If the information is not in the transcript, "
-                "say so honestly. Format your responses using Markdown for better readability."
-            ),
-            UserMessage(f"Here is the video transcript:\n\n{transcript}\n\n")
-        ]
-        
-        # Add conversation history
-        for msg in conversation_history[-6:]:  # Keep last 3 exchanges (6 messages)
-            if msg['role'] == 'user':
-                messages.append(UserMessage(msg['content']))
-            else:
-                messages.append(SystemMessage(f"Previous response: {msg['content']}"))
-        
-        # Add current question
-        messages.append(UserMessage(question))
+        messages = _build_question_messages(question, session_id)
         
         response = client.complete(
             messages=messages,
@@ -157,9 +169,7 @@ def answer_question_about_video(question, session_id):
         answer = response.choices[0].message.content
         
         # Store in conversation history
-        conversation_history.append({'role': 'user', 'content': question})
-        conversation_history.append({'role': 'assistant', 'content': answer})
-        video_memory[session_id]['conversation_history'] = conversation_history
+        _remember_exchange(session_id, question, answer)
         
         return {"success": True, "answer": answer}
         
@@ -202,7 +212,7 @@ def process_chatwithvideo_request(user_input, session_id=None):
         summary_html = markdown.markdown(summary_result["summary"])
         
         # Add helpful note about asking questions
-        summary_html += "<br><br><p style='color: #a0a0a0; font-style: italic;'>💬 You can now ask me questions about this video!</p>"
+        summary_html += QUESTION_HINT_HTML
         
         return jsonify({
             "success": True,
@@ -230,3 +240,77 @@ def process_chatwithvideo_request(user_input, session_id=None):
             "success": True,
             "response": answer_html
         }), 200
+
+def _iter_deltas(response):
+    """Yield the text deltas of a streaming chat completion."""
+    for update in response:
+        if update.choices and update.choices[0].delta and update.choices[0].delta.content:
+            yield update.choices[0].delta.content
+
+def stream_chatwithvideo_request(user_input, session_id=None):
+    """
+    Stream a ChatWithVideo turn - either a video summary or an answer about the stored video.
+    
+    Args:
+        user_input (str): A YouTube URL or a question about the analyzed video
+        session_id (str, optional): Session the video transcript is stored under
+        
+    Yields:
+        str: Markdown text deltas as they arrive from the model
+        
+    Raises:
+        ValueError: If the input is empty, the transcript is unavailable or no video is in memory
+        RuntimeError: If the Azure AI client is not initialized
+    """
+    if not user_input:
+        raise ValueError("Please provide input")
+    if client is None:
+        raise RuntimeError("Azure AI client is not initialized. Please check GITHUB_TOKEN.")
+    
+    video_id = extract_video_id(user_input)
+    
+    if video_id:
+        transcript_result = get_transcript(video_id)
+        if not transcript_result["success"]:
+            raise ValueError(transcript_result["error"])
+        
+        if session_id:
+            video_memory[session_id] = {
+                'transcript': transcript_result['transcript'],
+                'video_id': video_id,
+                'conversation_history': []
+            }
+        
+        response = client.complete(
+            messages=[
+                SystemMessage(SUMMARY_SYSTEM_PROMPT),
+                UserMessage(transcript_result["transcript"]),
+            ],
+            temperature=0.7,
+            top_p=1.0,
+            max_tokens=1500,
+            model=MODEL_NAME,
+            stream=True
+        )
+        yield from _iter_deltas(response)
+        yield "\n\n" + QUESTION_HINT_HTML
+    else:
+        if not session_id:
+            raise ValueError("No session ID provided. Cannot retrieve video context.")
+        if session_id not in video_memory or 'transcript' not in video_memory[session_id]:
+            raise ValueError("No video transcript found in memory. Please analyze a video first.")
+        
+        response = client.complete(
+            messages=_build_question_messages(user_input, session_id),
+            temperature=0.7,
+            top_p=1.0,
+            max_tokens=1000,
+            model=MODEL_NAME,
+            stream=True
+        )
+        answer_parts = []
+        for delta in _iter_deltas(response):
+            answer_parts.append(delta)
+            yield delta
+        
+        _remember_exchange(session_id, user_input, "".join(answer_parts))
@@ -2,9 +2,8 @@ import os
 import markdown
 from flask import jsonify
 from dotenv import load_dotenv
-from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
+from agent.github_models import get_chat_client, get_async_chat_client
 
 # Load environment variables
 load_dotenv()
@@ -16,27 +15,11 @@ token = os.getenv("GITHUB_TOKEN")
 if not token:
     raise ValueError("GITHUB_TOKEN not found in environment variables. Please set it in the .env file.")
 
-# Initialize the client
-client = ChatCompletionsClient(
-    endpoint=endpoint,
-    credential=AzureKeyCredential(token),
-)
+# Shared, pooled client for GitHub Models
+client = get_chat_client(model_name, endpoint=endpoint, token=token)
+async_client = get_async_chat_client(model_name, endpoint=endpoint, token=token)
 
-def get_codestral_2501_response(user_message):
-    """
-    Get response from Codestral 2501 model for web application.
-    
-    Args:
-        user_message (str): The user's input message
-        
-    Returns:
-        dict: JSON response with HTML-formatted response or error
-    """
-    try:
-        response = client.complete(
-            messages=[
-                SystemMessage(
-                """
+SYSTEM_PROMPT = """
                     You are **Codestral 2501**, a powerful and intelligent AI coding assistant developed by Mistral AI.
 
                     Your tasks include:
@@ -144,7 +127,22 @@ def get_codestral_2501_response(user_message):
                     - Inline `code` for small code references
                     
                     Remember: Your responses will be converted to HTML, so proper markdown formatting is essential!
-                """),
+                """
+
+def get_codestral_2501_response(user_message):
+    """
+    Get response from Codestral 2501 model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Returns:
+        dict: JSON response with HTML-formatted response or error
+    """
+    try:
+        response = client.complete(
+            messages=[
+                SystemMessage(SYSTEM_PROMPT),
                 UserMessage(user_message),
             ],
             temperature=1.0,
@@ -181,6 +179,53 @@ def get_codestral_2501_response(user_message):
     except Exception as e:
         return jsonify({"error": f"Error with Codestral 2501: {str(e)}"}), 500
 
+def stream_codestral_2501_response(user_message):
+    """
+    Stream response from Codestral 2501 model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Yields:
+        str: Markdown text deltas as they arrive from the model
+    """
+    response = client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        temperature=1.0,
+        top_p=1.0,
+        max_tokens=1000,
+        model=model_name,
+        stream=True
+    )
+    for update in response:
+        if update.choices and update.choices[0].delta and update.choices[0].delta.content:
+            yield update.choices[0].delta.content
+
+async def get_codestral_2501_response_async(user_message):
+    """
+    Get response from Codestral 2501 model without blocking the event loop.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Returns:
+        str: The AI's response in markdown
+    """
+    response = await async_client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        temperature=1.0,
+        top_p=1.0,
+        max_tokens=1000,
+        model=model_name
+    )
+    return response.choices[0].message.content
+
 # For testing in terminal (when run directly)
 if __name__ == "__main__":
     test_message = "What is the capital of France?"
@@ -1,7 +1,6 @@
 import os
-from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
+from agent.github_models import get_chat_client, get_async_chat_client
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,11 +13,11 @@ token = os.getenv("GITHUB_TOKEN")
 if not token:
     raise ValueError("GITHUB_TOKEN not found in environment variables. Please set it in the .env file.")
 
-# Initialize the client
-client = ChatCompletionsClient(
-    endpoint=endpoint,
-    credential=AzureKeyCredential(token),
-)
+# Shared, pooled client for GitHub Models
+client = get_chat_client(model_name, endpoint=endpoint, token=token)
+async_client = get_async_chat_client(model_name, endpoint=endpoint, token=token)
+
+SYSTEM_PROMPT = "You are Cohere Command R+, an advanced AI assistant developed by Cohere with enhanced reasoning capabilities. You excel at complex tasks, detailed analysis, and providing comprehensive answers. Format your responses with proper markdown for better readability. Use clear headings, bullet points, and appropriate emojis to enhance user engagement and clarity."
 
 def get_cohere_command_r_plus_response(user_message):
     """
@@ -33,7 +32,7 @@ def get_cohere_command_r_plus_response(user_message):
     try:
         response = client.complete(
             messages=[
-                SystemMessage("You are Cohere Command R+, an advanced AI assistant developed by Cohere with enhanced reasoning capabilities. You excel at complex tasks, detailed analysis, and providing comprehensive answers. Format your responses with proper markdown for better readability. Use clear headings, bullet points, and appropriate emojis to enhance user engagement and clarity."),
+                SystemMessage(SYSTEM_PROMPT),
                 UserMessage(user_message),
             ],
             temperature=1.0,
@@ -45,6 +44,53 @@ def get_cohere_command_r_plus_response(user_message):
     except Exception as e:
         return f"Error: {str(e)}"
 
+def stream_cohere_command_r_plus_response(user_message):
+    """
+    Stream response from Cohere Command R+ model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Yields:
+        str: Markdown text deltas as they arrive from the model
+    """
+    response = client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        temperature=1.0,
+        top_p=1.0,
+        max_tokens=1000,
+        model=model_name,
+        stream=True
+    )
+    for update in response:
+        if update.choices and update.choices[0].delta and update.choices[0].delta.content:
+            yield update.choices[0].delta.content
+
+async def get_cohere_command_r_plus_response_async(user_message):
+    """
+    Get response from Cohere Command R+ model without blocking the event loop.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Returns:
+        str: The AI's response in markdown
+    """
+    response = await async_client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        temperature=1.0,
+        top_p=1.0,
+        max_tokens=1000,
+        model=model_name
+    )
+    return response.choices[0].message.content
+
 # For testing in terminal (when run directly)
 if __name__ == "__main__":
     test_message = "What is the capital of France?"
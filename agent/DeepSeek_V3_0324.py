@@ -1,8 +1,7 @@
 import os
 from dotenv import load_dotenv
-from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
+from agent.github_models import get_chat_client, get_async_chat_client
 
 # Load environment variables
 load_dotenv()
@@ -14,26 +13,11 @@ token = os.getenv("GITHUB_TOKEN")
 if not token:
     raise ValueError("GITHUB_TOKEN not found in environment variables. Please set it in the .env file.")
 
-# Initialize the client
-client = ChatCompletionsClient(
-    endpoint=endpoint,
-    credential=AzureKeyCredential(token),
-)
+# Shared, pooled client for GitHub Models
+client = get_chat_client(model, endpoint=endpoint, token=token)
+async_client = get_async_chat_client(model, endpoint=endpoint, token=token)
 
-def get_deepseek_v3_response(user_message):
-    """
-    Get response from DeepSeek V3 0324 model for web application.
-    
-    Args:
-        user_message (str): The user's input message
-        
-    Returns:
-        str: The AI's response
-    """
-    try:
-        response = client.complete(
-            messages=[
-                SystemMessage("""You are DeepSeek V3, an advanced AI assistant developed by DeepSeek. You excel at understanding complex queries, providing detailed technical explanations, and offering thoughtful, well-structured responses.
+SYSTEM_PROMPT = """You are DeepSeek V3, an advanced AI assistant developed by DeepSeek. You excel at understanding complex queries, providing detailed technical explanations, and offering thoughtful, well-structured responses.
 
 🧠 Identity
 Name: DeepSeek V3
@@ -51,7 +35,22 @@ Role: Advanced AI assistant with strong reasoning and problem-solving capabiliti
 - Be comprehensive yet concise in your explanations.
 - Provide practical examples when explaining complex concepts.
 - Format your responses with proper markdown for better readability.
-"""),
+"""
+
+def get_deepseek_v3_response(user_message):
+    """
+    Get response from DeepSeek V3 0324 model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Returns:
+        str: The AI's response
+    """
+    try:
+        response = client.complete(
+            messages=[
+                SystemMessage(SYSTEM_PROMPT),
                 UserMessage(user_message),
             ],
             temperature=1.0,
@@ -63,6 +62,53 @@ Role: Advanced AI assistant with strong reasoning and problem-solving capabiliti
     except Exception as e:
         return f"Error: {str(e)}"
 
+def stream_deepseek_v3_response(user_message):
+    """
+    Stream response from DeepSeek V3 0324 model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Yields:
+        str: Markdown text deltas as they arrive from the model
+    """
+    response = client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        temperature=1.0,
+        top_p=1.0,
+        max_tokens=1000,
+        model=model,
+        stream=True
+    )
+    for update in response:
+        if update.choices and update.choices[0].delta and update.choices[0].delta.content:
+            yield update.choices[0].delta.content
+
+async def get_deepseek_v3_response_async(user_message):
+    """
+    Get response from DeepSeek V3 0324 model without blocking the event loop.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Returns:
+        str: The AI's response in markdown
+    """
+    response = await async_client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        temperature=1.0,
+        top_p=1.0,
+        max_tokens=1000,
+        model=model
+    )
+    return response.choices[0].message.content
+
 # For testing in terminal (when run directly)
 if __name__ == "__main__":
     test_message = "What is the capital of France?"
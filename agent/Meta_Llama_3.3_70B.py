@@ -1,7 +1,6 @@
 import os
-from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
+from agent.github_models import get_chat_client, get_async_chat_client
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,26 +13,11 @@ token = os.getenv("GITHUB_TOKEN")
 if not token:
     raise ValueError("GITHUB_TOKEN not found in environment variables. Please set it in the .env file.")
 
-# Initialize the client
-client = ChatCompletionsClient(
-    endpoint=endpoint,
-    credential=AzureKeyCredential(token),
-)
+# Shared, pooled client for GitHub Models
+client = get_chat_client(model_name, endpoint=endpoint, token=token)
+async_client = get_async_chat_client(model_name, endpoint=endpoint, token=token)
 
-def get_llama_33_70b_response(user_message):
-    """
-    Get response from Meta Llama 3.3 70B model for web application.
-    
-    Args:
-        user_message (str): The user's input message
-        
-    Returns:
-        str: The AI's response
-    """
-    try:
-        response = client.complete(
-            messages=[
-                SystemMessage("""You are Meta Llama 3.3 70B, a powerful and sophisticated open-source AI assistant developed by Meta. 
+SYSTEM_PROMPT = """You are Meta Llama 3.3 70B, a powerful and sophisticated open-source AI assistant developed by Meta. 
                 With your large-scale architecture, you provide comprehensive, nuanced, and highly accurate responses across 
                 a vast range of topics. You excel at complex reasoning, detailed explanations, and in-depth analysis.
                 
@@ -55,7 +39,22 @@ def get_llama_33_70b_response(user_message):
                 - Format your responses with proper markdown for better readability
                 - Provide nuanced perspectives on complex topics
                 - Excel at analytical thinking and problem-solving
-                """),
+                """
+
+def get_llama_33_70b_response(user_message):
+    """
+    Get response from Meta Llama 3.3 70B model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Returns:
+        str: The AI's response
+    """
+    try:
+        response = client.complete(
+            messages=[
+                SystemMessage(SYSTEM_PROMPT),
                 UserMessage(user_message),
             ],
             temperature=1.0,
@@ -67,6 +66,53 @@ def get_llama_33_70b_response(user_message):
     except Exception as e:
         return f"Error: {str(e)}"
 
+def stream_llama_33_70b_response(user_message):
+    """
+    Stream response from Meta Llama 3.3 70B model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Yields:
+        str: Markdown text deltas as they arrive from the model
+    """
+    response = client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        temperature=1.0,
+        top_p=1.0,
+        max_tokens=1000,
+        model=model_name,
+        stream=True
+    )
+    for update in response:
+        if update.choices and update.choices[0].delta and update.choices[0].delta.content:
+            yield update.choices[0].delta.content
+
+async def get_llama_33_70b_response_async(user_message):
+    """
+    Get response from Meta Llama 3.3 70B model without blocking the event loop.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Returns:
+        str: The AI's response in markdown
+    """
+    response = await async_client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        temperature=1.0,
+        top_p=1.0,
+        max_tokens=1000,
+        model=model_name
+    )
+    return response.choices[0].message.content
+
 # For testing in terminal (when run directly)
 if __name__ == "__main__":
     test_message = "What is the capital of France?"
@@ -1,12 +1,15 @@
+import asyncio
 import os
-import re
-import requests
 import markdown
 from flask import jsonify
 import google.generativeai as genai
 from dotenv import load_dotenv
 import base64
+import time
 import traceback
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from agent.openweather import submit_openweather
+from agent.location_extractor import extract_location
 
 # Load environment variables
 load_dotenv()
@@ -15,101 +18,165 @@ load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 genai.configure(api_key=GEMINI_API_KEY)
 
-# Configure OpenWeather API
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-OPENWEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5"
+# Seconds a turn waits for the forecast before answering with current conditions only
+FORECAST_DEADLINE = float(os.getenv("ARTICUNO_FORECAST_DEADLINE", "2.5"))
 
+# Locations detected with lower confidence (0-1) do not trigger weather lookups
+LOCATION_MIN_CONFIDENCE = float(os.getenv("ARTICUNO_LOCATION_MIN_CONFIDENCE", "0.5"))
 
-def detect_location_from_message(message):
+# Configure the model
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 1,
+    "top_k": 32,
+    "max_output_tokens": 1000,
+}
+
+# Create weather-focused system prompt
+WEATHER_SYSTEM_PROMPT = """Welcome to Articuno.AI – your friendly weather assistant! ❄️
+You're here to help users explore weather updates with style, clarity, and a touch of personality 😊
+
+Your Role:
+
+You are a polite, knowledgeable, and conversational assistant that specializes in weather information.
+
+Your answers should be concise, friendly, and easy to understand – even for someone not familiar with weather terms.
+
+You may use emojis sparingly to enhance friendliness, but never in the middle of sentences.
+
+If a user shares a location, provide current weather info and a quick summary of the next 2–3 days.
+
+Always address the user's specific question about weather and provide helpful context based on the conditions.
+
+Provide practical advice based on the weather conditions (e.g., "Don't forget your umbrella!" for rain).
+
+Tone & Style:
+
+Be warm, responsive, and conversational - like a friendly meteorologist.
+
+Use short paragraphs and bullet points if helpful.
+
+End most responses with a gentle question or suggestion to keep the flow going.
+(e.g., "Would you like a forecast for the next few days?" or "Is there anything else about the weather you'd like to know?")
+
+Example Starters:
+
+🌤️ "Looks like it's sunny in [Location]! Want to know what's coming this weekend?"
+
+🌧️ "Rain ahead in [Location]! Don't forget your umbrella ☔ Ready for a 3-day forecast?"
+
+🌡️ "It's currently [Temperature]°C with light winds in [Location]. Want me to check humidity too?"
+
+Example Weather Report Format:
+For location-specific weather reports, format your response like this:
+
+🗺️ Weather Report for [Location]
+📅 Today: [Current Date]
+🌤️ Condition: [Weather Condition]
+🌡️ Temperature: [Temp]°C (Feels like [Feels Like]°C)
+💧 Humidity: [Humidity]%
+🌬️ Wind: [Wind Speed] km/h [Direction]
+🌅 Sunrise: [Sunrise Time]     🌇 Sunset: [Sunset Time]
+
+🔮 Three-Day Forecast
+[Include forecast data if available]
+
+[Your recommendations based on weather conditions]
+
+📌 Tip: [Practical advice like "Carry an umbrella; it may rain today."]
+
+This format is:
+- Clear and concise
+- Uses emojis tastefully to make it user-friendly
+- Includes actionable tips
+
+Special Cases:
+If the user asks about weather but doesn't specify a location, politely ask them for a location.
+If the user asks about non-weather topics, gently remind them that you're a weather specialist but still try to help.
+"""
+
+
+def detect_location_from_message(message, min_confidence=None):
     """
     Extracts location information from a user message.
     
     Args:
         message (str): The user message to analyze
+        min_confidence (float, optional): Minimum confidence for a match,
+            defaults to LOCATION_MIN_CONFIDENCE
         
     Returns:
         str or None: Detected location name or None if no location found
     """
-    # Enhanced location detection - look for common location query patterns
-    location_patterns = [
-        r"weather\s+(?:in|at|for)\s+([A-Za-z\s,]+)",  # "weather in London"
-        r"(?:in|at)\s+([A-Za-z\s,]+?)(?:\s+weather|\?|$)",  # "in Paris weather"
-        r"^([A-Za-z\s,]+?)(?:\s+weather|\?|$)",  # "Tokyo weather"
-        r"^([A-Za-z\s,]+?)$",  # Just the location name
-        r"weather (?:of|for|in|at)\s+([A-Za-z\s,]+)",  # "weather of Tokyo"
-        r"weather(?:.+?)(?:of|for|in|at)\s+([A-Za-z\s,]+)",  # "weather report of London"
-        r"(?:show|get|tell|give)(?:.+?)weather(?:.+?)(?:of|for|in|at)\s+([A-Za-z\s,]+)",  # "give me weather of London"
-        r"(?:show|get|tell|give)(?:.+?)(?:of|for|in|at)\s+([A-Za-z\s,]+?)(?:\s+weather|\?|$)",  # "give me of London weather"
-        r"(?:how is|what is|what's)(?:.+?)weather(?:.+?)(?:of|for|in|at)\s+([A-Za-z\s,]+)",  # "how is the weather in London"
-        r"(?:how's|what's)(?:.+?)(?:of|for|in|at)\s+([A-Za-z\s,]+?)(?:\s+weather|\?|$)",  # "what's in London weather like"
-        r"(?:temperature|forecast|climate|humidity|wind|conditions)(?:.+?)(?:in|at|for)\s+([A-Za-z\s,]+)",  # "temperature in Berlin"
-        r"(?:will it rain|is it sunny|is it hot|is it cold)(?:.+?)(?:in|at)\s+([A-Za-z\s,]+)",  # "will it rain in Seattle"
-        r"what's the (?:weather|temperature|forecast)(?:.+?)(?:in|at|for)\s+([A-Za-z\s,]+)"  # "what's the forecast for Chicago"
-    ]
-    
-    for pattern in location_patterns:
-        match = re.search(pattern, message, re.IGNORECASE)
-        if match:
-            location = match.group(1).strip()
-            # Remove trailing punctuation if any
-            location = re.sub(r'[.,;:!?]+$', '', location)
-            return location
+    match = extract_location(message)
+    if match is None:
+        return None
     
-    # As a fallback, try to find any city name mentioned in the query
-    # This is a simple approach - in a production system, you might use NER (Named Entity Recognition)
-    words = message.split()
-    for word in words:
-        # Clean the word of punctuation
-        clean_word = re.sub(r'[.,;:!?]+$', '', word)
-        # If the word starts with a capital letter and is at least 3 characters, it might be a location
-        if len(clean_word) >= 3 and clean_word[0].isupper() and clean_word.lower() not in [
-            "what", "where", "when", "why", "how", "can", "could", "would", 
-            "should", "will", "shall", "the", "this", "that", "these", "those",
-            "give", "show", "tell", "about", "weather", "forecast", "temperature",
-            "conditions", "articuno", "hello", "thanks", "thank", "please", "good",
-            "morning", "afternoon", "evening", "night", "today", "tomorrow", "yesterday"
-        ]:
-            return clean_word
+    threshold = LOCATION_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    if match.confidence < threshold:
+        # Weak guesses ("Thanks Bob") are not worth an OpenWeather call
+        print(f"Ignoring location candidate: {match.name} ({match.source}, confidence {match.confidence})")
+        return None
     
-    return None
+    print(f"Location candidate: {match.name} ({match.source}, confidence {match.confidence})")
+    return match.name
 
 
-def fetch_weather_data(location):
+def start_weather_fetch(location):
     """
-    Fetches weather data from OpenWeather API for a specific location.
+    Starts the current weather and forecast lookups for a location concurrently.
     
     Args:
         location (str): The location to fetch weather data for
         
+    Returns:
+        tuple: Pending lookups to pass to collect_weather_data
+    """
+    return (
+        location,
+        time.monotonic(),
+        submit_openweather("current", location),
+        submit_openweather("forecast", location)
+    )
+
+
+def collect_weather_data(pending):
+    """
+    Waits for lookups started by start_weather_fetch.
+    
+    Current conditions are required. The forecast is only waited for until
+    FORECAST_DEADLINE seconds after the lookups started; a slower forecast is
+    dropped from this turn (it still lands in the weather cache for the next one).
+    
+    Args:
+        pending (tuple): Value returned by start_weather_fetch
+        
     Returns:
         dict: Weather data for the location or error information
     """
+    location, started_at, current_future, forecast_future = pending
     try:
         # Fetch current weather
-        current_url = f"{OPENWEATHER_BASE_URL}/weather"
-        params = {
-            "q": location,
-            "appid": OPENWEATHER_API_KEY,
-            "units": "metric"  # Use metric units (Celsius)
-        }
+        status_code, current_data = current_future.result()
+        if status_code != 200:
+            return {"error": f"Weather API error: {status_code} - {current_data.get('message', 'Unknown error')}"}
         
-        response = requests.get(current_url, params=params)
-        if response.status_code != 200:
-            return {"error": f"Weather API error: {response.status_code} - {response.json().get('message', 'Unknown error')}"}
-        
-        current_data = response.json()
-        
-        # Fetch forecast (5 days / 3 hours)
-        forecast_url = f"{OPENWEATHER_BASE_URL}/forecast"
-        forecast_response = requests.get(forecast_url, params=params)
-        
-        if forecast_response.status_code != 200:
+        # Fetch forecast (5 days / 3 hours) within the remaining time budget
+        remaining = max(0.0, FORECAST_DEADLINE - (time.monotonic() - started_at))
+        try:
+            forecast_status, forecast_data = forecast_future.result(timeout=remaining)
+        except FutureTimeoutError:
+            print(f"Forecast for {location} missed the {FORECAST_DEADLINE}s deadline, using current conditions only")
             return {
                 "current": current_data,
-                "forecast_error": f"Forecast API error: {forecast_response.status_code}"
+                "forecast_error": "Forecast API timeout"
             }
         
-        forecast_data = forecast_response.json()
+        if forecast_status != 200:
+            return {
+                "current": current_data,
+                "forecast_error": f"Forecast API error: {forecast_status}"
+            }
         
         # Return combined weather data
         return {
@@ -120,6 +187,20 @@ def fetch_weather_data(location):
         return {"error": f"Error fetching weather data: {str(e)}"}
 
 
+def fetch_weather_data(location):
+    """
+    Fetches weather data from OpenWeather API for a specific location.
+    Current conditions and forecast are requested concurrently through the shared weather cache.
+    
+    Args:
+        location (str): The location to fetch weather data for
+        
+    Returns:
+        dict: Weather data for the location or error information
+    """
+    return collect_weather_data(start_weather_fetch(location))
+
+
 def format_weather_data_for_gemini(weather_data, location):
     """
     Formats weather data into a structured prompt for Gemini model.
@@ -242,6 +323,90 @@ Remember to present the information in a well-structured way, including:
         return f"Error formatting weather data: {str(e)}"
 
 
+def build_articuno_content_parts(user_input, image_data=None):
+    """
+    Builds the Gemini conversation for an Articuno.AI turn, including live weather data
+    when a location is detected in the message.
+    
+    Args:
+        user_input (str): The user's input message
+        image_data (dict, optional): Image data if provided
+        
+    Returns:
+        list: Content parts ready to pass to generate_content
+    """
+    # Check if the user input contains a location
+    location = detect_location_from_message(user_input)
+    
+    # If location found, start fetching weather data; the rest of the request is prepared meanwhile
+    pending_weather = None
+    weather_prompt = None
+    
+    if location:
+        print(f"Detected location: {location}")
+        pending_weather = start_weather_fetch(location)
+    
+    # Process the image data while the weather lookups are in flight
+    image_parts = None
+    if image_data:
+        image_format = image_data.get("format", "jpeg")
+        image_binary = base64.b64decode(image_data.get("data").split(",")[1])
+    
+        # Create image part for multimodal request
+        image_parts = [
+            {
+                "mime_type": f"image/{image_format}",
+                "data": image_binary
+            }
+        ]
+    
+    if pending_weather:
+        weather_data = collect_weather_data(pending_weather)
+        weather_prompt = format_weather_data_for_gemini(weather_data, location)
+        print(f"Formatted weather data: {weather_prompt}")
+    
+    # Handle messages with images
+    if image_parts:
+        # Prepare content parts with system instructions and weather data if available
+        if weather_prompt:
+            # Include weather data in the prompt
+            content_parts = [
+                {"role": "user", "parts": [{"text": WEATHER_SYSTEM_PROMPT}]},
+                {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
+                {"role": "user", "parts": [{"text": f"{user_input}\n\n{weather_prompt}"}, image_parts[0]]}
+            ]
+        else:
+            # No weather data, just use system prompt and user input
+            content_parts = [
+                {"role": "user", "parts": [{"text": WEATHER_SYSTEM_PROMPT}]},
+                {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
+                {"role": "user", "parts": [{"text": user_input}, image_parts[0]]}
+            ]
+    else:
+        # Text-only request
+        # If we have weather data, include it in the prompt
+        if weather_prompt:
+            content_parts = [
+                {"role": "user", "parts": [{"text": WEATHER_SYSTEM_PROMPT}]},
+                {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
+                {"role": "user", "parts": [{"text": f"{user_input}\n\n{weather_prompt}"}]}
+            ]
+        else:
+            # No location detected or weather data available
+            if not any(term in user_input.lower() for term in ['weather', 'temperature', 'forecast', 'rain', 'sunny', 'cloudy', 'wind', 'humidity', 'climate']):
+                enhanced_input = f"Regarding weather information: {user_input}"
+            else:
+                enhanced_input = user_input
+    
+            content_parts = [
+                {"role": "user", "parts": [{"text": WEATHER_SYSTEM_PROMPT}]},
+                {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
+                {"role": "user", "parts": [{"text": enhanced_input}]}
+            ]
+    
+    return content_parts
+
+
 def get_articuno_weather_response(user_input, image_data=None):
     """
     Get response from Articuno.AI weather assistant for web application.
@@ -254,148 +419,11 @@ def get_articuno_weather_response(user_input, image_data=None):
         dict: JSON response with HTML-formatted response or error
     """
     try:
-        # Configure the model
-        generation_config = {
-            "temperature": 0.7,
-            "top_p": 1,
-            "top_k": 32,
-            "max_output_tokens": 1000,
-        }
-        
-        # Create weather-focused system prompt
-        weather_system_prompt = """Welcome to Articuno.AI – your friendly weather assistant! ❄️
-You're here to help users explore weather updates with style, clarity, and a touch of personality 😊
-
-Your Role:
-
-You are a polite, knowledgeable, and conversational assistant that specializes in weather information.
-
-Your answers should be concise, friendly, and easy to understand – even for someone not familiar with weather terms.
-
-You may use emojis sparingly to enhance friendliness, but never in the middle of sentences.
-
-If a user shares a location, provide current weather info and a quick summary of the next 2–3 days.
-
-Always address the user's specific question about weather and provide helpful context based on the conditions.
-
-Provide practical advice based on the weather conditions (e.g., "Don't forget your umbrella!" for rain).
-
-Tone & Style:
-
-Be warm, responsive, and conversational - like a friendly meteorologist.
-
-Use short paragraphs and bullet points if helpful.
-
-End most responses with a gentle question or suggestion to keep the flow going.
-(e.g., "Would you like a forecast for the next few days?" or "Is there anything else about the weather you'd like to know?")
-
-Example Starters:
-
-🌤️ "Looks like it's sunny in [Location]! Want to know what's coming this weekend?"
-
-🌧️ "Rain ahead in [Location]! Don't forget your umbrella ☔ Ready for a 3-day forecast?"
-
-🌡️ "It's currently [Temperature]°C with light winds in [Location]. Want me to check humidity too?"
-
-Example Weather Report Format:
-For location-specific weather reports, format your response like this:
-
-🗺️ Weather Report for [Location]
-📅 Today: [Current Date]
-🌤️ Condition: [Weather Condition]
-🌡️ Temperature: [Temp]°C (Feels like [Feels Like]°C)
-💧 Humidity: [Humidity]%
-🌬️ Wind: [Wind Speed] km/h [Direction]
-🌅 Sunrise: [Sunrise Time]     🌇 Sunset: [Sunset Time]
-
-🔮 Three-Day Forecast
-[Include forecast data if available]
-
-[Your recommendations based on weather conditions]
-
-📌 Tip: [Practical advice like "Carry an umbrella; it may rain today."]
-
-This format is:
-- Clear and concise
-- Uses emojis tastefully to make it user-friendly
-- Includes actionable tips
-
-Special Cases:
-If the user asks about weather but doesn't specify a location, politely ask them for a location.
-If the user asks about non-weather topics, gently remind them that you're a weather specialist but still try to help.
-"""
-        
         # Create the model
-        model = genai.GenerativeModel(model_name="gemini-1.5-flash", generation_config=generation_config)
-        
-        # Check if the user input contains a location
-        location = detect_location_from_message(user_input)
+        model = genai.GenerativeModel(model_name="gemini-1.5-flash", generation_config=GENERATION_CONFIG)
         
-        # If location found, fetch weather data
-        weather_data = None
-        weather_prompt = None
-        
-        if location:
-            print(f"Detected location: {location}")
-            weather_data = fetch_weather_data(location)
-            weather_prompt = format_weather_data_for_gemini(weather_data, location)
-            print(f"Formatted weather data: {weather_prompt}")
-        
-        # Handle messages with images
-        if image_data:
-            # Process the image data
-            image_format = image_data.get("format", "jpeg")
-            image_binary = base64.b64decode(image_data.get("data").split(",")[1])
-            
-            # Create image part for multimodal request
-            image_parts = [
-                {
-                    "mime_type": f"image/{image_format}",
-                    "data": image_binary
-                }
-            ]
-            
-            # Prepare content parts with system instructions and weather data if available
-            if weather_prompt:
-                # Include weather data in the prompt
-                content_parts = [
-                    {"role": "user", "parts": [{"text": weather_system_prompt}]},
-                    {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
-                    {"role": "user", "parts": [{"text": f"{user_input}\n\n{weather_prompt}"}, image_parts[0]]}
-                ]
-            else:
-                # No weather data, just use system prompt and user input
-                content_parts = [
-                    {"role": "user", "parts": [{"text": weather_system_prompt}]},
-                    {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
-                    {"role": "user", "parts": [{"text": user_input}, image_parts[0]]}
-                ]
-            
-            # Generate response with both text and image
-            response = model.generate_content(content_parts)
-        else:
-            # Text-only request
-            # If we have weather data, include it in the prompt
-            if weather_prompt:
-                content_parts = [
-                    {"role": "user", "parts": [{"text": weather_system_prompt}]},
-                    {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
-                    {"role": "user", "parts": [{"text": f"{user_input}\n\n{weather_prompt}"}]}
-                ]
-            else:
-                # No location detected or weather data available
-                if not any(term in user_input.lower() for term in ['weather', 'temperature', 'forecast', 'rain', 'sunny', 'cloudy', 'wind', 'humidity', 'climate']):
-                    enhanced_input = f"Regarding weather information: {user_input}"
-                else:
-                    enhanced_input = user_input
-                
-                content_parts = [
-                    {"role": "user", "parts": [{"text": weather_system_prompt}]},
-                    {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
-                    {"role": "user", "parts": [{"text": enhanced_input}]}
-                ]
-            
-            response = model.generate_content(content_parts)
+        # Generate response with the weather-aware conversation
+        response = model.generate_content(build_articuno_content_parts(user_input, image_data))
         
         # Extract response text
         markdown_output = response.text
@@ -409,6 +437,44 @@ If the user asks about non-weather topics, gently remind them that you're a weat
         return jsonify({"error": f"Error with Articuno Weather API: {str(e)}"}), 500
 
 
+def stream_articuno_weather_response(user_input, image_data=None):
+    """
+    Stream response from Articuno.AI weather assistant for web application.
+
+    Args:
+        user_input (str): The user's input message
+        image_data (dict, optional): Image data if provided
+
+    Yields:
+        str: Markdown text deltas as they arrive from the model
+    """
+    model = genai.GenerativeModel(model_name="gemini-1.5-flash", generation_config=GENERATION_CONFIG)
+
+    content_parts = build_articuno_content_parts(user_input, image_data)
+    for chunk in model.generate_content(content_parts, stream=True):
+        if chunk.parts:
+            yield chunk.text
+
+
+async def get_articuno_weather_response_async(user_input, image_data=None):
+    """
+    Get response from Articuno.AI weather assistant without blocking the event loop.
+
+    Args:
+        user_input (str): The user's input message
+        image_data (dict, optional): Image data if provided
+
+    Returns:
+        str: The AI's response in markdown
+    """
+    model = genai.GenerativeModel(model_name="gemini-1.5-flash", generation_config=GENERATION_CONFIG)
+
+    # Location detection and the OpenWeather lookup are blocking, so they run in a worker thread
+    content_parts = await asyncio.to_thread(build_articuno_content_parts, user_input, image_data)
+    response = await model.generate_content_async(content_parts)
+    return response.text
+
+
 # For testing in terminal (when run directly)
 if __name__ == "__main__":
     test_message = "What's the weather in London?"
@@ -7,6 +7,6 @@ This package provides a modular implementation of Bikram.AI that uses:
 - Gemini 2.0 Flash for generation
 """
 
-from .agent import get_bikram_ai_response
+from .agent import get_bikram_ai_response, stream_bikram_ai_response
 
-__all__ = ['get_bikram_ai_response']
+__all__ = ['get_bikram_ai_response', 'stream_bikram_ai_response']
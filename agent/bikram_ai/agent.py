@@ -117,3 +117,33 @@ def get_bikram_ai_response(user_message: str) -> str:
         print(f"Error in get_bikram_ai_response: {error_details}")
         return f"Error: {str(e)}"
 
+
+def stream_bikram_ai_response(user_message: str):
+    """
+    Stream Bikram.AI's answer as markdown deltas.
+    
+    Tool calls (resume search, Wikipedia, package lookups) run as usual; only the
+    agent's own text is yielded. The caller is responsible for markdown rendering.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Yields:
+        str: Markdown text deltas as they arrive from the agent
+    """
+    agent = _get_agent()
+    
+    # Prepend system prompt to the user message for LangGraph
+    full_message = f"{BIKRAM_SYSTEM_PROMPT}\n\nUser: {user_message}"
+    
+    for chunk, metadata in agent.stream(
+        {"messages": [{"role": "user", "content": full_message}]},
+        stream_mode="messages"
+    ):
+        if chunk.__class__.__name__ != 'AIMessageChunk' or not chunk.content:
+            continue
+        content = chunk.content
+        if isinstance(content, list):
+            yield ''.join(str(item.get('text', '')) if isinstance(item, dict) else str(item) for item in content)
+        else:
+            yield str(content)
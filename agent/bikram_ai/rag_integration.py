@@ -20,11 +20,17 @@ RAG_TOP_K = 5
 
 # Try to import RAG dependencies using importlib
 try:
-    # Load embeddings module
-    embeddings_path = RAG_DIR_ABS / "app" / "utils" / "embeddings.py"
-    spec_embeddings = importlib.util.spec_from_file_location("rag_embeddings", embeddings_path)
-    embeddings_module = importlib.util.module_from_spec(spec_embeddings)
-    spec_embeddings.loader.exec_module(embeddings_module)
+    import sys as _sys
+    
+    # Load embeddings module (once per process, so the semantic cache and this tool
+    # share its query embedding cache)
+    embeddings_module = _sys.modules.get("rag_embeddings")
+    if embeddings_module is None:
+        embeddings_path = RAG_DIR_ABS / "app" / "utils" / "embeddings.py"
+        spec_embeddings = importlib.util.spec_from_file_location("rag_embeddings", embeddings_path)
+        embeddings_module = importlib.util.module_from_spec(spec_embeddings)
+        spec_embeddings.loader.exec_module(embeddings_module)
+        _sys.modules["rag_embeddings"] = embeddings_module
     embed_query = embeddings_module.embed_query
     
     # Load config module
@@ -39,7 +45,6 @@ try:
     vectorstore_module = importlib.util.module_from_spec(spec_vectorstore)
     
     # Create a mock app module with config that has the client
-    import sys as _sys
     mock_app = type('module', (), {})()
     mock_app.config = config_module
     _sys.modules['app'] = mock_app
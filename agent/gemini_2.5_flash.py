@@ -12,26 +12,15 @@ load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 genai.configure(api_key=GEMINI_API_KEY)
 
+GENERATION_CONFIG = {
+    "temperature": 0.9,
+    "top_p": 1,
+    "top_k": 32,
+    "max_output_tokens": 1000,
+}
 
-def get_gemini_flash_response(user_input, image_data=None):
-    """
-    Get response from Gemini 2.5 Flash model for web application.
-    """
-    try:
-        if not GEMINI_API_KEY:
-            return jsonify({"error": "Gemini API key not configured. Please set GEMINI_API_KEY in .env file."}), 500
-        
-        genai.configure(api_key=GEMINI_API_KEY)
-        
-        generation_config = {
-            "temperature": 0.9,
-            "top_p": 1,
-            "top_k": 32,
-            "max_output_tokens": 1000,
-        }
-        
-        # --- UPDATED SYSTEM PROMPT (2.5 Flash everywhere) ---
-        gemini_system_prompt = """You are Gemini 2.5 Flash, a fast and versatile AI assistant developed by Google. 
+# --- UPDATED SYSTEM PROMPT (2.5 Flash everywhere) ---
+GEMINI_SYSTEM_PROMPT = """You are Gemini 2.5 Flash, a fast and versatile AI assistant developed by Google. 
         You provide concise, accurate, and helpful responses on a wide range of topics.
         
         🧠 Identity
@@ -54,11 +43,22 @@ def get_gemini_flash_response(user_input, image_data=None):
         - Read text from images.
         - Mention when info is not visible.
         """
+
+
+def get_gemini_flash_response(user_input, image_data=None):
+    """
+    Get response from Gemini 2.5 Flash model for web application.
+    """
+    try:
+        if not GEMINI_API_KEY:
+            return jsonify({"error": "Gemini API key not configured. Please set GEMINI_API_KEY in .env file."}), 500
+        
+        genai.configure(api_key=GEMINI_API_KEY)
         
         # --- UPDATED MODEL NAME ---
         model = genai.GenerativeModel(
             model_name="gemini-2.5-flash",
-            generation_config=generation_config
+            generation_config=GENERATION_CONFIG
         )
         
         # If image provided
@@ -73,7 +73,7 @@ def get_gemini_flash_response(user_input, image_data=None):
             
             # --- UPDATED FLASH NAME IN MESSAGES ---
             content_parts = [
-                {"role": "user", "parts": [{"text": gemini_system_prompt}]},
+                {"role": "user", "parts": [{"text": GEMINI_SYSTEM_PROMPT}]},
                 {"role": "model", "parts": [{"text": "I understand. I'll be Gemini 2.5 Flash, your helpful assistant."}]},
                 {"role": "user", "parts": [{"text": user_input}, image_parts[0]]}
             ]
@@ -92,7 +92,7 @@ def get_gemini_flash_response(user_input, image_data=None):
         else:
             # Text-only
             content_parts = [
-                {"role": "user", "parts": [{"text": gemini_system_prompt}]},
+                {"role": "user", "parts": [{"text": GEMINI_SYSTEM_PROMPT}]},
                 {"role": "model", "parts": [{"text": "I understand. I'll be Gemini 2.5 Flash, your helpful assistant."}]},
                 {"role": "user", "parts": [{"text": user_input}]}
             ]
@@ -106,3 +106,64 @@ def get_gemini_flash_response(user_input, image_data=None):
     
     except Exception as e:
         return jsonify({"error": f"Error with Gemini API: {str(e)}"}), 500
+
+
+def stream_gemini_flash_response(user_input, image_data=None):
+    """
+    Stream response from Gemini 2.5 Flash model for web application.
+    """
+    if not GEMINI_API_KEY:
+        raise ValueError("Gemini API key not configured. Please set GEMINI_API_KEY in .env file.")
+    
+    model = genai.GenerativeModel(
+        model_name="gemini-2.5-flash",
+        generation_config=GENERATION_CONFIG
+    )
+    
+    user_parts = [{"text": user_input}]
+    if image_data:
+        image_format = image_data.get("format", "jpeg")
+        image_binary = base64.b64decode(image_data.get("data").split(",")[1])
+        user_parts.append({"mime_type": f"image/{image_format}", "data": image_binary})
+    
+    content_parts = [
+        {"role": "user", "parts": [{"text": GEMINI_SYSTEM_PROMPT}]},
+        {"role": "model", "parts": [{"text": "I understand. I'll be Gemini 2.5 Flash, your helpful assistant."}]},
+        {"role": "user", "parts": user_parts}
+    ]
+    
+    for chunk in model.generate_content(content_parts, stream=True):
+        if chunk.parts:
+            yield chunk.text
+
+
+async def get_gemini_flash_response_async(user_input, image_data=None):
+    """
+    Get response from Gemini 2.5 Flash model without blocking the event loop.
+    
+    Args:
+        user_input (str): The user's input message
+        image_data (dict, optional): Image data if provided
+        
+    Returns:
+        str: The AI's response in markdown
+    """
+    if not GEMINI_API_KEY:
+        raise ValueError("Gemini API key not configured. Please set GEMINI_API_KEY in .env file.")
+    
+    model = genai.GenerativeModel(model_name="gemini-2.5-flash", generation_config=GENERATION_CONFIG)
+    
+    user_parts = [{"text": user_input}]
+    if image_data:
+        image_format = image_data.get("format", "jpeg")
+        image_binary = base64.b64decode(image_data.get("data").split(",")[1])
+        user_parts.append({"mime_type": f"image/{image_format}", "data": image_binary})
+    
+    content_parts = [
+        {"role": "user", "parts": [{"text": GEMINI_SYSTEM_PROMPT}]},
+        {"role": "model", "parts": [{"text": "I understand. I'll be Gemini 2.5 Flash, your helpful assistant."}]},
+        {"role": "user", "parts": user_parts}
+    ]
+    
+    response = await model.generate_content_async(content_parts)
+    return response.text
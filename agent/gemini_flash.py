@@ -13,35 +13,16 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 genai.configure(api_key=GEMINI_API_KEY)
 
 
-def get_gemini_flash_response(user_input, image_data=None):
-    """
-    Get response from Gemini 2.0 Flash model for web application.
-    
-    Args:
-        user_input (str): The user's input message
-        image_data (dict, optional): Image data if provided
-        
-    Returns:
-        dict: JSON response with HTML-formatted response or error
-    """
-    try:
-        # Ensure we have the Gemini API key
-        if not GEMINI_API_KEY:
-            return jsonify({"error": "Gemini API key not configured. Please set GEMINI_API_KEY in .env file."}), 500
-        
-        # Configure Gemini with the API key
-        genai.configure(api_key=GEMINI_API_KEY)
-        
-        # Configure the model
-        generation_config = {
-            "temperature": 0.9,
-            "top_p": 1,
-            "top_k": 32,
-            "max_output_tokens": 1000,
-        }
-        
-        # Create system prompt for Gemini 2.0 Flash
-        gemini_system_prompt = """You are Gemini 2.0 Flash, a fast and versatile AI assistant developed by Google. 
+# Configure the model
+GENERATION_CONFIG = {
+    "temperature": 0.9,
+    "top_p": 1,
+    "top_k": 32,
+    "max_output_tokens": 1000,
+}
+
+# Create system prompt for Gemini 2.0 Flash
+GEMINI_SYSTEM_PROMPT = """You are Gemini 2.0 Flash, a fast and versatile AI assistant developed by Google. 
         You provide concise, accurate, and helpful responses on a wide range of topics.
         
         🧠 Identity
@@ -67,9 +48,29 @@ def get_gemini_flash_response(user_input, image_data=None):
         - Answer questions about the image content thoroughly.
         - If the user asks about something not visible in the image, politely mention that you can only comment on what's visible.
         """
+
+
+def get_gemini_flash_response(user_input, image_data=None):
+    """
+    Get response from Gemini 2.0 Flash model for web application.
+    
+    Args:
+        user_input (str): The user's input message
+        image_data (dict, optional): Image data if provided
+        
+    Returns:
+        dict: JSON response with HTML-formatted response or error
+    """
+    try:
+        # Ensure we have the Gemini API key
+        if not GEMINI_API_KEY:
+            return jsonify({"error": "Gemini API key not configured. Please set GEMINI_API_KEY in .env file."}), 500
+        
+        # Configure Gemini with the API key
+        genai.configure(api_key=GEMINI_API_KEY)
         
         # Create the model using the same method as Articuno.AI
-        model = genai.GenerativeModel(model_name="gemini-2.0-flash", generation_config=generation_config)
+        model = genai.GenerativeModel(model_name="gemini-2.0-flash", generation_config=GENERATION_CONFIG)
         
         # Handle messages with images
         if image_data:
@@ -87,7 +88,7 @@ def get_gemini_flash_response(user_input, image_data=None):
             
             # Prepare content parts with system instructions similar to Articuno.AI's approach
             content_parts = [
-                {"role": "user", "parts": [{"text": gemini_system_prompt}]},
+                {"role": "user", "parts": [{"text": GEMINI_SYSTEM_PROMPT}]},
                 {"role": "model", "parts": [{"text": "I understand. I'll be Gemini 2.0 Flash, your helpful assistant."}]},
                 {"role": "user", "parts": [{"text": user_input}, image_parts[0]]}
             ]
@@ -107,7 +108,7 @@ def get_gemini_flash_response(user_input, image_data=None):
         else:
             # Text-only request using the same content parts approach as Articuno.AI
             content_parts = [
-                {"role": "user", "parts": [{"text": gemini_system_prompt}]},
+                {"role": "user", "parts": [{"text": GEMINI_SYSTEM_PROMPT}]},
                 {"role": "model", "parts": [{"text": "I understand. I'll be Gemini 2.0 Flash, your helpful assistant."}]},
                 {"role": "user", "parts": [{"text": user_input}]}
             ]
@@ -125,3 +126,68 @@ def get_gemini_flash_response(user_input, image_data=None):
         return jsonify({"error": f"Error with Gemini API: {str(e)}"}), 500
 
    
+
+
+def stream_gemini_flash_response(user_input, image_data=None):
+    """
+    Stream response from Gemini 2.0 Flash model for web application.
+    
+    Args:
+        user_input (str): The user's input message
+        image_data (dict, optional): Image data if provided
+        
+    Yields:
+        str: Markdown text deltas as they arrive from the model
+    """
+    if not GEMINI_API_KEY:
+        raise ValueError("Gemini API key not configured. Please set GEMINI_API_KEY in .env file.")
+    
+    model = genai.GenerativeModel(model_name="gemini-2.0-flash", generation_config=GENERATION_CONFIG)
+    
+    user_parts = [{"text": user_input}]
+    if image_data:
+        image_format = image_data.get("format", "jpeg")
+        image_binary = base64.b64decode(image_data.get("data").split(",")[1])
+        user_parts.append({"mime_type": f"image/{image_format}", "data": image_binary})
+    
+    content_parts = [
+        {"role": "user", "parts": [{"text": GEMINI_SYSTEM_PROMPT}]},
+        {"role": "model", "parts": [{"text": "I understand. I'll be Gemini 2.0 Flash, your helpful assistant."}]},
+        {"role": "user", "parts": user_parts}
+    ]
+    
+    for chunk in model.generate_content(content_parts, stream=True):
+        if chunk.parts:
+            yield chunk.text
+
+
+async def get_gemini_flash_response_async(user_input, image_data=None):
+    """
+    Get response from Gemini 2.0 Flash model without blocking the event loop.
+    
+    Args:
+        user_input (str): The user's input message
+        image_data (dict, optional): Image data if provided
+        
+    Returns:
+        str: The AI's response in markdown
+    """
+    if not GEMINI_API_KEY:
+        raise ValueError("Gemini API key not configured. Please set GEMINI_API_KEY in .env file.")
+    
+    model = genai.GenerativeModel(model_name="gemini-2.0-flash", generation_config=GENERATION_CONFIG)
+    
+    user_parts = [{"text": user_input}]
+    if image_data:
+        image_format = image_data.get("format", "jpeg")
+        image_binary = base64.b64decode(image_data.get("data").split(",")[1])
+        user_parts.append({"mime_type": f"image/{image_format}", "data": image_binary})
+    
+    content_parts = [
+        {"role": "user", "parts": [{"text": GEMINI_SYSTEM_PROMPT}]},
+        {"role": "model", "parts": [{"text": "I understand. I'll be Gemini 2.0 Flash, your helpful assistant."}]},
+        {"role": "user", "parts": user_parts}
+    ]
+    
+    response = await model.generate_content_async(content_parts)
+    return response.text
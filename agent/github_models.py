@@ -0,0 +1,268 @@
+"""
+Shared client layer for GitHub Models (https://models.github.ai/inference)
+
+Every agent that talks to GitHub Models gets its client from here instead of
+building its own ChatCompletionsClient. Clients are shared per endpoint and
+credential, so all models in a worker reuse one pooled keep-alive session, one
+retry policy and one set of TLS connections.
+
+The async clients (azure.ai.inference.aio) used by the ASGI path are shared the
+same way, one per event loop, over a pooled aiohttp session.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from azure.ai.inference import ChatCompletionsClient
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.policies import AsyncRetryPolicy, RetryPolicy
+from azure.core.pipeline.transport import RequestsTransport
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+GITHUB_MODELS_ENDPOINT = "https://models.github.ai/inference"
+
+# Connection pool sizing (connections kept alive per host)
+POOL_CONNECTIONS = int(os.getenv("GITHUB_MODELS_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("GITHUB_MODELS_POOL_MAXSIZE", "32"))
+
+# Timeouts in seconds
+CONNECTION_TIMEOUT = float(os.getenv("GITHUB_MODELS_CONNECT_TIMEOUT", "10"))
+DEFAULT_READ_TIMEOUT = float(os.getenv("GITHUB_MODELS_READ_TIMEOUT", "120"))
+
+# Retry on throttling and transient server errors with jittered exponential backoff
+RETRY_TOTAL = int(os.getenv("GITHUB_MODELS_RETRY_TOTAL", "3"))
+RETRY_BACKOFF_FACTOR = float(os.getenv("GITHUB_MODELS_RETRY_BACKOFF", "0.8"))
+RETRY_BACKOFF_MAX = float(os.getenv("GITHUB_MODELS_RETRY_BACKOFF_MAX", "30"))
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# Per-model read timeouts; long-form and reasoning models get a larger budget
+MODEL_READ_TIMEOUTS = {
+    "gpt-4o": 180,
+    "deepseek/DeepSeek-V3-0324": 180,
+    "meta/Llama-3.3-70B-Instruct": 180,
+    "microsoft/Phi-4-mini-reasoning": 180,
+}
+
+
+def _parse_timeout_overrides(value: Optional[str]) -> Dict[str, float]:
+    """
+    Parse GITHUB_MODELS_READ_TIMEOUTS, e.g. "grok-3=60,gpt-4o=240"
+    """
+    overrides = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        model, seconds = item.rsplit("=", 1)
+        try:
+            overrides[model.strip()] = float(seconds)
+        except ValueError:
+            print(f"Ignoring invalid timeout override: {item}")
+    return overrides
+
+
+MODEL_READ_TIMEOUTS.update(_parse_timeout_overrides(os.getenv("GITHUB_MODELS_READ_TIMEOUTS")))
+
+
+class _FullJitterMixin:
+    """Full jitter on top of azure-core's exponential backoff"""
+
+    def get_backoff_time(self, settings):
+        backoff = super().get_backoff_time(settings)
+        return random.uniform(0, backoff) if backoff else 0
+
+
+class JitteredRetryPolicy(_FullJitterMixin, RetryPolicy):
+    """Retry policy for the sync clients"""
+
+
+class JitteredAsyncRetryPolicy(_FullJitterMixin, AsyncRetryPolicy):
+    """Retry policy for the async clients"""
+
+
+def _retry_settings() -> Dict:
+    return {
+        "retry_total": RETRY_TOTAL,
+        "retry_backoff_factor": RETRY_BACKOFF_FACTOR,
+        "retry_backoff_max": RETRY_BACKOFF_MAX,
+        "retry_on_status_codes": RETRY_STATUS_CODES,
+    }
+
+
+def _create_session() -> requests.Session:
+    """Create a keep-alive session with a sized connection pool"""
+    session = requests.Session()
+    # Retries are handled by the pipeline's retry policy, not by urllib3
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_clients: Dict[Tuple[str, str], ChatCompletionsClient] = {}
+_clients_lock = threading.Lock()
+
+
+def _get_shared_client(endpoint: str, token: str) -> ChatCompletionsClient:
+    """Get or create the ChatCompletionsClient for an endpoint and credential"""
+    # Key on a digest so raw tokens are not kept as dict keys
+    key = (endpoint, hashlib.sha256(token.encode("utf-8")).hexdigest())
+
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = ChatCompletionsClient(
+                    endpoint=endpoint,
+                    credential=AzureKeyCredential(token),
+                    transport=RequestsTransport(
+                        session=_create_session(),
+                        session_owner=False,
+                        connection_timeout=CONNECTION_TIMEOUT,
+                        read_timeout=DEFAULT_READ_TIMEOUT,
+                    ),
+                    retry_policy=JitteredRetryPolicy(**_retry_settings()),
+                )
+                _clients[key] = client
+
+    return client
+
+
+class ModelClient:
+    """A model's view of a shared client that applies the model's timeouts"""
+
+    def __init__(self, client: ChatCompletionsClient, model: str, read_timeout: float):
+        self._client = client
+        self.model = model
+        self.read_timeout = read_timeout
+
+    def complete(self, **kwargs):
+        """Same as ChatCompletionsClient.complete, with this model's defaults applied"""
+        kwargs.setdefault("model", self.model)
+        kwargs.setdefault("connection_timeout", CONNECTION_TIMEOUT)
+        kwargs.setdefault("read_timeout", self.read_timeout)
+        return self._client.complete(**kwargs)
+
+
+# Async clients and their aiohttp sessions are bound to the loop that created them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict]" = weakref.WeakKeyDictionary()
+
+
+def _get_shared_async_client(endpoint: str, token: str):
+    """Get or create the async ChatCompletionsClient for the running event loop"""
+    # Imported here so sync-only deployments do not need aiohttp
+    import aiohttp
+    from azure.ai.inference.aio import ChatCompletionsClient as AsyncChatCompletionsClient
+    from azure.core.pipeline.transport import AioHttpTransport
+
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    key = (endpoint, hashlib.sha256(token.encode("utf-8")).hexdigest())
+
+    entry = clients.get(key)
+    if entry is None:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=POOL_MAXSIZE))
+        client = AsyncChatCompletionsClient(
+            endpoint=endpoint,
+            credential=AzureKeyCredential(token),
+            transport=AioHttpTransport(
+                session=session,
+                session_owner=False,
+                connection_timeout=CONNECTION_TIMEOUT,
+                read_timeout=DEFAULT_READ_TIMEOUT,
+            ),
+            retry_policy=JitteredAsyncRetryPolicy(**_retry_settings()),
+        )
+        entry = (client, session)
+        clients[key] = entry
+
+    return entry[0]
+
+
+async def close_async_clients():
+    """Close the async clients and aiohttp sessions created on the running event loop"""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client, session in clients.values():
+        try:
+            await client.close()
+            await session.close()
+        except Exception as e:
+            print(f"Error closing GitHub Models client: {str(e)}")
+
+
+class AsyncModelClient:
+    """Async counterpart of ModelClient; resolves the shared client of the running loop"""
+
+    def __init__(self, endpoint: str, token: str, model: str, read_timeout: float):
+        self.endpoint = endpoint
+        self._token = token
+        self.model = model
+        self.read_timeout = read_timeout
+
+    async def complete(self, **kwargs):
+        """Same as the async ChatCompletionsClient.complete, with this model's defaults applied"""
+        kwargs.setdefault("model", self.model)
+        kwargs.setdefault("connection_timeout", CONNECTION_TIMEOUT)
+        kwargs.setdefault("read_timeout", self.read_timeout)
+        client = _get_shared_async_client(self.endpoint, self._token)
+        return await client.complete(**kwargs)
+
+
+def _resolve_token(token: Optional[str]) -> str:
+    token = token or os.getenv("GITHUB_TOKEN")
+    if not token:
+        raise ValueError("GITHUB_TOKEN not found in environment variables. Please set it in the .env file.")
+    return token
+
+
+def get_chat_client(model: str, endpoint: str = GITHUB_MODELS_ENDPOINT, token: Optional[str] = None) -> ModelClient:
+    """
+    Get a pooled chat client for a GitHub Models model
+
+    Args:
+        model: Model name, used for per-model timeouts and as the default model
+        endpoint: Inference endpoint
+        token: API token (defaults to GITHUB_TOKEN)
+
+    Returns:
+        ModelClient backed by the shared client for this endpoint and token
+
+    Raises:
+        ValueError: If no token is available
+    """
+    token = _resolve_token(token)
+    read_timeout = MODEL_READ_TIMEOUTS.get(model, DEFAULT_READ_TIMEOUT)
+    return ModelClient(_get_shared_client(endpoint, token), model, read_timeout)
+
+
+def get_async_chat_client(model: str, endpoint: str = GITHUB_MODELS_ENDPOINT, token: Optional[str] = None) -> AsyncModelClient:
+    """
+    Get an async chat client for a GitHub Models model
+
+    Safe to create at import time: the underlying azure.ai.inference.aio client
+    and its aiohttp session are created on first use inside the running loop.
+
+    Args:
+        model: Model name, used for per-model timeouts and as the default model
+        endpoint: Inference endpoint
+        token: API token (defaults to GITHUB_TOKEN)
+
+    Returns:
+        AsyncModelClient whose complete() must be awaited
+
+    Raises:
+        ValueError: If no token is available
+    """
+    token = _resolve_token(token)
+    read_timeout = MODEL_READ_TIMEOUTS.get(model, DEFAULT_READ_TIMEOUT)
+    return AsyncModelClient(endpoint, token, model, read_timeout)
@@ -2,9 +2,8 @@ import os
 import markdown
 from flask import jsonify
 from dotenv import load_dotenv
-from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
+from agent.github_models import get_chat_client, get_async_chat_client
 
 # Load environment variables
 load_dotenv()
@@ -16,28 +15,12 @@ token = os.getenv("GITHUB_TOKEN")
 if not token:
     raise ValueError("GITHUB_TOKEN not found in environment variables. Please set it in the .env file.")
 
-# Initialize the client
-client = ChatCompletionsClient(
-    endpoint=endpoint,
-    credential=AzureKeyCredential(token),
-)
+# Shared, pooled client for GitHub Models
+client = get_chat_client(model, endpoint=endpoint, token=token)
+async_client = get_async_chat_client(model, endpoint=endpoint, token=token)
 
 
-def get_gpt4o_response(user_message, image_data=None):
-    """
-    Get response from GPT-4o model for web application.
-    
-    Args:
-        user_message (str): The user's input message
-        image_data (dict, optional): Image data if provided (not supported yet for GitHub Models)
-        
-    Returns:
-        dict: JSON response with HTML-formatted response or error
-    """
-    try:
-        response = client.complete(
-            messages=[
-                SystemMessage("""You are GPT-4o, an advanced AI assistant developed by OpenAI. You excel at understanding complex queries and providing detailed, accurate responses across a wide range of topics.
+SYSTEM_PROMPT = """You are GPT-4o, an advanced AI assistant developed by OpenAI. You excel at understanding complex queries and providing detailed, accurate responses across a wide range of topics.
 
                                 🧠 Identity
                                 Name: GPT-4o
@@ -55,7 +38,23 @@ def get_gpt4o_response(user_message, image_data=None):
                                 - Be comprehensive yet concise in your explanations.
                                 - Provide practical examples when explaining complex concepts.
                                 - Format your responses with proper markdown for better readability.
-                            """),
+                            """
+
+def get_gpt4o_response(user_message, image_data=None):
+    """
+    Get response from GPT-4o model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        image_data (dict, optional): Image data if provided (not supported yet for GitHub Models)
+        
+    Returns:
+        dict: JSON response with HTML-formatted response or error
+    """
+    try:
+        response = client.complete(
+            messages=[
+                SystemMessage(SYSTEM_PROMPT),
                 UserMessage(user_message),
             ],
             model=model
@@ -87,6 +86,49 @@ def get_gpt4o_response(user_message, image_data=None):
         return jsonify({"error": f"Error with GPT-4o: {str(e)}"}), 500
 
 
+def stream_gpt4o_response(user_message, image_data=None):
+    """
+    Stream response from GPT-4o model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        image_data (dict, optional): Image data if provided (not supported yet for GitHub Models)
+        
+    Yields:
+        str: Markdown text deltas as they arrive from the model
+    """
+    response = client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        model=model,
+        stream=True
+    )
+    for update in response:
+        if update.choices and update.choices[0].delta and update.choices[0].delta.content:
+            yield update.choices[0].delta.content
+
+async def get_gpt4o_response_async(user_message, image_data=None):
+    """
+    Get response from GPT-4o model without blocking the event loop.
+    
+    Args:
+        user_message (str): The user's input message
+        image_data (dict, optional): Image data if provided (not supported yet for GitHub Models)
+        
+    Returns:
+        str: The AI's response in markdown
+    """
+    response = await async_client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        model=model
+    )
+    return response.choices[0].message.content
+
 # For testing in terminal (when run directly)
 if __name__ == "__main__":
     test_message = "What is the capital of France?"
@@ -1,8 +1,7 @@
 import os
 from dotenv import load_dotenv
-from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
+from agent.github_models import get_chat_client, get_async_chat_client
 
 # Load environment variables
 load_dotenv()
@@ -14,11 +13,11 @@ token = os.getenv("GITHUB_TOKEN")
 if not token:
     raise ValueError("GITHUB_TOKEN not found in environment variables. Please set it in the .env file.")
 
-# Initialize the client
-client = ChatCompletionsClient(
-    endpoint=endpoint,
-    credential=AzureKeyCredential(token),
-)
+# Shared, pooled client for GitHub Models
+client = get_chat_client(model, endpoint=endpoint, token=token)
+async_client = get_async_chat_client(model, endpoint=endpoint, token=token)
+
+SYSTEM_PROMPT = "You are GPT-4o-mini, a helpful, intelligent, and friendly AI assistant developed by OpenAI. You provide accurate, thoughtful, and well-structured responses across a wide range of topics. Format your responses with proper markdown for better readability."
 
 def get_gpt4o_mini_response(user_message):
     """
@@ -33,7 +32,7 @@ def get_gpt4o_mini_response(user_message):
     try:
         response = client.complete(
             messages=[
-                SystemMessage("You are GPT-4o-mini, a helpful, intelligent, and friendly AI assistant developed by OpenAI. You provide accurate, thoughtful, and well-structured responses across a wide range of topics. Format your responses with proper markdown for better readability."),
+                SystemMessage(SYSTEM_PROMPT),
                 UserMessage(user_message),
             ],
             model=model
@@ -42,6 +41,47 @@ def get_gpt4o_mini_response(user_message):
     except Exception as e:
         return f"Error: {str(e)}"
 
+def stream_gpt4o_mini_response(user_message):
+    """
+    Stream response from GPT-4o-mini model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Yields:
+        str: Markdown text deltas as they arrive from the model
+    """
+    response = client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        model=model,
+        stream=True
+    )
+    for update in response:
+        if update.choices and update.choices[0].delta and update.choices[0].delta.content:
+            yield update.choices[0].delta.content
+
+async def get_gpt4o_mini_response_async(user_message):
+    """
+    Get response from GPT-4o-mini model without blocking the event loop.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Returns:
+        str: The AI's response in markdown
+    """
+    response = await async_client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        model=model
+    )
+    return response.choices[0].message.content
+
 # For testing in terminal (when run directly)
 if __name__ == "__main__":
     test_message = "What is the capital of France?"
@@ -1,7 +1,6 @@
 import os
-from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
+from agent.github_models import get_chat_client, get_async_chat_client
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,26 +13,11 @@ token = os.getenv("GITHUB_TOKEN")
 if not token:
     raise ValueError("GITHUB_TOKEN not found in environment variables. Please set it in the .env file.")
 
-# Initialize the client
-client = ChatCompletionsClient(
-    endpoint=endpoint,
-    credential=AzureKeyCredential(token),
-)
+# Shared, pooled client for GitHub Models
+client = get_chat_client(model, endpoint=endpoint, token=token)
+async_client = get_async_chat_client(model, endpoint=endpoint, token=token)
 
-def get_grok3_mini_response(user_message):
-    """
-    Get response from Grok-3 Mini model for web application.
-    
-    Args:
-        user_message (str): The user's input message
-        
-    Returns:
-        str: The AI's response
-    """
-    try:
-        response = client.complete(
-            messages=[
-                SystemMessage("""You are Grok-3 Mini, a compact yet powerful AI assistant developed by xAI. 
+SYSTEM_PROMPT = """You are Grok-3 Mini, a compact yet powerful AI assistant developed by xAI. 
                 You're the little sibling of Grok-3, offering quick, witty, and intelligent responses. 
                 Despite being smaller, you pack a punch with your knowledge and personality!
                 
@@ -55,7 +39,22 @@ def get_grok3_mini_response(user_message):
                 - Be helpful and accurate while being fun
                 - Challenge ideas when appropriate with a playful edge
                 - Format your responses with proper markdown for better readability
-                """),
+                """
+
+def get_grok3_mini_response(user_message):
+    """
+    Get response from Grok-3 Mini model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Returns:
+        str: The AI's response
+    """
+    try:
+        response = client.complete(
+            messages=[
+                SystemMessage(SYSTEM_PROMPT),
                 UserMessage(user_message),
             ],
             temperature=1.0,
@@ -66,6 +65,51 @@ def get_grok3_mini_response(user_message):
     except Exception as e:
         return f"Error: {str(e)}"
 
+def stream_grok3_mini_response(user_message):
+    """
+    Stream response from Grok-3 Mini model for web application.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Yields:
+        str: Markdown text deltas as they arrive from the model
+    """
+    response = client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        temperature=1.0,
+        top_p=1.0,
+        model=model,
+        stream=True
+    )
+    for update in response:
+        if update.choices and update.choices[0].delta and update.choices[0].delta.content:
+            yield update.choices[0].delta.content
+
+async def get_grok3_mini_response_async(user_message):
+    """
+    Get response from Grok-3 Mini model without blocking the event loop.
+    
+    Args:
+        user_message (str): The user's input message
+        
+    Returns:
+        str: The AI's response in markdown
+    """
+    response = await async_client.complete(
+        messages=[
+            SystemMessage(SYSTEM_PROMPT),
+            UserMessage(user_message),
+        ],
+        temperature=1.0,
+        top_p=1.0,
+        model=model
+    )
+    return response.choices[0].message.content
+
 # For testing in terminal (when run directly)
 if __name__ == "__main__":
     test_message = "What is the capital of France?"
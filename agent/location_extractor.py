@@ -0,0 +1,282 @@
+"""
+Location extraction for Articuno.AI
+
+Finds the place a weather question is about in a single pass over the message.
+A precompiled tokenizer splits the text into words, known city and country
+names (agent/data/gazetteer.txt) are matched through a token trie, and cue words
+("weather in ...", "... forecast") pick up places the gazetteer does not know.
+Every candidate carries a confidence score, so callers can skip weather lookups
+on weak guesses.
+"""
+
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / "data" / "gazetteer.txt"
+
+# Pasted text beyond this point is not scanned
+MAX_MESSAGE_CHARS = 4000
+
+# Longest run of words taken as an unknown place name ("Port Blair", "Santa Cruz de Tenerife" is cut)
+MAX_CANDIDATE_WORDS = 3
+
+# Words (letters with inner apostrophes/hyphens) and the punctuation that separates phrases
+_TOKEN_RE = re.compile(r"(?P<word>[^\W\d_]+(?:['’-][^\W\d_]+)*)|(?P<punct>[.,;:!?()\[\]{}\"|/\n])")
+_SENTENCE_END = frozenset(".!?\n")
+
+# Prepositions that introduce a place: "weather in London", "forecast for Pune"
+LOCATION_PREPOSITIONS = frozenset({"in", "at", "for", "near", "around"})
+
+# Words that make a message a weather question
+WEATHER_TERMS = frozenset({
+    "weather", "forecast", "forecasts", "temperature", "temperatures", "climate",
+    "humidity", "humid", "wind", "windy", "conditions", "rain", "raining", "rainy",
+    "sunny", "cloudy", "snow", "snowing", "storm", "degrees", "hot", "cold"
+})
+
+STOPWORDS = frozenset({
+    "a", "an", "the", "and", "or", "but", "of", "to", "on", "with", "from", "by",
+    "i", "me", "my", "we", "us", "our", "you", "your", "it", "its", "it's", "there",
+    "here", "is", "are", "was", "were", "be", "been", "am", "do", "does", "did",
+    "what", "what's", "where", "when", "why", "how", "how's", "which", "who",
+    "can", "could", "would", "should", "will", "shall", "may", "might", "must",
+    "this", "that", "these", "those", "some", "any", "much", "many", "very",
+    "give", "show", "tell", "get", "check", "know", "want", "like", "need",
+    "about", "please", "thanks", "thank", "hello", "hi", "hey", "ok", "okay",
+    "yes", "no", "not", "just", "also", "now", "right", "currently", "today",
+    "today's", "tonight", "tomorrow", "yesterday", "week", "weekend", "next",
+    "later", "outside", "out", "going", "good", "morning", "afternoon", "evening",
+    "night", "report", "update", "articuno",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "january", "february", "march", "april", "june", "july", "august",
+    "september", "october", "november", "december"
+}) | LOCATION_PREPOSITIONS | WEATHER_TERMS
+
+# Base confidence by how a candidate was found
+GAZETTEER_CONFIDENCE = 0.8
+CUED_CONFIDENCE = 0.6
+BARE_CONFIDENCE = 0.5
+CAPITALIZED_CONFIDENCE = 0.3
+
+# Added when the place is introduced by a preposition or followed by a weather word
+CUE_BONUS = 0.15
+# Added when the message is a weather question at all
+WEATHER_BONUS = 0.05
+# Removed from unknown names typed in lowercase
+LOWERCASE_PENALTY = 0.1
+# Used instead of GAZETTEER_CONFIDENCE for names that are also common words ("Nice to meet you")
+AMBIGUOUS_CONFIDENCE = 0.3
+
+
+class LocationMatch(NamedTuple):
+    """A place found in a message"""
+    name: str
+    confidence: float
+    source: str  # 'gazetteer', 'cue', 'bare' or 'capitalized'
+
+
+class _Token(NamedTuple):
+    text: str
+    key: str  # casefolded, possessive stripped
+    capitalized: bool
+    joined: bool  # no punctuation between this token and the previous one
+    sentence_start: bool
+
+
+def tokenize(message: str) -> List[_Token]:
+    """
+    Split a message into word tokens
+
+    Args:
+        message: Text to split
+
+    Returns:
+        Word tokens; punctuation only marks phrase boundaries
+    """
+    tokens = []
+    joined = False
+    sentence_start = True
+
+    for match in _TOKEN_RE.finditer(message):
+        punct = match.group("punct")
+        if punct:
+            joined = False
+            sentence_start = sentence_start or punct in _SENTENCE_END
+            continue
+
+        text = match.group("word")
+        key = text.casefold().replace("’", "'")
+        if key.endswith("'s") and key not in STOPWORDS:
+            key = key[:-2]
+
+        tokens.append(_Token(text, key, text[0].isupper(), joined, sentence_start))
+        joined = True
+        sentence_start = False
+
+    return tokens
+
+
+class Gazetteer:
+    """Known place names, indexed as a trie over casefolded words"""
+
+    def __init__(self, names=()):
+        """
+        Initialize the index
+
+        Args:
+            names: Place names; a trailing * means the name only matches when capitalized
+        """
+        self._root: Dict = {}
+        self.size = 0
+        for name in names:
+            self.add(name)
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH) -> "Gazetteer":
+        """Read one name per line, ignoring blank lines and # comments"""
+        with open(path, encoding="utf-8") as f:
+            return cls(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#"))
+
+    def add(self, name: str):
+        caps_only = name.endswith("*")
+        name = name.rstrip("*").strip()
+        keys = [token.key for token in tokenize(name)]
+        if not keys:
+            return
+
+        node = self._root
+        for key in keys:
+            node = node.setdefault(key, {})
+        if None not in node:
+            self.size += 1
+        node[None] = (name, caps_only)
+
+    def match(self, tokens: List[_Token], start: int) -> Tuple[int, Optional[str], bool]:
+        """
+        Find the longest name starting at tokens[start]
+
+        Args:
+            tokens: Tokens from tokenize
+            start: Index of the first word
+
+        Returns:
+            (index after the match, canonical name, whether the name is also a common word),
+            or (start, None, False) if nothing matches
+        """
+        node = self._root
+        end, name, ambiguous = start, None, False
+
+        for i in range(start, len(tokens)):
+            if i > start and not tokens[i].joined:
+                break
+            node = node.get(tokens[i].key)
+            if node is None:
+                break
+            entry = node.get(None)
+            if entry and (not entry[1] or tokens[start].capitalized):
+                end, name, ambiguous = i + 1, entry[0], entry[1]
+
+        return end, name, ambiguous
+
+
+def _candidate_end(tokens: List[_Token], start: int) -> int:
+    """End of the run of non-stopwords starting at tokens[start]"""
+    end = start
+    while (end < len(tokens) and end - start < MAX_CANDIDATE_WORDS
+           and tokens[end].key not in STOPWORDS
+           and (end == start or tokens[end].joined)):
+        end += 1
+    return end
+
+
+def extract_location(message: str, gazetteer: Optional[Gazetteer] = None) -> Optional[LocationMatch]:
+    """
+    Find the most likely place a message is about
+
+    Args:
+        message: The user's message
+        gazetteer: Place index (defaults to the bundled gazetteer)
+
+    Returns:
+        Best LocationMatch, or None if nothing looks like a place
+    """
+    if not message:
+        return None
+
+    gazetteer = gazetteer or get_gazetteer()
+    tokens = tokenize(message[:MAX_MESSAGE_CHARS])
+    weather_bonus = WEATHER_BONUS if any(token.key in WEATHER_TERMS for token in tokens) else 0.0
+
+    best: Optional[LocationMatch] = None
+    weather_seen = False
+    i = 0
+
+    while i < len(tokens):
+        token = tokens[i]
+        if token.key in WEATHER_TERMS:
+            weather_seen = True
+
+        previous = tokens[i - 1].key if i and token.joined else None
+        introduced = previous in LOCATION_PREPOSITIONS or (previous == "of" and weather_seen)
+
+        end, name, ambiguous = gazetteer.match(tokens, i)
+        if name:
+            source, confidence = "gazetteer", AMBIGUOUS_CONFIDENCE if ambiguous else GAZETTEER_CONFIDENCE
+        elif token.key in STOPWORDS or len(token.key) < 2:
+            i += 1
+            continue
+        else:
+            end = _candidate_end(tokens, i)
+            name = " ".join(t.text for t in tokens[i:end])
+            if introduced or (end < len(tokens) and tokens[end].joined and tokens[end].key in WEATHER_TERMS):
+                source, confidence = "cue", CUED_CONFIDENCE
+            elif i == 0 and end == len(tokens):
+                # The whole message is the name: "Tokyo"
+                source, confidence = "bare", BARE_CONFIDENCE
+            elif token.capitalized and not token.sentence_start and len(token.key) >= 3:
+                source, confidence = "capitalized", CAPITALIZED_CONFIDENCE
+            else:
+                i = end
+                continue
+
+            if not token.capitalized:
+                confidence -= LOWERCASE_PENALTY
+
+        followed_by_weather = end < len(tokens) and tokens[end].joined and tokens[end].key in WEATHER_TERMS
+        if source == "gazetteer" and (introduced or followed_by_weather):
+            confidence = max(confidence, GAZETTEER_CONFIDENCE) + CUE_BONUS
+
+        confidence = round(min(confidence + weather_bonus, 0.99), 2)
+        if best is None or confidence > best.confidence:
+            best = LocationMatch(name, confidence, source)
+
+        i = end
+
+    return best
+
+
+# Singleton instance
+_gazetteer_instance = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer() -> Gazetteer:
+    """
+    Get or load the bundled Gazetteer
+
+    Returns:
+        Gazetteer instance
+    """
+    global _gazetteer_instance
+
+    if _gazetteer_instance is None:
+        with _gazetteer_lock:
+            if _gazetteer_instance is None:
+                try:
+                    _gazetteer_instance = Gazetteer.load()
+                except OSError as e:
+                    print(f"Gazetteer unavailable, using cue words only: {str(e)}")
+                    _gazetteer_instance = Gazetteer()
+
+    return _gazetteer_instance
@@ -0,0 +1,145 @@
+"""
+OpenWeather client shared by Articuno.AI and the /api/weather route
+
+Responses are cached per location (see cache/weather_cache.py), and concurrent
+lookups of the same location share one upstream request.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from cache import get_weather_cache
+
+# Load environment variables
+load_dotenv()
+
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+OPENWEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5"
+OPENWEATHER_TIMEOUT = float(os.getenv("OPENWEATHER_TIMEOUT", "10"))
+OPENWEATHER_WORKERS = int(os.getenv("OPENWEATHER_WORKERS", "8"))
+
+# OpenWeather endpoint for each kind of data
+WEATHER_ENDPOINTS = {
+    "current": "weather",
+    "forecast": "forecast"
+}
+
+# OpenWeather refreshes current conditions about every 10 minutes and forecasts every 3 hours
+weather_cache = get_weather_cache(
+    current_ttl=float(os.getenv("WEATHER_CURRENT_TTL", "600")),
+    forecast_ttl=float(os.getenv("WEATHER_FORECAST_TTL", "1800")),
+    max_entries=int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "1000"))
+)
+
+
+# Keep-alive connections to OpenWeather, shared by all lookups
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=OPENWEATHER_WORKERS))
+
+# Runs lookups in the background so callers can issue several at once
+_executor = ThreadPoolExecutor(max_workers=OPENWEATHER_WORKERS, thread_name_prefix="openweather")
+
+
+def build_weather_params(location=None, lat=None, lon=None):
+    """
+    Builds OpenWeather query parameters for a city name or coordinates.
+
+    Args:
+        location (str, optional): City name
+        lat (str, optional): Latitude, used when no location is given
+        lon (str, optional): Longitude, used when no location is given
+
+    Returns:
+        dict: Query parameters
+    """
+    params = {
+        "appid": OPENWEATHER_API_KEY or "",
+        "units": "metric"  # Use metric units (Celsius)
+    }
+
+    if location:
+        params["q"] = location
+    else:
+        params["lat"] = lat
+        params["lon"] = lon
+
+    return params
+
+
+def _parse_body(status_code, body):
+    """OpenWeather errors are JSON too, but proxies may answer with plain text."""
+    if isinstance(body, dict):
+        return status_code, body
+    return status_code, {"message": str(body)[:200]}
+
+
+def fetch_openweather(kind, location=None, lat=None, lon=None):
+    """
+    Fetches current conditions or the forecast, going through the weather cache.
+
+    Args:
+        kind (str): 'current' or 'forecast'
+        location (str, optional): City name
+        lat (str, optional): Latitude, used when no location is given
+        lon (str, optional): Longitude, used when no location is given
+
+    Returns:
+        tuple: (HTTP status code, JSON data)
+    """
+    url = f"{OPENWEATHER_BASE_URL}/{WEATHER_ENDPOINTS[kind]}"
+
+    def fetch():
+        response = _session.get(url, params=build_weather_params(location, lat, lon), timeout=OPENWEATHER_TIMEOUT)
+        try:
+            return _parse_body(response.status_code, response.json())
+        except ValueError:
+            return _parse_body(response.status_code, response.text)
+
+    key = weather_cache.make_key(kind, location, lat, lon)
+    return weather_cache.get_or_fetch(key, kind, fetch)
+
+
+def submit_openweather(kind, location=None, lat=None, lon=None):
+    """
+    Starts fetch_openweather in the background.
+
+    Args:
+        kind (str): 'current' or 'forecast'
+        location (str, optional): City name
+        lat (str, optional): Latitude, used when no location is given
+        lon (str, optional): Longitude, used when no location is given
+
+    Returns:
+        concurrent.futures.Future: Resolves to (HTTP status code, JSON data)
+    """
+    return _executor.submit(fetch_openweather, kind, location, lat, lon)
+
+
+async def fetch_openweather_async(session, kind, location=None, lat=None, lon=None):
+    """
+    Async counterpart of fetch_openweather over an aiohttp session.
+
+    Args:
+        session (aiohttp.ClientSession): Session used for the upstream request
+        kind (str): 'current' or 'forecast'
+        location (str, optional): City name
+        lat (str, optional): Latitude, used when no location is given
+        lon (str, optional): Longitude, used when no location is given
+
+    Returns:
+        tuple: (HTTP status code, JSON data)
+    """
+    url = f"{OPENWEATHER_BASE_URL}/{WEATHER_ENDPOINTS[kind]}"
+
+    async def fetch():
+        async with session.get(url, params=build_weather_params(location, lat, lon)) as response:
+            try:
+                return _parse_body(response.status, await response.json(content_type=None))
+            except ValueError:
+                return _parse_body(response.status, await response.text())
+
+    key = weather_cache.make_key(kind, location, lat, lon)
+    return await weather_cache.get_or_fetch_async(key, kind, fetch)
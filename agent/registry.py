@@ -0,0 +1,291 @@
+"""
+Model registry for Articuno.AI
+
+Maps bot names to their agent backends. Each backend module is imported only the
+first time the bot is used, so a worker only pays for the SDKs (azure-ai-inference,
+google-generativeai, langchain/langgraph, chromadb) of the bots it actually serves.
+"""
+
+import importlib
+import importlib.util
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# How a backend's response function hands back its answer
+RETURNS_MARKDOWN = 'markdown'  # plain markdown string
+RETURNS_HTML = 'html'          # already rendered HTML string
+RETURNS_RESPONSE = 'response'  # Flask response or (response, status_code) tuple
+
+
+class BackendUnavailableError(RuntimeError):
+    """Raised when a bot's backend module cannot be loaded"""
+
+
+def _import_agent_module(module: str):
+    """
+    Import an agent module by dotted name, or by file name for modules whose
+    file names are not valid identifiers (e.g. Meta_Llama_3.1_8B.py)
+    """
+    if not module.endswith('.py'):
+        return importlib.import_module(module)
+
+    module_name = 'agent_' + re.sub(r'\W', '_', module[:-3]).lower()
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(AGENT_DIR, module))
+    loaded_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(loaded_module)
+    return loaded_module
+
+
+class BotBackend:
+    """A registered bot and the agent module that serves it"""
+
+    def __init__(self,
+                 name: str,
+                 module: str,
+                 response_attr: str,
+                 stream_attr: Optional[str] = None,
+                 async_attr: Optional[str] = None,
+                 returns: str = RETURNS_MARKDOWN,
+                 accepts_image: bool = False,
+                 accepts_session: bool = False,
+                 code_highlight: bool = False,
+                 cacheable: bool = False,
+                 semantic_cache: bool = False):
+        """
+        Describe a bot backend
+
+        Args:
+            name: Bot name as sent by the frontend
+            module: Dotted module name, or a file name inside agent/
+            response_attr: Name of the blocking response function
+            stream_attr: Name of the generator yielding markdown deltas
+            async_attr: Name of the coroutine function returning the markdown answer
+            returns: One of RETURNS_MARKDOWN, RETURNS_HTML or RETURNS_RESPONSE
+            accepts_image: Whether the functions take image_data after the message
+            accepts_session: Whether the functions take session_id after the message
+            code_highlight: Whether output is rendered with fenced code highlighting
+            cacheable: Whether the answer depends only on the prompt, so it may be cached
+            semantic_cache: Whether answers may also be served for paraphrased prompts
+        """
+        self.name = name
+        self.module = module
+        self.response_attr = response_attr
+        self.stream_attr = stream_attr
+        self.async_attr = async_attr
+        self.returns = returns
+        self.accepts_image = accepts_image
+        self.accepts_session = accepts_session
+        self.code_highlight = code_highlight
+        self.cacheable = cacheable
+        self.semantic_cache = semantic_cache
+
+        self._module = None
+        self._error = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the backend module has been imported"""
+        return self._module is not None
+
+    def load(self):
+        """
+        Import the backend module on first use
+
+        Returns:
+            The imported module
+
+        Raises:
+            BackendUnavailableError: If the module failed to import
+        """
+        if self._module is None and self._error is None:
+            with self._lock:
+                if self._module is None and self._error is None:
+                    try:
+                        self._module = _import_agent_module(self.module)
+                    except Exception as e:
+                        print(f"Error loading {self.name} backend: {str(e)}")
+                        self._error = e
+
+        if self._error is not None:
+            raise BackendUnavailableError(f"{self.name} is currently unavailable.")
+
+        return self._module
+
+    def build_args(self, user_input: str, image_data: Optional[Dict] = None, session_id: Optional[str] = None) -> list:
+        """Build the positional arguments the backend functions expect"""
+        args = [user_input]
+        if self.accepts_image:
+            args.append(image_data)
+        if self.accepts_session:
+            args.append(session_id)
+        return args
+
+    def get_response_function(self) -> Callable:
+        """Return the blocking response function, loading the module if needed"""
+        return getattr(self.load(), self.response_attr)
+
+    def get_stream_function(self) -> Callable:
+        """Return the streaming generator function, loading the module if needed"""
+        if not self.stream_attr:
+            raise BackendUnavailableError(f"{self.name} does not support streaming.")
+        return getattr(self.load(), self.stream_attr)
+
+    def get_async_function(self) -> Optional[Callable]:
+        """Return the coroutine function, or None if the backend has no async variant"""
+        if not self.async_attr:
+            return None
+        return getattr(self.load(), self.async_attr)
+
+    def cache_params(self) -> Dict[str, Any]:
+        """Parameters that identify this backend's answers in the response cache"""
+        return {
+            'module': self.module,
+            'function': self.response_attr,
+            # Agents that keep their generation settings at module level
+            'generation_config': getattr(self.load(), 'GENERATION_CONFIG', None)
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        """Summary of the backend for the models endpoint"""
+        return {
+            'name': self.name,
+            'module': self.module,
+            'loaded': self.loaded,
+            'available': self._error is None,
+            'streaming': bool(self.stream_attr),
+            'async': bool(self.async_attr),
+            'cacheable': self.cacheable,
+            'semantic_cache': self.semantic_cache,
+            'accepts_image': self.accepts_image
+        }
+
+
+class ModelRegistry:
+    """Bot name to backend lookup with lazy loading"""
+
+    def __init__(self, default_bot: str, image_bot: str):
+        """
+        Initialize the registry
+
+        Args:
+            default_bot: Bot used for unknown names
+            image_bot: Bot used for unknown names when the message carries an image
+        """
+        self.default_bot = default_bot
+        self.image_bot = image_bot
+        self._backends: Dict[str, BotBackend] = {}
+
+    def register(self, name: str, module: str, response_attr: str, **options) -> BotBackend:
+        """Register a bot backend; see BotBackend for the available options"""
+        backend = BotBackend(name, module, response_attr, **options)
+        self._backends[name] = backend
+        return backend
+
+    def alias(self, alias: str, name: str):
+        """Make an additional bot name resolve to an existing backend"""
+        self._backends[alias] = self._backends[name]
+
+    def get(self, name: str) -> Optional[BotBackend]:
+        """Get a backend by exact bot name"""
+        return self._backends.get(name)
+
+    def resolve(self, bot_name: str, image_data: Optional[Dict] = None) -> BotBackend:
+        """
+        Pick the backend for a chat request
+
+        Args:
+            bot_name: Bot selected by the user
+            image_data: Optional image attached to the message
+
+        Returns:
+            The registered backend, or the image/default fallback for unknown names
+        """
+        backend = self._backends.get(bot_name) or self._backends.get(bot_name.lower())
+        if backend is not None:
+            return backend
+
+        return self._backends[self.image_bot if image_data else self.default_bot]
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """List all registered bots (aliases excluded) and whether each is loaded"""
+        return [backend.describe() for name, backend in self._backends.items() if name == backend.name]
+
+
+bot_registry = ModelRegistry(default_bot="GPT-4o", image_bot="Gemini 2.0 Flash")
+
+bot_registry.register("Articuno.AI", "agent.articuno_weather", "get_articuno_weather_response",
+                      stream_attr="stream_articuno_weather_response", returns=RETURNS_RESPONSE, accepts_image=True,
+                      async_attr="get_articuno_weather_response_async")
+bot_registry.register("Bikram.AI", "agent.Bikram_AI", "get_bikram_ai_response",
+                      stream_attr="stream_bikram_ai_response", returns=RETURNS_HTML, code_highlight=True)
+bot_registry.register("GPT-4o", "agent.gpt_4o", "get_gpt4o_response",
+                      stream_attr="stream_gpt4o_response", returns=RETURNS_RESPONSE, accepts_image=True,
+                      code_highlight=True, async_attr="get_gpt4o_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Wikipedia DeepSearch", "agent.wikipedia_agent", "get_wikipedia_response",
+                      stream_attr="stream_wikipedia_response",
+                      async_attr="get_wikipedia_response_async")
+bot_registry.register("GPT-4o-mini", "agent.gpt_4o_mini", "get_gpt4o_mini_response",
+                      stream_attr="stream_gpt4o_mini_response",
+                      async_attr="get_gpt4o_mini_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Grok-3", "agent.grok3", "get_grok3_response",
+                      stream_attr="stream_grok3_response",
+                      async_attr="get_grok3_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Grok-3 Mini", "agent.grok_3_mini", "get_grok3_mini_response",
+                      stream_attr="stream_grok3_mini_response",
+                      async_attr="get_grok3_mini_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Ministral 3B", "agent.Ministral_3B", "get_ministral_3b_response",
+                      stream_attr="stream_ministral_3b_response",
+                      async_attr="get_ministral_3b_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Codestral 2501", "agent.Codestral_2501", "get_codestral_2501_response",
+                      stream_attr="stream_codestral_2501_response", returns=RETURNS_RESPONSE, code_highlight=True,
+                      async_attr="get_codestral_2501_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("DeepSeek V3", "agent.DeepSeek_V3_0324", "get_deepseek_v3_response",
+                      stream_attr="stream_deepseek_v3_response",
+                      async_attr="get_deepseek_v3_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Phi-4", "agent.Phi_4", "get_phi4_response",
+                      stream_attr="stream_phi4_response",
+                      async_attr="get_phi4_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Phi-4 Mini", "agent.Phi_4_mini", "get_phi4_mini_response",
+                      stream_attr="stream_phi4_mini_response",
+                      async_attr="get_phi4_mini_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Meta Llama 3.1 8B", "Meta_Llama_3.1_8B.py", "get_llama_31_8b_response",
+                      stream_attr="stream_llama_31_8b_response",
+                      async_attr="get_llama_31_8b_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Meta Llama 3.3 70B", "Meta_Llama_3.3_70B.py", "get_llama_33_70b_response",
+                      stream_attr="stream_llama_33_70b_response",
+                      async_attr="get_llama_33_70b_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Cohere Command A", "agent.cohere_command_a", "get_cohere_command_a_response",
+                      stream_attr="stream_cohere_command_a_response",
+                      async_attr="get_cohere_command_a_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Cohere Command R+", "agent.Cohere_command_r_plus", "get_cohere_command_r_plus_response",
+                      stream_attr="stream_cohere_command_r_plus_response",
+                      async_attr="get_cohere_command_r_plus_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("ChatWithVideo", "agent.ChatWithVideo", "process_chatwithvideo_request",
+                      stream_attr="stream_chatwithvideo_request", returns=RETURNS_RESPONSE, accepts_session=True)
+bot_registry.register("Gemini 2.5 Flash", "gemini_2.5_flash.py", "get_gemini_flash_response",
+                      stream_attr="stream_gemini_flash_response", returns=RETURNS_RESPONSE, accepts_image=True,
+                      async_attr="get_gemini_flash_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.register("Gemini 2.0 Flash", "agent.gemini_flash", "get_gemini_flash_response",
+                      stream_attr="stream_gemini_flash_response", returns=RETURNS_RESPONSE, accepts_image=True,
+                      async_attr="get_gemini_flash_response_async", cacheable=True,
+                      semantic_cache=True)
+bot_registry.alias("gemini", "Gemini 2.0 Flash")
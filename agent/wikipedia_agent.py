@@ -76,6 +76,52 @@ def get_wikipedia_response(user_query: str) -> str:
     except Exception as e:
         return f"Error processing your request: {str(e)}"
 
+def stream_wikipedia_response(user_query: str):
+    """
+    Stream the Wikipedia agent's answer token by token.
+
+    Tool calls and tool results are skipped; only the model's text is yielded.
+
+    Args:
+        user_query: The user's question or query
+
+    Yields:
+        str: Markdown text deltas as they arrive from the agent
+    """
+    agent = _get_agent()
+    for chunk, metadata in agent.stream(
+        {"messages": [{"role": "user", "content": user_query}]},
+        stream_mode="messages"
+    ):
+        if chunk.__class__.__name__ != 'AIMessageChunk' or not chunk.content:
+            continue
+        if isinstance(chunk.content, list):
+            yield ''.join(item.get('text', '') if isinstance(item, dict) else str(item) for item in chunk.content)
+        else:
+            yield chunk.content
+
+async def get_wikipedia_response_async(user_query: str) -> str:
+    """
+    Get a response from the Wikipedia agent without blocking the event loop.
+
+    Args:
+        user_query: The user's question or query
+
+    Returns:
+        str: The agent's final answer
+    """
+    agent = _get_agent()
+    response = await agent.ainvoke({
+        "messages": [{"role": "user", "content": user_query}]
+    })
+
+    # Extract the final AI message
+    for message in reversed(response.get("messages", []) if response else []):
+        if hasattr(message, 'content') and message.content and message.__class__.__name__ == 'AIMessage':
+            return message.content
+
+    return "I couldn't find a proper answer. Please try rephrasing your question."
+
 # For testing purposes when running directly
 if __name__ == "__main__":
     print("Running agent...")
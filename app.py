@@ -1,218 +1,44 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
 import markdown
 import os
 import requests
 import json
 import base64
-import speech_recognition as sr
+import hmac
 import io
-import tempfile 
-import uuid
 from datetime import datetime
-from pydub import AudioSegment
-import google.generativeai as genai
 import re
+import time
 import traceback
+from concurrent.futures import TimeoutError as FutureTimeoutError, wait as wait_futures
 from dotenv import load_dotenv
-from agent.wikipedia_agent import get_wikipedia_response
-from database.db_manager import get_db_manager
+from database.db_manager import get_db_manager, build_client_options
+from database.image_store import ALLOWED_IMAGE_TYPES, is_image_id
+from database.archive import SessionCompactor
+from database.transfer import export_history
+from cache import embedding_cache_stats, get_response_cache, get_semantic_cache
+from speech import (
+    decode_to_pcm,
+    sniff_container,
+    get_transcription_engine,
+    TranscriptionJobQueue,
+    QueueFullError,
+    SpeechNotRecognizedError,
+    TranscriptionServiceError,
+    SAMPLE_RATE
+)
 from bson import json_util
 
-# Import GPT-4o-mini function with proper module name
 import sys
 sys.path.append(os.path.dirname(__file__))
-try:
-    from agent.gpt_4o_mini import get_gpt4o_mini_response
-except ImportError:
-    # Fallback if import fails
-    def get_gpt4o_mini_response(message):
-        return "GPT-4o-mini is currently unavailable."
-
-# Import Grok-3 function
-try:
-    from agent.grok3 import get_grok3_response
-except ImportError:
-    # Fallback if import fails
-    def get_grok3_response(message):
-        return "Grok-3 is currently unavailable."
-
-# Import Grok-3 Mini function
-try:
-    from agent.grok_3_mini import get_grok3_mini_response
-except ImportError:
-    # Fallback if import fails
-    def get_grok3_mini_response(message):
-        return "Grok-3 Mini is currently unavailable."
-
-# Import Ministral 3B function
-try:
-    from agent.Ministral_3B import get_ministral_3b_response
-except ImportError:
-    # Fallback if import fails
-    def get_ministral_3b_response(message):
-        return "Ministral 3B is currently unavailable."
-
-# Import Codestral 2501 function
-try:
-    from agent.Codestral_2501 import get_codestral_2501_response
-except ImportError:
-    # Fallback if import fails
-    def get_codestral_2501_response(message):
-        return "Codestral 2501 is currently unavailable."
-
-# Import DeepSeek V3 0324 function
-try:
-    from agent.DeepSeek_V3_0324 import get_deepseek_v3_response
-except ImportError:
-    # Fallback if import fails
-    def get_deepseek_v3_response(message):
-        return "DeepSeek V3 is currently unavailable."
-
-# Import Phi-4 function
-try:
-    from agent.Phi_4 import get_phi4_response
-except ImportError:
-    # Fallback if import fails
-    def get_phi4_response(message):
-        return "Phi-4 is currently unavailable."
-
-# Import Phi-4 Mini function
-try:
-    from agent.Phi_4_mini import get_phi4_mini_response
-except ImportError:
-    # Fallback if import fails
-    def get_phi4_mini_response(message):
-        return "Phi-4 Mini is currently unavailable."
-
-# Import Meta Llama 3.1 8B function
-try:
-    import importlib.util
-    spec_llama_31 = importlib.util.spec_from_file_location("meta_llama_31_8b", "agent/Meta_Llama_3.1_8B.py")
-    llama_31_module = importlib.util.module_from_spec(spec_llama_31)
-    spec_llama_31.loader.exec_module(llama_31_module)
-    get_llama_31_8b_response = llama_31_module.get_llama_31_8b_response
-except Exception:
-    # Fallback if import fails
-    def get_llama_31_8b_response(message):
-        return "Meta Llama 3.1 8B is currently unavailable."
-
-# Import Meta Llama 3.3 70B function
-try:
-    import importlib.util
-    spec_llama_33 = importlib.util.spec_from_file_location("meta_llama_33_70b", "agent/Meta_Llama_3.3_70B.py")
-    llama_33_module = importlib.util.module_from_spec(spec_llama_33)
-    spec_llama_33.loader.exec_module(llama_33_module)
-    get_llama_33_70b_response = llama_33_module.get_llama_33_70b_response
-except Exception:
-    # Fallback if import fails
-    def get_llama_33_70b_response(message):
-        return "Meta Llama 3.3 70B is currently unavailable."
-
-# Import Cohere Command A function
-try:
-    from agent.cohere_command_a import get_cohere_command_a_response
-except ImportError:
-    # Fallback if import fails
-    def get_cohere_command_a_response(message):
-        return "Cohere Command A is currently unavailable."
-
-# Import Cohere Command R+ function
-try:
-    from agent.Cohere_command_r_plus import get_cohere_command_r_plus_response
-except ImportError:
-    # Fallback if import fails
-    def get_cohere_command_r_plus_response(message):
-        return "Cohere Command R+ is currently unavailable."
-
-# Import Bikram.AI function
-try:
-    from agent.Bikram_AI import get_bikram_ai_response
-except ImportError:
-    # Fallback if import fails
-    def get_bikram_ai_response(message):
-        return "Bikram.AI is currently unavailable."
-
-# Import Articuno Weather function
-try:
-    from agent.articuno_weather import get_articuno_weather_response
-except ImportError:
-    # Fallback if import fails
-    def get_articuno_weather_response(message, image_data=None):
-        return jsonify({"error": "Articuno Weather is currently unavailable."}), 500
-
-# Import Gemini Flash function
-try:
-    from agent.gemini_flash import get_gemini_flash_response
-except ImportError:
-    # Fallback if import fails
-    def get_gemini_flash_response(message, image_data=None):
-        return jsonify({"error": "Gemini 2.0 Flash is currently unavailable."}), 500
-
-# Import Gemini 2.5 Flash function
-try:
-    import importlib.util
-    spec = importlib.util.spec_from_file_location("gemini_25_flash", "agent/gemini_2.5_flash.py")
-    gemini_25_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(gemini_25_module)
-    get_gemini_25_flash_response = gemini_25_module.get_gemini_flash_response
-except Exception:
-    # Fallback if import fails
-    def get_gemini_25_flash_response(message, image_data=None):
-        return jsonify({"error": "Gemini 2.5 Flash is currently unavailable."}), 500
-
-# Import GPT-4o function
-try:
-    from agent.gpt_4o import get_gpt4o_response
-except ImportError:
-    # Fallback if import fails
-    def get_gpt4o_response(message, image_data=None):
-        return jsonify({"error": "GPT-4o is currently unavailable."}), 500
-
-# Import ChatWithVideo function
-try:
-    from agent.ChatWithVideo import process_chatwithvideo_request
-except ImportError:
-    # Fallback if import fails
-    def process_chatwithvideo_request(youtube_url):
-        return jsonify({"error": "ChatWithVideo is currently unavailable."}), 500
+from agent.registry import bot_registry, BackendUnavailableError, RETURNS_HTML, RETURNS_RESPONSE
+from agent.openweather import fetch_openweather, weather_cache
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Set FFmpeg path explicitly
-try:
-    ffmpeg_path = os.getenv("FFMPEG_PATH")
-    
-    if os.path.isfile(ffmpeg_path):
-        AudioSegment.converter = ffmpeg_path
-        print(f"FFmpeg found at: {ffmpeg_path}")
-    else:
-        possible_ffmpeg_paths = [
-            r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
-            r"C:\ffmpeg\bin\ffmpeg.exe",
-            os.path.expanduser("~") + r"\ffmpeg\bin\ffmpeg.exe"
-        ]
-        
-        ffmpeg_path = None
-        for path in possible_ffmpeg_paths:
-            if os.path.isfile(path):
-                ffmpeg_path = path
-                break
-        
-        if ffmpeg_path:
-            AudioSegment.converter = ffmpeg_path
-            print(f"FFmpeg found at: {ffmpeg_path}")
-        
-except Exception as e:
-    print(f"Error setting FFmpeg path: {str(e)}")
-
-# Configure Google Gemini API
+# Google Gemini API key (the Gemini SDK itself is only imported by the agents that use it)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Configure OpenWeather API
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-OPENWEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5"
 
 # Initializing the app
 app = Flask(__name__)
@@ -222,7 +48,79 @@ app.secret_key = os.getenv("SECRET_KEY", os.urandom(24).hex())
 
 # Initialize database manager
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://127.0.0.1:27017/")
-db_manager = get_db_manager(MONGODB_URI)
+
+# Connection pool and timeouts, so a stalled MongoDB fails requests fast instead of hanging them
+MONGODB_CLIENT_OPTIONS = build_client_options(
+    max_pool_size=int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+    min_pool_size=int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+    max_idle_time_ms=int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000")),
+    server_selection_timeout_ms=int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    connect_timeout_ms=int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000")),
+    timeout_ms=int(os.getenv("MONGODB_TIMEOUT_MS", "10000")),
+    write_concern=os.getenv("MONGODB_WRITE_CONCERN") or None
+)
+
+# Chat images are stored once by content hash: 'gridfs' or 'filesystem' (under IMAGE_STORE_PATH)
+IMAGE_STORE = os.getenv("IMAGE_STORE", "gridfs")
+IMAGE_STORE_PATH = os.getenv("IMAGE_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "images"))
+
+# Cold sessions are compacted into 'mongodb' (a compressed archive collection) or 'filesystem' (.jsonl.zst files)
+SESSION_ARCHIVE = os.getenv("SESSION_ARCHIVE", "mongodb")
+SESSION_ARCHIVE_PATH = os.getenv("SESSION_ARCHIVE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "archive"))
+
+db_manager = get_db_manager(
+    MONGODB_URI,
+    # Chat messages are saved by a background batching writer, off the request path
+    write_behind=os.getenv("MESSAGE_WRITE_BEHIND", "on").lower() not in ("off", "false", "0"),
+    write_batch_size=int(os.getenv("MESSAGE_WRITE_BATCH_SIZE", "100")),
+    write_flush_interval=float(os.getenv("MESSAGE_WRITE_FLUSH_INTERVAL", "0.5")),
+    write_queue_size=int(os.getenv("MESSAGE_WRITE_QUEUE_SIZE", "10000")),
+    image_store=IMAGE_STORE,
+    image_store_path=IMAGE_STORE_PATH,
+    client_options=MONGODB_CLIENT_OPTIONS,
+    session_archive=SESSION_ARCHIVE,
+    session_archive_path=SESSION_ARCHIVE_PATH,
+    # Archived anonymous sessions expire after this many seconds (0 keeps them)
+    anonymous_session_ttl=float(os.getenv("ANONYMOUS_SESSION_TTL", str(30 * 86400)))
+)
+
+# Background compaction of sessions idle for longer than SESSION_COLD_AFTER seconds (SESSION_COMPACT_INTERVAL=0 turns it off)
+SESSION_COMPACT_INTERVAL = float(os.getenv("SESSION_COMPACT_INTERVAL", "3600"))
+session_compactor = None
+if SESSION_COMPACT_INTERVAL > 0:
+    session_compactor = SessionCompactor(
+        db_manager,
+        cold_after=float(os.getenv("SESSION_COLD_AFTER", "86400")),
+        interval=SESSION_COMPACT_INTERVAL
+    )
+
+# Initialize response cache for stateless bots ('memory', 'mongodb' to share it between workers, or 'none')
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+response_cache = get_response_cache(
+    backend=RESPONSE_CACHE_BACKEND,
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+    # Resolved on every use, so each forked worker goes through its own client
+    get_collection=(lambda: db_manager.db['response_cache']) if RESPONSE_CACHE_BACKEND == 'mongodb' else None
+)
+
+# Semantic cache: serves stored answers for paraphrased prompts of opted-in bots
+semantic_cache = get_semantic_cache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+    ttl=float(os.getenv("SEMANTIC_CACHE_TTL", os.getenv("RESPONSE_CACHE_TTL", "3600"))),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500")),
+    enabled=os.getenv("SEMANTIC_CACHE", "on").lower() not in ("off", "false", "0")
+)
+
+# Speech recognition for voice input: 'google' (remote) or 'vosk' (offline, needs VOSK_MODEL_PATH)
+transcription_engine = get_transcription_engine(
+    engine=os.getenv("SPEECH_ENGINE", "google"),
+    language=os.getenv("SPEECH_LANGUAGE", "en-US"),
+    model_path=os.getenv("VOSK_MODEL_PATH")
+)
+
+# Seconds /api/transcribe waits for its job before answering with the job id to poll instead
+TRANSCRIBE_WAIT_TIMEOUT = float(os.getenv("TRANSCRIBE_WAIT_TIMEOUT", "30"))
 
 @app.route('/', methods=["GET"])
 def home_page():
@@ -241,40 +139,20 @@ def get_weather():
         return jsonify({"error": "Missing location or coordinates"}), 400
     
     try:
-        # Build API URL based on request type
-        if request_type == 'current':
-            endpoint = f"{OPENWEATHER_BASE_URL}/weather"
-        else:
-            endpoint = f"{OPENWEATHER_BASE_URL}/forecast"
-        
-        # Build request parameters
-        params = {
-            "appid": OPENWEATHER_API_KEY,
-            "units": "metric"  # Use metric units (Celsius)
-        }
-        
-        # Add location or coordinates to the parameters
-        if location:
-            params["q"] = location
-        else:
-            params["lat"] = lat
-            params["lon"] = lon
-        
-        # Make the request to the OpenWeather API
-        print(f"Making request to {endpoint} with params: {params}")
-        response = requests.get(endpoint, params=params)
+        # Current conditions or forecast, served from the shared weather cache when fresh
+        kind = 'current' if request_type == 'current' else 'forecast'
+        status_code, data = fetch_openweather(kind, location, lat, lon)
         
         # Check for errors
-        if response.status_code != 200:
-            error_message = response.json().get('message', 'Unknown error')
-            print(f"Error from OpenWeather API: {response.status_code} - {error_message}")
+        if status_code != 200:
+            error_message = data.get('message', 'Unknown error')
+            print(f"Error from OpenWeather API: {status_code} - {error_message}")
             return jsonify({
-                "error": f"Weather API error: {response.status_code} - {error_message}",
+                "error": f"Weather API error: {status_code} - {error_message}",
                 "success": False
-            }), response.status_code
+            }), status_code
         
         # Return the weather data
-        data = response.json()
         return jsonify(data)
     
     except Exception as e:
@@ -296,143 +174,156 @@ def get_image_data_url(image_data, image_format):
     encoded_image = base64.b64encode(image_data).decode("utf-8")
     return f"data:image/{image_format};base64,{encoded_image}"
 
-def transcribe_audio(audio_data):
+def recognize_speech(audio_data):
     """
-    Transcribes audio data to text using SpeechRecognition.
+    Transcribes audio data to text with the configured speech engine.
+    
+    The clip is decoded in memory to 16 kHz mono PCM (see speech/transcoder.py)
+    and handed to the engine without temporary files.
     
     Args:
         audio_data (bytes): The binary audio data
         
     Returns:
         str: The transcribed text
+        
+    Raises:
+        AudioDecodeError, SpeechNotRecognizedError, TranscriptionServiceError
     """
-    recognizer = sr.Recognizer()
+    print(f"Audio file size: {len(audio_data)} bytes, container: {sniff_container(audio_data) or 'unknown'}")
+    pcm_data = decode_to_pcm(audio_data)
+    print(f"Decoded to {len(pcm_data)} bytes of {SAMPLE_RATE} Hz PCM")
     
-    # Generate temporary filenames with random UUID to avoid conflicts
-    temp_input_filename = os.path.join(tempfile.gettempdir(), f"audio_input_{uuid.uuid4().hex}.webm")
-    temp_wav_filename = os.path.join(tempfile.gettempdir(), f"audio_converted_{uuid.uuid4().hex}.wav")
+    print(f"Sending to {transcription_engine.name} speech recognition...")
+    text = transcription_engine.transcribe(pcm_data)
+    print(f"Transcription result: {text}")
+    return text
+
+def transcription_error_message(error):
+    """
+    Text returned in place of a transcription when recognition fails.
     
-    try:
-        # Write the input audio data to a temporary file
-        with open(temp_input_filename, 'wb') as f:
-            f.write(audio_data)
-        
-        print(f"Audio file saved to: {temp_input_filename}")
-        print(f"Audio file size: {os.path.getsize(temp_input_filename)} bytes")
-        
-        # Try multiple approaches to convert the audio
-        try:
-            print("Attempting to convert audio with pydub...")
-            
-            # Tell pydub where to find FFmpeg explicitly if not set yet
-            if not hasattr(AudioSegment, 'converter') or not AudioSegment.converter:
-                # Try to locate ffmpeg in system PATH
-                import subprocess
-                try:
-                    ffmpeg_path = subprocess.check_output(['where', 'ffmpeg'], text=True).strip().split('\n')[0]
-                    AudioSegment.converter = ffmpeg_path
-                    print(f"Found ffmpeg at: {ffmpeg_path}")
-                except Exception as e:
-                    print(f"Could not find ffmpeg in PATH: {str(e)}")
-            
-            # Try to read as WebM (most common browser recording format)
-            audio = AudioSegment.from_file(temp_input_filename, format="webm")
-            print("Successfully read as WebM")
-        except Exception as webm_error:
-            print(f"Error reading as WebM: {str(webm_error)}")
-            try:
-                # Try to read as Ogg
-                audio = AudioSegment.from_file(temp_input_filename, format="ogg")
-                print("Successfully read as Ogg")
-            except Exception as ogg_error:
-                print(f"Error reading as Ogg: {str(ogg_error)}")
-                try:
-                    # Try to read as WAV
-                    audio = AudioSegment.from_wav(temp_input_filename)
-                    print("Successfully read as WAV")
-                except Exception as wav_error:
-                    print(f"Error reading as WAV: {str(wav_error)}")
-                    # Try as a generic file and let pydub detect format
-                    try:
-                        audio = AudioSegment.from_file(temp_input_filename)
-                        print("Successfully read as generic file")
-                    except Exception as generic_error:
-                        # As a last resort, try direct conversion with ffmpeg
-                        print(f"Error reading as generic file: {str(generic_error)}")
-                        print("Attempting direct conversion with ffmpeg subprocess...")
-                        import subprocess
-                        try:
-                            subprocess.run([
-                                'ffmpeg', '-y',
-                                '-i', temp_input_filename,
-                                '-ar', '16000', '-ac', '1',
-                                temp_wav_filename
-                            ], check=True)
-                            print("Successfully converted with ffmpeg subprocess")
-                        except Exception as ffmpeg_error:
-                            print(f"Error with ffmpeg subprocess: {str(ffmpeg_error)}")
-                            raise Exception(f"Failed to convert audio file: {str(generic_error)}")
-        
-        # Export to WAV if we didn't already use the subprocess approach
-        if 'audio' in locals():
-            print("Exporting to WAV format...")
-            audio.export(temp_wav_filename, format="wav")
-            print(f"Exported to {temp_wav_filename}")
-        
-        print(f"Converted WAV file size: {os.path.getsize(temp_wav_filename)} bytes")
+    Args:
+        error (Exception): The error raised by recognize_speech
         
-        # Use the converted WAV file for recognition
-        with sr.AudioFile(temp_wav_filename) as source:
-            print("Loading audio into recognizer...")
-            audio_data = recognizer.record(source)
-            
-            # Use Google's speech recognition service
-            print("Sending to Google speech recognition...")
-            text = recognizer.recognize_google(audio_data)
-            print(f"Transcription result: {text}")
-            return text
-    except sr.UnknownValueError:
-        print("Speech Recognition could not understand the audio")
-        return "Speech Recognition could not understand the audio"
-    except sr.RequestError as e:
-        print(f"Could not request results from Speech Recognition service: {str(e)}")
-        return f"Could not request results from Speech Recognition service: {str(e)}"
-    except Exception as e:
-        print(f"Error processing audio: {str(e)}")
-        return f"Error processing audio: {str(e)}"
-    finally:
-        # Clean up the temporary files
-        try:
-            if os.path.exists(temp_input_filename):
-                os.remove(temp_input_filename)
-                print(f"Removed temporary input file: {temp_input_filename}")
-            if os.path.exists(temp_wav_filename):
-                os.remove(temp_wav_filename)
-                print(f"Removed temporary WAV file: {temp_wav_filename}")
-        except Exception as e:
-            print(f"Error cleaning up temporary files: {str(e)}")
+    Returns:
+        str: Message for the user
+    """
+    if isinstance(error, (SpeechNotRecognizedError, TranscriptionServiceError)):
+        message = str(error)
+    else:
+        message = f"Error processing audio: {str(error)}"
+    print(message)
+    return message
+
+# Transcriptions run on a bounded worker pool, off the web workers
+transcription_jobs = TranscriptionJobQueue(
+    recognize_speech,
+    workers=int(os.getenv("TRANSCRIBE_WORKERS", "2")),
+    max_queue=int(os.getenv("TRANSCRIBE_MAX_QUEUE", "16")),
+    result_ttl=float(os.getenv("TRANSCRIBE_RESULT_TTL", "300"))
+)
+
+def read_audio_upload():
+    """
+    Reads the 'audio' file of a multipart request.
+    
+    Returns:
+        tuple: (audio bytes, None) or (None, error response)
+    """
+    if 'audio' not in request.files:
+        return None, (jsonify({"error": "No audio file provided"}), 400)
+    
+    audio_data = request.files['audio'].read()
+    if len(audio_data) == 0:
+        return None, (jsonify({"error": "Empty audio file"}), 400)
+    
+    return audio_data, None
+
+def queue_full_response(error):
+    """503 response for a transcription rejected by a full queue."""
+    response = jsonify({"error": str(error)})
+    response.headers['Retry-After'] = '5'
+    return response, 503
 
 @app.route('/api/transcribe', methods=["POST"])
 def transcribe():
-    """API endpoint for handling audio transcription"""
+    """
+    API endpoint for handling audio transcription
+    
+    Waits up to TRANSCRIBE_WAIT_TIMEOUT seconds for the result; slower jobs are
+    answered with 202 and a job id to poll.
+    """
     try:
-        # Get audio data from request
-        if 'audio' not in request.files:
-            return jsonify({"error": "No audio file provided"}), 400
-        
-        audio_file = request.files['audio']
-        audio_data = audio_file.read()
+        audio_data, error_response = read_audio_upload()
+        if error_response:
+            return error_response
         
-        if len(audio_data) == 0:
-            return jsonify({"error": "Empty audio file"}), 400
-        
-        # Process the audio data
-        transcribed_text = transcribe_audio(audio_data)
+        job = transcription_jobs.submit(audio_data)
+        try:
+            transcribed_text = job.future.result(timeout=TRANSCRIBE_WAIT_TIMEOUT)
+        except FutureTimeoutError:
+            return jsonify(job.to_dict()), 202
+        except Exception as e:
+            transcribed_text = transcription_error_message(e)
         
-        return jsonify({"transcription": transcribed_text})
+        return jsonify({"transcription": transcribed_text, "job_id": job.id})
+    except QueueFullError as e:
+        return queue_full_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/transcribe/jobs', methods=["POST"])
+def submit_transcription_job():
+    """Queues audio for transcription and returns its job id right away"""
+    try:
+        audio_data, error_response = read_audio_upload()
+        if error_response:
+            return error_response
+        
+        job = transcription_jobs.submit(audio_data)
+        return jsonify(job.to_dict()), 202
+    except QueueFullError as e:
+        return queue_full_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/transcribe/jobs/<job_id>', methods=["GET"])
+def get_transcription_job(job_id):
+    """Status of a transcription job, with the transcription once it is done"""
+    job = transcription_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/transcribe/jobs/<job_id>/stream', methods=["GET"])
+def stream_transcription_job(job_id):
+    """
+    Server-Sent Events for a transcription job.
+    
+    Emits a "status" event right away, keep-alive comments while the job runs,
+    and a final "done" or "error" event with the job state.
+    """
+    job = transcription_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    
+    def generate():
+        yield format_sse(job.to_dict(), event="status")
+        while not wait_futures([job.future], timeout=15).done:
+            yield ": keep-alive\n\n"
+        state = job.to_dict()
+        yield format_sse(state, event=state["status"])
+    
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/api/session/new', methods=["POST"])
 def create_new_session():
     """Create a new chat session"""
@@ -459,18 +350,68 @@ def create_new_session():
 
 @app.route('/api/session/history/<session_id>', methods=["GET"])
 def get_session_history(session_id):
-    """Get chat history for a specific session"""
+    """
+    Get chat history for a specific session
+
+    Returns the most recent `limit` messages, oldest first. Pass cursors.before
+    back as `before` to load older messages, or cursors.after as `after` to load
+    newer ones. `fields` picks a comma-separated subset of the message fields.
+    """
     try:
         limit = request.args.get('limit', 50, type=int)
-        history = db_manager.get_session_history(session_id, limit=limit)
-        
-        # Convert ObjectId to string for JSON serialization
-        return json.loads(json_util.dumps({"history": history}))
+        fields = request.args.get('fields')
+        page = db_manager.get_history_page(
+            session_id,
+            limit=limit,
+            before=request.args.get('before'),
+            after=request.args.get('after'),
+            fields=[field.strip() for field in fields.split(',') if field.strip()] if fields else None
+        )
+
+        # Messages come back JSON-ready, so they are serialized once
+        return jsonify({
+            "history": page['messages'],
+            "cursors": page['cursors'],
+            "has_more": page['has_more']
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error fetching session history: {str(e)}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/images/<image_id>', methods=["GET"])
+def get_image(image_id):
+    """Streams a chat image by the sha256 stored in its message's image_data"""
+    if not is_image_id(image_id):
+        return jsonify({"error": "Invalid image id"}), 400
+    
+    # Images never change under their hash, so a cached copy is always valid
+    if image_id in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{image_id}"'})
+    
+    try:
+        stored = db_manager.open_image(image_id)
+        if stored is None:
+            return jsonify({"error": "Image not found"}), 404
+        
+        chunks, content_type, length = stored
+        headers = {
+            'Content-Length': str(length),
+            'ETag': f'"{image_id}"',
+            'Cache-Control': 'public, max-age=31536000, immutable',
+            'X-Content-Type-Options': 'nosniff'
+        }
+        # Anything stored before types were checked is downloaded, never rendered
+        if content_type not in ALLOWED_IMAGE_TYPES:
+            headers['Content-Disposition'] = f'attachment; filename="{image_id}"'
+        return Response(chunks, mimetype=content_type, headers=headers)
+    except Exception as e:
+        print(f"Error fetching image: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/session/list', methods=["GET"])
 def list_sessions():
     """Get list of recent sessions"""
@@ -496,7 +437,7 @@ def get_session_statistics(session_id):
         if not stats:
             return jsonify({"error": "Session not found"}), 404
         
-        return json.loads(json_util.dumps(stats))
+        return jsonify(stats)
     except Exception as e:
         print(f"Error fetching session stats: {str(e)}")
         traceback.print_exc()
@@ -520,9 +461,9 @@ def delete_session(session_id):
 
 @app.route('/api/search', methods=["GET"])
 def search_messages():
-    """Search messages across sessions"""
+    """Ranked full-text search across sessions, with highlighted snippets"""
     try:
-        query = request.args.get('q', '')
+        query = request.args.get('q', '').strip()
         session_id = request.args.get('session_id', None)
         limit = request.args.get('limit', 20, type=int)
         
@@ -531,7 +472,7 @@ def search_messages():
         
         results = db_manager.search_messages(query, session_id=session_id, limit=limit)
         
-        return json.loads(json_util.dumps({"results": results}))
+        return jsonify({"results": results})
     except Exception as e:
         print(f"Error searching messages: {str(e)}")
         traceback.print_exc()
@@ -539,6 +480,10 @@ def search_messages():
 
 @app.route('/api/chat', methods=["POST"])
 def chat():
+    # Clients that ask for an event stream get token deltas instead of one JSON body
+    if request.accept_mimetypes.best == 'text/event-stream':
+        return chat_stream()
+
     # Get JSON data from the request
     data = request.json
     user_input = data.get('message', '')
@@ -559,49 +504,21 @@ def chat():
         return jsonify({"error": "No message or image provided"}), 400
     
     try:
-        # Get AI response based on selected bot
-        response_data = None
+        started = time.perf_counter()
+        
+        # Get AI response from the backend registered for the selected bot
+        backend = bot_registry.resolve(bot_name, image_data)
+        cached_response, cache_state = lookup_cached_response(backend, user_input, image_data,
+                                                              cache_bypass_requested(data, request.headers))
         
-        if bot_name == "Articuno.AI":
-            response_data = get_articuno_weather_response(user_input, image_data)
-        elif bot_name == "Bikram.AI":
-            response_data = process_bikram_ai_request(user_input)
-        elif bot_name == "GPT-4o":
-            response_data = get_gpt4o_response(user_input, image_data)
-        elif bot_name == "Wikipedia DeepSearch":
-            response_data = process_wikipedia_request(user_input)
-        elif bot_name == "GPT-4o-mini":
-            response_data = process_gpt4o_mini_request(user_input)
-        elif bot_name == "Grok-3":
-            response_data = process_grok3_request(user_input)
-        elif bot_name == "Grok-3 Mini":
-            response_data = process_grok3_mini_request(user_input)
-        elif bot_name == "Ministral 3B":
-            response_data = process_ministral_3b_request(user_input)
-        elif bot_name == "Codestral 2501":
-            response_data = process_codestral_2501_request(user_input)
-        elif bot_name == "DeepSeek V3":
-            response_data = process_deepseek_v3_request(user_input)
-        elif bot_name == "Phi-4":
-            response_data = process_phi4_request(user_input)
-        elif bot_name == "Phi-4 Mini":
-            response_data = process_phi4_mini_request(user_input)
-        elif bot_name == "Meta Llama 3.1 8B":
-            response_data = process_llama_31_8b_request(user_input)
-        elif bot_name == "Meta Llama 3.3 70B":
-            response_data = process_llama_33_70b_request(user_input)
-        elif bot_name == "Cohere Command A":
-            response_data = process_cohere_command_a_request(user_input)
-        elif bot_name == "Cohere Command R+":
-            response_data = process_cohere_command_r_plus_request(user_input)
-        elif bot_name == "ChatWithVideo":
-            response_data = process_chatwithvideo_request(user_input, session_id)
-        elif bot_name == "Gemini 2.5 Flash":
-            response_data = get_gemini_25_flash_response(user_input, image_data)
-        elif bot_name == "Gemini 2.0 Flash" or bot_name.lower() == "gemini" or (image_data and bot_name != "Articuno.AI"):
-            response_data = get_gemini_flash_response(user_input, image_data)
+        if cached_response is not None:
+            response_data = jsonify(cached_response)
         else:
-            response_data = get_gpt4o_response(user_input, image_data)
+            response_data = call_backend(backend, user_input, image_data, session_id)
+            
+            # Remember successful answers of stateless bots
+            if hasattr(response_data, 'get_json'):
+                store_cached_response(backend, cache_state, response_data.get_json())
         
         # Extract response text for database storage
         if response_data and isinstance(response_data, tuple):
@@ -623,7 +540,8 @@ def chat():
                 role='user',
                 bot_name=bot_name,
                 image_data=image_data,
-                response=response_text
+                response=response_text,
+                latency_ms=(time.perf_counter() - started) * 1000
             )
         except Exception as db_error:
             print(f"Error saving to database: {str(db_error)}")
@@ -647,713 +565,308 @@ def chat():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-# ===================================================================
-# NOTE: The following model-specific functions have been moved to separate agent files:
-# - Articuno Weather functions -> agent/articuno_weather.py
-# - Gemini Flash functions -> agent/gemini_flash.py  
-# - GPT-4o functions -> agent/gpt_4o.py
-# ===================================================================
-
-def old_format_weather_data_for_gemini(weather_data, location):
+def render_markdown_response(markdown_output, code_highlight=False):
     """
-    Formats weather data into a structured prompt for Gemini model.
-    
+    Converts a bot's markdown output to HTML the same way its non-streaming agent does.
+
     Args:
-        weather_data (dict): Weather data from OpenWeather API
-        location (str): The location name
-        
+        markdown_output (str): The assembled markdown text
+        code_highlight (bool): Render fenced code blocks with syntax highlighting
+
     Returns:
-        str: Formatted weather data prompt
+        str: HTML-formatted response
     """
-    if "error" in weather_data:
-        return f"Error: {weather_data['error']}"
-    
-    try:
-        current = weather_data["current"]
-        
-        # Extract current weather data
-        temp = current["main"]["temp"]
-        feels_like = current["main"]["feels_like"]
-        humidity = current["main"]["humidity"]
-        weather_desc = current["weather"][0]["description"]
-        weather_main = current["weather"][0]["main"]
-        wind_speed = current["wind"]["speed"]
-        
-        # Get pressure and visibility if available
-        pressure = current["main"].get("pressure", "N/A")
-        visibility = current.get("visibility", "N/A")
-        if visibility != "N/A":
-            visibility = visibility / 1000  # Convert from meters to kilometers
-        
-        # Extract sunrise and sunset times if available
-        sunrise = sunset = "N/A"
-        if "sys" in current and "sunrise" in current["sys"] and "sunset" in current["sys"]:
-            sunrise_timestamp = current["sys"]["sunrise"]
-            sunset_timestamp = current["sys"]["sunset"]
-            from datetime import datetime
-            sunrise = datetime.fromtimestamp(sunrise_timestamp).strftime('%H:%M')
-            sunset = datetime.fromtimestamp(sunset_timestamp).strftime('%H:%M')
-        
-        # Extract location data
-        city_name = current["name"]
-        country = current["sys"]["country"]
-        
-        # Extract forecast if available
-        forecast_text = ""
-        if "forecast" in weather_data:
-            forecast = weather_data["forecast"]
-            forecast_text = "\n\nForecast for next few days:\n"
-            
-            # Group forecast by day
-            day_forecasts = {}
-            for item in forecast["list"]:
-                dt = item["dt"]
-                date = item["dt_txt"].split(" ")[0]
-                
-                if date not in day_forecasts:
-                    day_forecasts[date] = []
-                
-                day_forecasts[date].append(item)
-            
-            # Generate a summary for each day
-            for date, items in list(day_forecasts.items())[:3]:  # Limit to 3 days
-                # Calculate average temp for the day
-                avg_temp = sum(item["main"]["temp"] for item in items) / len(items)
-                
-                # Calculate min and max temps
-                min_temp = min(item["main"]["temp_min"] for item in items)
-                max_temp = max(item["main"]["temp_max"] for item in items)
-                
-                # Find most common weather condition
-                conditions = [item["weather"][0]["main"] for item in items]
-                most_common_condition = max(set(conditions), key=conditions.count)
-                
-                # Get detailed description of most common condition
-                condition_desc = next((item["weather"][0]["description"] for item in items 
-                                      if item["weather"][0]["main"] == most_common_condition), most_common_condition)
-                
-                # Calculate average precipitation probability if available
-                precipitation_prob = 0
-                precipitation_count = 0
-                for item in items:
-                    if "pop" in item:
-                        precipitation_prob += item["pop"]
-                        precipitation_count += 1
-                
-                if precipitation_count > 0:
-                    avg_precipitation_prob = (precipitation_prob / precipitation_count) * 100  # Convert to percentage
-                    precipitation_text = f", {avg_precipitation_prob:.0f}% chance of precipitation"
-                else:
-                    precipitation_text = ""
-                
-                forecast_text += f"- {date}: {min_temp:.1f}°C to {max_temp:.1f}°C (avg: {avg_temp:.1f}°C), {condition_desc}{precipitation_text}\n"
-        
-        # Format the weather data as a prompt for Gemini
-        prompt = f"""Weather data for {city_name}, {country} (User asked about: {location}):
-        
-Current conditions:
-- Temperature: {temp}°C (feels like {feels_like}°C)
-- Weather: {weather_desc} ({weather_main})
-- Humidity: {humidity}%
-- Wind speed: {wind_speed} m/s
-- Air pressure: {pressure} hPa
-- Visibility: {visibility if visibility != "N/A" else "N/A"} km
-- Sunrise: {sunrise}
-- Sunset: {sunset}
-{forecast_text}
-
-Now, provide a friendly and helpful response about this weather information to the user. Be conversational and engaging. Use emojis appropriately to enhance the message. Include practical advice based on the weather conditions (what to wear, precautions to take, etc.). End with a friendly follow-up question.
-
-Remember to present the information in a well-structured way, including:
-1. A warm greeting that references the location
-2. Current weather conditions with a friendly tone
-3. Forecast information for the next few days
-4. Practical advice based on the conditions
-5. A friendly question or suggestion to keep the conversation going
-"""
-        return prompt
-    except Exception as e:
-        return f"Error formatting weather data: {str(e)}"
-
-# OLD FUNCTION - Now handled by agent/articuno_weather.py
-# def process_articuno_weather_request(user_input, image_data=None):
-def process_articuno_weather_request_OLD(user_input, image_data=None):
-    """DEPRECATED: Process chat request specifically for Articuno.AI as a weather assistant
-    This function has been moved to agent/articuno_weather.py"""
-    try:
-        # Configure the model
-        generation_config = {
-            "temperature": 0.7,
-            "top_p": 1,
-            "top_k": 32,
-            "max_output_tokens": 1000,
+    if not code_highlight:
+        return markdown.markdown(markdown_output)
+
+    return markdown.markdown(
+        markdown_output,
+        extensions=[
+            'fenced_code',
+            'codehilite',
+            'tables',
+            'nl2br'
+        ],
+        extension_configs={
+            'codehilite': {
+                'css_class': 'highlight',
+                'linenums': False,
+                'guess_lang': True,
+                'noclasses': False
+            }
         }
-        
-        # Create weather-focused system prompt
-        weather_system_prompt = """Welcome to Articuno.AI – your friendly weather assistant! ❄️
-You're here to help users explore weather updates with style, clarity, and a touch of personality 😊
-
-Your Role:
-
-You are a polite, knowledgeable, and conversational assistant that specializes in weather information.
-
-Your answers should be concise, friendly, and easy to understand – even for someone not familiar with weather terms.
-
-You may use emojis sparingly to enhance friendliness, but never in the middle of sentences.
-
-If a user shares a location, provide current weather info and a quick summary of the next 2–3 days.
+    )
 
-Always address the user's specific question about weather and provide helpful context based on the conditions.
+def cache_bypass_requested(data, headers):
+    """A request skips the response cache with {"cache": false} or Cache-Control: no-cache."""
+    return data.get('cache') is False or 'no-cache' in headers.get('Cache-Control', '')
 
-Provide practical advice based on the weather conditions (e.g., "Don't forget your umbrella!" for rain).
-
-Tone & Style:
-
-Be warm, responsive, and conversational - like a friendly meteorologist.
-
-Use short paragraphs and bullet points if helpful.
+def get_response_cache_key(backend, user_input, image_data=None, bypass=False):
+    """
+    Builds the response cache key for a chat request.
 
-End most responses with a gentle question or suggestion to keep the flow going.
-(e.g., "Would you like a forecast for the next few days?" or "Is there anything else about the weather you'd like to know?")
+    Args:
+        backend (BotBackend): The backend resolved from the bot registry
+        user_input (str): The user's message
+        image_data (dict, optional): Image attached to the message
+        bypass (bool): Whether the request asked to skip the cache
 
-Example Starters:
+    Returns:
+        str or None: The cache key, or None if this request must not be cached
+    """
+    if bypass or image_data or not user_input or not backend.cacheable or not response_cache.enabled:
+        return None
 
-🌤️ "Looks like it's sunny in [Location]! Want to know what's coming this weekend?"
+    try:
+        return response_cache.make_key(backend.name, user_input, backend.cache_params())
+    except BackendUnavailableError:
+        return None
 
-🌧️ "Rain ahead in [Location]! Don't forget your umbrella ☔ Ready for a 3-day forecast?"
+def is_cacheable_payload(payload):
+    """Only real answers are cached; some agents report failures as an "Error: ..." answer."""
+    response_html = (payload or {}).get('response')
+    return bool(response_html) and 'error' not in payload and not response_html.startswith('<p>Error')
 
-🌡️ "It's currently [Temperature]°C with light winds in [Location]. Want me to check humidity too?"
+def lookup_cached_response(backend, user_input, image_data=None, bypass=False):
+    """
+    Looks a chat request up in the exact-match cache, then in the semantic cache.
 
-Example Weather Report Format:
-For location-specific weather reports, format your response like this:
+    Args:
+        backend (BotBackend): The backend resolved from the bot registry
+        user_input (str): The user's message
+        image_data (dict, optional): Image attached to the message
+        bypass (bool): Whether the request asked to skip the caches
 
-🗺️ Weather Report for [Location]
-📅 Today: [Current Date]
-🌤️ Condition: [Weather Condition]
-🌡️ Temperature: [Temp]°C (Feels like [Feels Like]°C)
-💧 Humidity: [Humidity]%
-🌬️ Wind: [Wind Speed] km/h [Direction]
-🌅 Sunrise: [Sunrise Time]     🌇 Sunset: [Sunset Time]
+    Returns:
+        tuple: (cached JSON payload or None, state to pass to store_cached_response)
+    """
+    cache_key = get_response_cache_key(backend, user_input, image_data, bypass)
+    if cache_key:
+        cached_response = response_cache.get(cache_key)
+        if cached_response is not None:
+            return {**cached_response, "cached": "exact"}, (None, None)
+
+    embedding = None
+    if backend.semantic_cache and semantic_cache.enabled and user_input and not image_data and not bypass:
+        cached_response, embedding = semantic_cache.lookup(backend.name, user_input)
+        if cached_response is not None:
+            # Serve the next identical prompt straight from the exact-match cache
+            if cache_key:
+                response_cache.set(cache_key, cached_response)
+            return {**cached_response, "cached": "semantic"}, (None, None)
+
+    return None, (cache_key, embedding)
+
+def store_cached_response(backend, cache_state, payload):
+    """
+    Stores a fresh answer in the caches that missed in lookup_cached_response.
 
-🔮 Three-Day Forecast
-[Include forecast data if available]
+    Args:
+        backend (BotBackend): The backend that produced the answer
+        cache_state (tuple): State returned by lookup_cached_response
+        payload (dict): JSON payload of the answer
+    """
+    cache_key, embedding = cache_state
+    if (cache_key is None and embedding is None) or not is_cacheable_payload(payload):
+        return
 
-[Your recommendations based on weather conditions]
+    cached_response = {"response": payload['response']}
+    if cache_key:
+        response_cache.set(cache_key, cached_response)
+    if embedding is not None:
+        semantic_cache.store(backend.name, embedding, cached_response)
 
-📌 Tip: [Practical advice like "Carry an umbrella; it may rain today."]
+def call_backend(backend, user_input, image_data=None, session_id=None):
+    """
+    Calls a registered bot backend and normalizes its answer to a Flask response.
 
-This format is:
-- Clear and concise
-- Uses emojis tastefully to make it user-friendly
-- Includes actionable tips
+    Args:
+        backend (BotBackend): The backend resolved from the bot registry
+        user_input (str): The user's message
+        image_data (dict, optional): Image attached to the message
+        session_id (str, optional): Current chat session
 
-Special Cases:
-If the user asks about weather but doesn't specify a location, politely ask them for a location.
-If the user asks about non-weather topics, gently remind them that you're a weather specialist but still try to help.
-"""
-        
-        # Create the model
-        model = genai.GenerativeModel(model_name="gemini-1.5-flash", generation_config=generation_config)
-        
-        # Check if the user input contains a location
-        location = detect_location_from_message(user_input)
-        
-        # If location found, fetch weather data
-        weather_data = None
-        weather_prompt = None
-        
-        if location:
-            print(f"Detected location: {location}")
-            weather_data = fetch_weather_data(location)
-            weather_prompt = format_weather_data_for_gemini(weather_data, location)
-            print(f"Formatted weather data: {weather_prompt}")
-        
-        # Handle messages with images
-        if image_data:
-            # Process the image data
-            image_format = image_data.get("format", "jpeg")
-            image_binary = base64.b64decode(image_data.get("data").split(",")[1])
-            
-            # Create image part for multimodal request
-            image_parts = [
-                {
-                    "mime_type": f"image/{image_format}",
-                    "data": image_binary
-                }
-            ]
-            
-            # Prepare content parts with system instructions and weather data if available
-            if weather_prompt:
-                # Include weather data in the prompt
-                content_parts = [
-                    {"role": "user", "parts": [{"text": weather_system_prompt}]},
-                    {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
-                    {"role": "user", "parts": [{"text": f"{user_input}\n\n{weather_prompt}"}, image_parts[0]]}
-                ]
-            else:
-                # No weather data, just use system prompt and user input
-                content_parts = [
-                    {"role": "user", "parts": [{"text": weather_system_prompt}]},
-                    {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
-                    {"role": "user", "parts": [{"text": user_input}, image_parts[0]]}
-                ]
-            
-            # Generate response with both text and image
-            response = model.generate_content(content_parts)
-        else:
-            # Text-only request
-            # If we have weather data, include it in the prompt
-            if weather_prompt:
-                content_parts = [
-                    {"role": "user", "parts": [{"text": weather_system_prompt}]},
-                    {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
-                    {"role": "user", "parts": [{"text": f"{user_input}\n\n{weather_prompt}"}]}
-                ]
-            else:
-                # No location detected or weather data available
-                if not any(term in user_input.lower() for term in ['weather', 'temperature', 'forecast', 'rain', 'sunny', 'cloudy', 'wind', 'humidity', 'climate']):
-                    enhanced_input = f"Regarding weather information: {user_input}"
-                else:
-                    enhanced_input = user_input
-                
-                content_parts = [
-                    {"role": "user", "parts": [{"text": weather_system_prompt}]},
-                    {"role": "model", "parts": [{"text": "I understand. I'll be Articuno.AI, your weather assistant."}]},
-                    {"role": "user", "parts": [{"text": enhanced_input}]}
-                ]
-            
-            response = model.generate_content(content_parts)
-        
-        # Extract response text
-        markdown_output = response.text
-        html_response = markdown.markdown(markdown_output)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Articuno Weather API error: {str(e)}")
-        traceback.print_exc()  # Print the full stack trace for debugging
-        return jsonify({"error": f"Error with Articuno Weather API: {str(e)}"}), 500
-
-# OLD FUNCTION - Now handled by agent/gemini_flash.py
-# def process_gemini_request(user_input, image_data=None):
-def process_gemini_request_OLD(user_input, image_data=None):
-    """DEPRECATED: Process chat request using Google Gemini API
-    This function has been moved to agent/gemini_flash.py"""
+    Returns:
+        Flask response or (response, status_code) tuple
+    """
     try:
-        # Ensure we have the Gemini API key
-        if not GEMINI_API_KEY:
-            return jsonify({"error": "Gemini API key not configured. Please set GEMINI_API_KEY in .env file."}), 500
-        
-        # Configure Gemini with the API key
-        genai.configure(api_key=GEMINI_API_KEY)
-        
-        # Configure the model
-        generation_config = {
-            "temperature": 0.9,
-            "top_p": 1,
-            "top_k": 32,
-            "max_output_tokens": 1000,
-        }
-        
-        # Create system prompt for Gemini 2.0 Flash
-        gemini_system_prompt = """You are Gemini 2.0 Flash, a fast and versatile AI assistant developed by Google. 
-        You provide concise, accurate, and helpful responses on a wide range of topics.
-        
-        🧠 Identity
-        Name: Gemini 2.0 Flash
-        Developed by: Google
-        Role: Fast, versatile AI assistant with multimodal capabilities
-
-        📝 Response Structure
-        - Use clear headings (H1, H2, etc.) to organize information logically.
-        - Present details using bullet points or numbered lists where appropriate for readability.
-        - Include spaces after headings and between paragraphs for improved visual clarity.
-        - Integrate appropriate emojis (e.g., ✅📌🚀) to enhance interactivity and user engagement, without overwhelming the message.
-
-        🌟 Tone and Style
-        - Maintain a professional yet friendly tone.
-        - Be concise, yet ensure clarity and completeness.
-        - Adapt your communication style based on the user's intent and tone.
-        
-        🖼️ Image Analysis
-        - When provided with an image, describe what you see in detail.
-        - For images with text, read and interpret the text content.
-        - Analyze the context, subjects, and key elements of images.
-        - Answer questions about the image content thoroughly.
-        - If the user asks about something not visible in the image, politely mention that you can only comment on what's visible.
-        """
-        
-        # Create the model using the same method as Articuno.AI
-        model = genai.GenerativeModel(model_name="gemini-1.5-flash", generation_config=generation_config)
-        
-        # Handle messages with images
-        if image_data:
-            # Process the image data
-            image_format = image_data.get("format", "jpeg")
-            image_binary = base64.b64decode(image_data.get("data").split(",")[1])
-            
-            # Create image part for multimodal request
-            image_parts = [
-                {
-                    "mime_type": f"image/{image_format}",
-                    "data": image_binary
-                }
-            ]
-            
-            # Prepare content parts with system instructions similar to Articuno.AI's approach
-            content_parts = [
-                {"role": "user", "parts": [{"text": gemini_system_prompt}]},
-                {"role": "model", "parts": [{"text": "I understand. I'll be Gemini 2.0 Flash, your helpful assistant."}]},
-                {"role": "user", "parts": [{"text": user_input}, image_parts[0]]}
-            ]
-            
-            # Generate response with both text and image
-            try:
-                response = model.generate_content(content_parts)
-                print("Successfully generated content with image input")
-            except Exception as e:
-                print(f"Error generating content with image: {str(e)}")
-                # Try with a more explicit instruction if the regular prompt fails
-                instruction_with_image = [
-                    {"role": "user", "parts": [{"text": "You are Gemini 2.0 Flash, a helpful assistant that can analyze images. Please describe what you see in this image and answer any questions about it."}, image_parts[0]]},
-                    {"role": "user", "parts": [{"text": user_input}]}
-                ]
-                response = model.generate_content(instruction_with_image)
-        else:
-            # Text-only request using the same content parts approach as Articuno.AI
-            content_parts = [
-                {"role": "user", "parts": [{"text": gemini_system_prompt}]},
-                {"role": "model", "parts": [{"text": "I understand. I'll be Gemini 2.0 Flash, your helpful assistant."}]},
-                {"role": "user", "parts": [{"text": user_input}]}
-            ]
-            
-            response = model.generate_content(content_parts)
-        
-        # Extract response text
-        markdown_output = response.text
-        html_response = markdown.markdown(markdown_output)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Gemini API error: {str(e)}")
-        return jsonify({"error": f"Error with Gemini API: {str(e)}"}), 500
+        handler = backend.get_response_function()
+    except BackendUnavailableError as e:
+        if backend.returns == RETURNS_RESPONSE:
+            return jsonify({"error": str(e)}), 500
+        return jsonify({"response": markdown.markdown(str(e))})
 
-def process_wikipedia_request(user_input):
-    """Process chat request using Wikipedia Agent"""
     try:
-        # Get response from Wikipedia agent
-        response_text = get_wikipedia_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Wikipedia Agent error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Wikipedia Agent: {str(e)}"}), 500
+        output = handler(*backend.build_args(user_input, image_data, session_id))
 
-def process_gpt4o_mini_request(user_input):
-    """Process chat request using GPT-4o-mini from GitHub Models"""
-    try:
-        # Get response from GPT-4o-mini agent
-        response_text = get_gpt4o_mini_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"GPT-4o-mini error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with GPT-4o-mini: {str(e)}"}), 500
+        if backend.returns == RETURNS_RESPONSE:
+            return output
+        if backend.returns == RETURNS_HTML:
+            return jsonify({"response": output})
 
-def process_grok3_request(user_input):
-    """Process chat request using Grok-3 from GitHub Models"""
-    try:
-        # Get response from Grok-3 agent
-        response_text = get_grok3_response(user_input)
-        
         # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Grok-3 error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Grok-3: {str(e)}"}), 500
+        return jsonify({"response": markdown.markdown(output)})
 
-def process_grok3_mini_request(user_input):
-    """Process chat request using Grok-3 Mini from GitHub Models"""
-    try:
-        # Get response from Grok-3 Mini agent
-        response_text = get_grok3_mini_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
     except Exception as e:
-        print(f"Grok-3 Mini error: {str(e)}")
+        print(f"{backend.name} error: {str(e)}")
         traceback.print_exc()
-        return jsonify({"error": f"Error with Grok-3 Mini: {str(e)}"}), 500
+        return jsonify({"error": f"Error with {backend.name}: {str(e)}"}), 500
 
-def process_ministral_3b_request(user_input):
-    """Process chat request using Ministral 3B from GitHub Models"""
+def get_stream_generator(backend, user_input, image_data=None, session_id=None):
+    """
+    Returns a generator of markdown deltas from a registered bot backend.
+    """
     try:
-        # Get response from Ministral 3B agent
-        response_text = get_ministral_3b_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Ministral 3B error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Ministral 3B: {str(e)}"}), 500
+        handler = backend.get_stream_function()
+    except BackendUnavailableError as e:
+        if backend.returns == RETURNS_RESPONSE:
+            raise
+        return iter([str(e)])
+
+    return handler(*backend.build_args(user_input, image_data, session_id))
+
+def format_sse(data, event=None):
+    """Formats a JSON payload as a Server-Sent Events message."""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+@app.route('/api/chat/stream', methods=["POST"])
+def chat_stream():
+    """
+    Streaming variant of /api/chat using Server-Sent Events.
 
-def process_codestral_2501_request(user_input):
-    """Process chat request using Codestral 2501 from GitHub Models"""
-    try:
-        # Get response from Codestral 2501 agent (already returns jsonified HTML response)
-        return get_codestral_2501_response(user_input)
-    
-    except Exception as e:
-        print(f"Codestral 2501 error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Codestral 2501: {str(e)}"}), 500
+    Emits a "session" event, then one message per markdown delta ({"delta": ...}),
+    and finally a "done" event carrying the rendered HTML. The assembled response
+    is persisted only after the stream has finished.
+    """
+    data = request.json
+    user_input = data.get('message', '')
+    image_data = data.get('image', None)
+    bot_name = data.get('bot', 'Articuno.AI')
+    session_id = data.get('session_id', None)
 
-def process_deepseek_v3_request(user_input):
-    """Process chat request using DeepSeek V3 0324 from GitHub Models"""
-    try:
-        # Get response from DeepSeek V3 agent
-        response_text = get_deepseek_v3_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"DeepSeek V3 error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with DeepSeek V3: {str(e)}"}), 500
+    # Get or create session
+    if not session_id:
+        session_id = session.get('current_session_id')
+        if not session_id:
+            user_id = session.get('user_id', 'anonymous')
+            session_id = db_manager.create_session(user_id=user_id, bot_name=bot_name)
+            session['current_session_id'] = session_id
 
-def process_phi4_request(user_input):
-    """Process chat request using Phi-4 from GitHub Models"""
-    try:
-        # Get response from Phi-4 agent
-        response_text = get_phi4_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Phi-4 error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Phi-4: {str(e)}"}), 500
+    if not user_input and not image_data:
+        return jsonify({"error": "No message or image provided"}), 400
 
-def process_phi4_mini_request(user_input):
-    """Process chat request using Phi-4 Mini from GitHub Models"""
-    try:
-        # Get response from Phi-4 Mini agent
-        response_text = get_phi4_mini_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Phi-4 Mini error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Phi-4 Mini: {str(e)}"}), 500
+    backend = bot_registry.resolve(bot_name, image_data)
 
-def process_llama_31_8b_request(user_input):
-    """Process chat request using Meta Llama 3.1 8B from GitHub Models"""
-    try:
-        # Get response from Meta Llama 3.1 8B agent
-        response_text = get_llama_31_8b_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Meta Llama 3.1 8B error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Meta Llama 3.1 8B: {str(e)}"}), 500
+    def generate():
+        started = time.perf_counter()
+        yield format_sse({"session_id": session_id}, event="session")
 
-def process_llama_33_70b_request(user_input):
-    """Process chat request using Meta Llama 3.3 70B from GitHub Models"""
-    try:
-        # Get response from Meta Llama 3.3 70B agent
-        response_text = get_llama_33_70b_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Meta Llama 3.3 70B error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Meta Llama 3.3 70B: {str(e)}"}), 500
+        markdown_parts = []
+        try:
+            for delta in get_stream_generator(backend, user_input, image_data, session_id):
+                if not delta:
+                    continue
+                markdown_parts.append(delta)
+                yield format_sse({"delta": delta})
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            traceback.print_exc()
+            yield format_sse({"error": str(e), "session_id": session_id}, event="error")
+            return
 
-def process_cohere_command_a_request(user_input):
-    """Process chat request using Cohere Command A from GitHub Models"""
-    try:
-        # Get response from Cohere Command A agent
-        response_text = get_cohere_command_a_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Cohere Command A error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Cohere Command A: {str(e)}"}), 500
+        html_response = render_markdown_response("".join(markdown_parts), backend.code_highlight)
 
-def process_cohere_command_r_plus_request(user_input):
-    """Process chat request using Cohere Command R+ from GitHub Models"""
-    try:
-        # Get response from Cohere Command R+ agent
-        response_text = get_cohere_command_r_plus_response(user_input)
-        
-        # Convert markdown to HTML
-        html_response = markdown.markdown(response_text)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Cohere Command R+ error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Cohere Command R+: {str(e)}"}), 500
+        # Save user message with the assembled AI response once the stream is complete
+        try:
+            db_manager.save_message(
+                session_id=session_id,
+                message=user_input,
+                role='user',
+                bot_name=bot_name,
+                image_data=image_data,
+                response=html_response,
+                latency_ms=(time.perf_counter() - started) * 1000
+            )
+        except Exception as db_error:
+            print(f"Error saving to database: {str(db_error)}")
+            traceback.print_exc()
 
-def process_bikram_ai_request(user_input):
-    """Process chat request using Bikram.AI"""
-    try:
-        # Get response from Bikram.AI agent (already returns HTML with markdown converted)
-        html_response = get_bikram_ai_response(user_input)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        print(f"Bikram.AI error: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error with Bikram.AI: {str(e)}"}), 500
-
-# OLD FUNCTION - Now handled by agent/gpt_4o.py
-# def process_azure_openai_request(user_input, image_data=None):
-def process_azure_openai_request_OLD(user_input, image_data=None):
-    """DEPRECATED: Process chat request using Azure OpenAI API  
-    This function has been moved to agent/gpt_4o.py"""
-    # OpenAI API Configuration from environment variables
-    token = os.getenv("AZURE_OPENAI_API_KEY")
-    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-    model_name = os.getenv("AZURE_OPENAI_MODEL")
+        yield format_sse({"response": html_response, "session_id": session_id}, event="done")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@app.route('/api/models', methods=["GET"])
+def list_models():
+    """List the registered bots and whether each backend has been loaded"""
+    return jsonify({"models": bot_registry.describe()})
+
+@app.route('/api/cache/stats', methods=["GET"])
+def get_cache_stats():
+    """Response cache hit/miss statistics for this worker"""
+    return jsonify({
+        "exact": response_cache.stats(),
+        "semantic": semantic_cache.stats(),
+        "weather": weather_cache.stats(),
+        "embeddings": embedding_cache_stats()
+    })
+
+@app.route('/api/db/stats', methods=["GET"])
+def get_db_stats():
+    """Message write-behind, session compaction and transcription queue counters for this worker"""
+    return jsonify({
+        "write_behind": db_manager.get_write_stats(),
+        "compaction": session_compactor.stats() if session_compactor else {"enabled": False},
+        "transcription": transcription_jobs.stats()
+    })
+
+# Bearer token for /api/export; the endpoint is off while it is unset
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN")
+
+@app.route('/api/export', methods=["GET"])
+def export_chat_history():
+    """
+    Streams chat history as NDJSON (see database/transfer.py)
+
+    Optional filters: session_id (repeatable), user_id, since (ISO date), images=false.
+    Requires "Authorization: Bearer <EXPORT_TOKEN>".
+    """
+    if not EXPORT_TOKEN:
+        return jsonify({"error": "Export is disabled. Set EXPORT_TOKEN to enable it."}), 403
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {EXPORT_TOKEN}"):
+        return jsonify({"error": "Invalid export token"}), 401
     
     try:
-        # Prepare headers
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": token
-        }
-        
-        # Prepare messages
-        system_message = {
-            "role": "system",
-            "content": (
-                "You are Eubyte, a friendly virtual assistant thoughtfully developed by the Edubyte Team to provide "
-                "intelligent, user-friendly, and context-aware support. As a helpful assistant, your primary goal is "
-                "to deliver accurate, concise, and engaging responses.\n\n"
-
-                "🧠 Identity\n"
-                "Name: Eubyte\n"
-                "Developed by: Edubyte Team\n"
-                "Role: Friendly, fast, intelligent and supportive virtual assistant\n\n"
-
-                "📝 Response Structure\n"
-                "- Use clear headings (H1, H2, etc.) to organize information logically.\n"
-                "- Present details using bullet points or numbered lists where appropriate for readability.\n"
-                "- Include spaces after headings and between paragraphs for improved visual clarity.\n"
-                "- Integrate appropriate emojis (e.g., ✅📌🚀) to enhance interactivity and user engagement, without overwhelming the message.\n\n"
-
-                "🌟 Tone and Style\n"
-                "- Maintain a professional yet friendly tone.\n"
-                "- Be concise, yet ensure clarity and completeness.\n"
-                "- Adapt your communication style based on the user's intent and tone."
-            )
-        }
-        
-        # Handle regular text messages
-        if image_data is None:
-            user_message = {
-                "role": "user",
-                "content": user_input
-            }
-            messages = [system_message, user_message]
-        # Handle messages with images
-        else:
-            # Process the image data
-            image_format = image_data.get("format", "jpeg")
-            image_binary = base64.b64decode(image_data.get("data").split(",")[1])
-            image_url = get_image_data_url(image_binary, image_format)
-            
-            # Create multimodal message with both text and image
-            user_message = {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": user_input
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": image_url,
-                            "detail": "auto"
-                        }
-                    }
-                ]
-            }
-            messages = [system_message, user_message]
-        
-        # Create the payload
-        payload = {
-            "messages": messages,
-            "temperature": 1.0,
-            "top_p": 1.0,
-            "max_tokens": 1000,
-            "model": model_name
+        since = request.args.get('since')
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        return jsonify({"error": "since must be an ISO 8601 date"}), 400
+    
+    records = export_history(
+        db_manager,
+        session_ids=request.args.getlist('session_id') or None,
+        user_id=request.args.get('user_id'),
+        since=since,
+        include_images=request.args.get('images', 'true').lower() not in ('false', '0', 'no')
+    )
+    
+    return Response(
+        stream_with_context(records),
+        mimetype='application/x-ndjson',
+        headers={
+            'Content-Disposition': f'attachment; filename="articuno-history-{datetime.utcnow():%Y%m%d-%H%M%S}.ndjson"',
+            'X-Accel-Buffering': 'no'
         }
-        
-        # Make direct API call
-        api_url = f"{endpoint}/openai/deployments/{model_name}/chat/completions?api-version=2024-02-15-preview"
-        response = requests.post(api_url, headers=headers, json=payload)
-        response_data = response.json()
-        
-        # Extract response text
-        markdown_output = response_data["choices"][0]["message"]["content"]
-        html_response = markdown.markdown(markdown_output)
-        
-        return jsonify({"response": html_response})
-    
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    )
 
 @app.route('/api/test_gemini', methods=["GET"])
 def test_gemini():
@@ -1364,6 +877,7 @@ def test_gemini():
             return jsonify({"status": "error", "message": "Gemini API key not configured. Please set GEMINI_API_KEY in .env file."}), 500
         
         # Configure Gemini with the API key
+        import google.generativeai as genai
         genai.configure(api_key=GEMINI_API_KEY)
         
         # Create a simple model with the same approach as Articuno.AI
@@ -0,0 +1,322 @@
+"""
+ASGI entry point for Articuno.AI
+
+Serves /api/chat, /api/weather and /api/transcribe on an event loop, so a single
+worker can keep many upstream LLM and weather calls in flight at once:
+
+    uvicorn asgi:app --host 127.0.0.1 --port 5000
+
+Every other route (pages, sessions, SSE streaming, search, ...) is handled by the
+Flask app from app.py, mounted underneath. Sessions are shared with Flask through
+its signed session cookie.
+"""
+
+import asyncio
+import contextlib
+import os
+import time
+import traceback
+
+import aiohttp
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from app import (
+    app as flask_app,
+    db_manager,
+    call_backend,
+    render_markdown_response,
+    lookup_cached_response,
+    store_cached_response,
+    cache_bypass_requested,
+    transcription_jobs,
+    transcription_error_message,
+    TRANSCRIBE_WAIT_TIMEOUT,
+    MONGODB_URI,
+    MONGODB_CLIENT_OPTIONS,
+    IMAGE_STORE,
+    IMAGE_STORE_PATH,
+    SESSION_ARCHIVE,
+    SESSION_ARCHIVE_PATH
+)
+from database.async_db_manager import get_async_db_manager
+from speech import QueueFullError
+from agent.registry import bot_registry, BackendUnavailableError
+from agent.github_models import close_async_clients
+from agent.openweather import fetch_openweather_async, OPENWEATHER_TIMEOUT
+
+# The Flask app, exposed as an ASGI app (runs on the threadpool)
+flask_asgi = WsgiToAsgi(flask_app)
+
+# With MONGODB_ASYNC=on, /api/chat creates sessions and saves turns on the event loop
+# through the async MongoDB client instead of the threadpool and the write-behind writer
+async_db_manager = None
+if os.getenv("MONGODB_ASYNC", "off").lower() in ("on", "true", "1"):
+    async_db_manager = get_async_db_manager(
+        MONGODB_URI,
+        image_store=IMAGE_STORE,
+        image_store_path=IMAGE_STORE_PATH,
+        client_options=MONGODB_CLIENT_OPTIONS,
+        session_archive=SESSION_ARCHIVE,
+        session_archive_path=SESSION_ARCHIVE_PATH
+    )
+
+
+def load_flask_session(request):
+    """
+    Reads the Flask session cookie so both apps see the same chat session.
+
+    Args:
+        request (Request): The incoming request
+
+    Returns:
+        dict: Session data, empty if there is no valid cookie
+    """
+    cookie = request.cookies.get(flask_app.config["SESSION_COOKIE_NAME"])
+    if not cookie:
+        return {}
+
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+        return dict(serializer.loads(cookie, max_age=max_age))
+    except Exception:
+        return {}
+
+
+def save_flask_session(response, data):
+    """Writes session data back as a Flask-compatible signed cookie."""
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    response.set_cookie(
+        flask_app.config["SESSION_COOKIE_NAME"],
+        serializer.dumps(data),
+        path=flask_app.config["SESSION_COOKIE_PATH"] or "/",
+        secure=flask_app.config["SESSION_COOKIE_SECURE"],
+        httponly=flask_app.config["SESSION_COOKIE_HTTPONLY"],
+        samesite=flask_app.config["SESSION_COOKIE_SAMESITE"]
+    )
+
+
+def _call_backend_sync(backend, user_input, image_data=None, session_id=None):
+    """Runs app.call_backend (which builds Flask responses) inside an app context."""
+    with flask_app.app_context():
+        result = call_backend(backend, user_input, image_data, session_id)
+
+        status_code = 200
+        if isinstance(result, tuple):
+            result, status_code = result
+        return result.get_json(), status_code
+
+
+async def call_backend_async(backend, user_input, image_data=None, session_id=None):
+    """
+    Async counterpart of app.call_backend.
+
+    Backends with a coroutine function are awaited on the event loop; the rest
+    (and backends whose module failed to load) run on the threadpool.
+
+    Args:
+        backend (BotBackend): The backend resolved from the bot registry
+        user_input (str): The user's message
+        image_data (dict, optional): Image attached to the message
+        session_id (str, optional): Current chat session
+
+    Returns:
+        tuple: (JSON payload, status code)
+    """
+    try:
+        handler = backend.get_async_function()
+    except BackendUnavailableError:
+        handler = None
+
+    if handler is None:
+        return await run_in_threadpool(_call_backend_sync, backend, user_input, image_data, session_id)
+
+    try:
+        markdown_output = await handler(*backend.build_args(user_input, image_data, session_id))
+    except Exception as e:
+        print(f"{backend.name} error: {str(e)}")
+        traceback.print_exc()
+        return {"error": f"Error with {backend.name}: {str(e)}"}, 500
+
+    return {"response": render_markdown_response(markdown_output, backend.code_highlight)}, 200
+
+
+async def chat(request):
+    """Async /api/chat: same request and response format as the Flask route"""
+    data = await request.json()
+    user_input = data.get('message', '')
+    image_data = data.get('image', None)
+    bot_name = data.get('bot', 'Articuno.AI')
+    session_id = data.get('session_id', None)
+
+    # Get or create session
+    flask_session = load_flask_session(request)
+    session_created = False
+    if not session_id:
+        session_id = flask_session.get('current_session_id')
+        if not session_id:
+            user_id = flask_session.get('user_id', 'anonymous')
+            if async_db_manager is not None:
+                session_id = await async_db_manager.create_session(user_id=user_id, bot_name=bot_name)
+            else:
+                session_id = await run_in_threadpool(db_manager.create_session, user_id=user_id, bot_name=bot_name)
+            flask_session['current_session_id'] = session_id
+            session_created = True
+
+    if not user_input and not image_data:
+        response = JSONResponse({"error": "No message or image provided"}, status_code=400)
+    else:
+        try:
+            started = time.perf_counter()
+            backend = bot_registry.resolve(bot_name, image_data)
+
+            # Cache lookups may import the backend, embed the prompt or hit MongoDB, so they run off the loop
+            cached_response, cache_state = await run_in_threadpool(
+                lookup_cached_response, backend, user_input, image_data,
+                cache_bypass_requested(data, request.headers)
+            )
+
+            if cached_response is not None:
+                payload, status_code = cached_response, 200
+            else:
+                payload, status_code = await call_backend_async(backend, user_input, image_data, session_id)
+
+                # Remember successful answers of stateless bots
+                if status_code == 200:
+                    await run_in_threadpool(store_cached_response, backend, cache_state, payload)
+
+            # Save user message with AI response to database
+            try:
+                message = dict(
+                    session_id=session_id,
+                    message=user_input,
+                    role='user',
+                    bot_name=bot_name,
+                    image_data=image_data,
+                    response=payload.get('response', ''),
+                    latency_ms=(time.perf_counter() - started) * 1000
+                )
+                if async_db_manager is not None:
+                    await async_db_manager.save_message(**message)
+                else:
+                    await run_in_threadpool(db_manager.save_message, **message)
+            except Exception as db_error:
+                print(f"Error saving to database: {str(db_error)}")
+                traceback.print_exc()
+
+            payload['session_id'] = session_id
+            response = JSONResponse(payload, status_code=status_code)
+
+        except Exception as e:
+            print(f"Error in chat endpoint: {str(e)}")
+            traceback.print_exc()
+            response = JSONResponse({"error": str(e)}, status_code=500)
+
+    if session_created:
+        save_flask_session(response, flask_session)
+    return response
+
+
+class ChatEndpoint:
+    """Routes event-stream requests to the Flask SSE route and the rest to the async chat"""
+
+    async def __call__(self, scope, receive, send):
+        accept = parse_accept_header(Request(scope).headers.get('accept'), MIMEAccept)
+        if accept.best == 'text/event-stream':
+            await flask_asgi(scope, receive, send)
+            return
+
+        response = await chat(Request(scope, receive))
+        await response(scope, receive, send)
+
+
+async def get_weather(request):
+    """Async /api/weather over a shared aiohttp session and the shared weather cache"""
+    location = request.query_params.get('location')
+    lat = request.query_params.get('lat')
+    lon = request.query_params.get('lon')
+    request_type = request.query_params.get('type', 'current')  # 'current' or 'forecast'
+
+    if not location and not (lat and lon):
+        return JSONResponse({"error": "Missing location or coordinates"}, status_code=400)
+
+    try:
+        kind = 'current' if request_type == 'current' else 'forecast'
+        status_code, data = await fetch_openweather_async(request.app.state.http_session, kind, location, lat, lon)
+
+        if status_code != 200:
+            error_message = data.get('message', 'Unknown error')
+            print(f"Error from OpenWeather API: {status_code} - {error_message}")
+            return JSONResponse({
+                "error": f"Weather API error: {status_code} - {error_message}",
+                "success": False
+            }, status_code=status_code)
+
+        return JSONResponse(data)
+
+    except Exception as e:
+        print(f"Error fetching weather data: {str(e)}")
+        traceback.print_exc()
+        return JSONResponse({"error": str(e), "success": False}, status_code=500)
+
+
+async def transcribe(request):
+    """
+    Async /api/transcribe
+
+    The upload is read on the event loop; decoding and speech recognition run on
+    the transcription worker pool, which the request awaits without holding a thread.
+    """
+    try:
+        form = await request.form()
+        if 'audio' not in form:
+            return JSONResponse({"error": "No audio file provided"}, status_code=400)
+
+        audio_data = await form['audio'].read()
+        if len(audio_data) == 0:
+            return JSONResponse({"error": "Empty audio file"}, status_code=400)
+
+        job = transcription_jobs.submit(audio_data)
+        try:
+            # Shielded so a timeout leaves the job running for polling
+            transcribed_text = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), TRANSCRIBE_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            return JSONResponse(job.to_dict(), status_code=202)
+        except Exception as e:
+            transcribed_text = transcription_error_message(e)
+
+        return JSONResponse({"transcription": transcribed_text, "job_id": job.id})
+    except QueueFullError as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "5"})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    app.state.http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=OPENWEATHER_TIMEOUT))
+    try:
+        yield
+    finally:
+        await app.state.http_session.close()
+        await close_async_clients()
+        if async_db_manager is not None:
+            await async_db_manager.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/chat', ChatEndpoint(), methods=["POST"]),
+        Route('/api/weather', get_weather, methods=["GET"]),
+        Route('/api/transcribe', transcribe, methods=["POST"]),
+        Mount('/', app=flask_asgi)
+    ],
+    lifespan=lifespan
+)
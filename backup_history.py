@@ -0,0 +1,81 @@
+"""
+Export chat history to NDJSON, or import it back
+Use this to back up conversations or move them to another MongoDB
+
+    python backup_history.py export history.ndjson
+    python backup_history.py import history.ndjson --checkpoint history.ndjson.checkpoint
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from database.db_manager import get_db_manager
+    from database.transfer import export_history, import_history
+except ImportError as e:
+    print(f"✗ Failed to import database module: {e}")
+    sys.exit(1)
+
+
+def export_command(db, args):
+    """Stream the selected history into a file (or stdout with '-')"""
+    since = datetime.fromisoformat(args.since) if args.since else None
+    output = sys.stdout.buffer if args.file == '-' else open(args.file, 'wb')
+    lines = 0
+    try:
+        for line in export_history(db,
+                                   session_ids=args.session or None,
+                                   user_id=args.user,
+                                   since=since,
+                                   include_images=not args.no_images):
+            output.write(line)
+            lines += 1
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    print(f"✓ Exported {lines} record(s)", file=sys.stderr)
+
+
+def import_command(db, args):
+    """Load an export, resuming from the checkpoint file when there is one"""
+    with open(args.file, 'rb') as f:
+        counts = import_history(db, f, checkpoint_path=args.checkpoint)
+    if counts['resumed_after']:
+        print(f"Resumed after line {counts['resumed_after']}")
+    print(f"✓ Imported {counts['sessions']} session(s), {counts['messages']} message(s) "
+          f"and {counts['images']} image(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import Articuno.AI chat history as NDJSON")
+    parser.add_argument('--mongodb-uri', default=os.getenv("MONGODB_URI", "mongodb://127.0.0.1:27017/"))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help="Write sessions, messages and images to NDJSON")
+    export_parser.add_argument('file', help="Output file, or - for stdout")
+    export_parser.add_argument('--session', action='append', help="Session id to export (repeatable)")
+    export_parser.add_argument('--user', help="Only sessions of this user id")
+    export_parser.add_argument('--since', help="Only sessions active since this ISO date")
+    export_parser.add_argument('--no-images', action='store_true', help="Leave image blobs out")
+
+    import_parser = commands.add_parser('import', help="Load an NDJSON export")
+    import_parser.add_argument('file', help="NDJSON file written by export")
+    import_parser.add_argument('--checkpoint', help="Checkpoint file; rerun with the same one to resume")
+
+    args = parser.parse_args()
+
+    try:
+        db = get_db_manager(args.mongodb_uri)
+        if args.command == 'export':
+            export_command(db, args)
+        else:
+            import_command(db, args)
+        db.close()
+    except Exception as e:
+        print(f"✗ Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,27 @@
+"""
+Cache package for Articuno.AI
+"""
+
+from .response_cache import (
+    CacheBackend,
+    MemoryCacheBackend,
+    MongoCacheBackend,
+    ResponseCache,
+    get_response_cache
+)
+from .semantic_cache import SemanticCache, VectorIndex, embedding_cache_stats, get_semantic_cache
+from .weather_cache import WeatherCache, get_weather_cache
+
+__all__ = [
+    'CacheBackend',
+    'MemoryCacheBackend',
+    'MongoCacheBackend',
+    'ResponseCache',
+    'get_response_cache',
+    'SemanticCache',
+    'VectorIndex',
+    'embedding_cache_stats',
+    'get_semantic_cache',
+    'WeatherCache',
+    'get_weather_cache'
+]
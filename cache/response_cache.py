@@ -0,0 +1,291 @@
+"""
+Exact-match response cache for Articuno.AI
+Stores rendered chat responses keyed on the normalized prompt, bot and generation params
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Callable, Dict, Any
+
+# Bump to invalidate every cached response (e.g. after changing system prompts)
+CACHE_VERSION = 1
+
+
+class CacheBackend:
+    """Storage interface for ResponseCache"""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored value, or None if missing or expired"""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        """Store a value for ttl seconds"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Remove a value"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove all values"""
+        raise NotImplementedError
+
+    def size(self) -> Optional[int]:
+        """Number of stored values, if known"""
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process backend with per-entry TTL and LRU eviction"""
+
+    def __init__(self, max_entries: int = 1000):
+        """
+        Initialize the backend
+
+        Args:
+            max_entries: Entries kept before the least recently used one is evicted
+        """
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class MongoCacheBackend(CacheBackend):
+    """
+    Shared backend on a MongoDB collection, so all workers see the same entries.
+    Expiry is enforced on read and by a TTL index; size is bounded only by the TTL.
+    """
+
+    def __init__(self, collection=None, get_collection: Optional[Callable[[], Any]] = None):
+        """
+        Initialize the backend (the TTL index is created on first use)
+
+        Args:
+            collection: pymongo collection used for cache entries
+            get_collection: Alternatively, returns the collection of the current process;
+                called on every use, so a forked worker never uses its parent's client
+        """
+        if (collection is None) == (get_collection is None):
+            raise ValueError("MongoCacheBackend needs either a collection or get_collection")
+        self._collection = collection
+        self._get_collection = get_collection
+        self._indexed = False
+
+    @property
+    def collection(self):
+        collection = self._collection if self._get_collection is None else self._get_collection()
+        if not self._indexed:
+            collection.create_index('expires_at', expireAfterSeconds=0)
+            self._indexed = True
+        return collection
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.collection.find_one(
+            {'_id': key, 'expires_at': {'$gt': datetime.utcnow()}},
+            {'value': 1}
+        )
+        return entry['value'] if entry else None
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        self.collection.replace_one(
+            {'_id': key},
+            {'_id': key, 'value': value, 'expires_at': datetime.utcnow() + timedelta(seconds=ttl)},
+            upsert=True
+        )
+
+    def delete(self, key: str):
+        self.collection.delete_one({'_id': key})
+
+    def clear(self):
+        self.collection.delete_many({})
+
+    def size(self) -> Optional[int]:
+        return self.collection.estimated_document_count()
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a prompt so trivially different spellings share a cache entry"""
+    prompt = unicodedata.normalize('NFKC', prompt or '')
+    return re.sub(r'\s+', ' ', prompt).strip().casefold()
+
+
+class ResponseCache:
+    """TTL cache of rendered responses in front of the chat dispatch"""
+
+    def __init__(self, backend: CacheBackend, ttl: float = 3600, enabled: bool = True):
+        """
+        Initialize the cache
+
+        Args:
+            backend: Storage backend
+            ttl: Seconds a response stays valid
+            enabled: Whether lookups and stores are performed at all
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(bot_name: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the cache key for a request
+
+        Args:
+            bot_name: Bot the prompt is sent to
+            prompt: The user's message
+            params: Generation parameters that influence the answer
+
+        Returns:
+            Hex digest identifying the request
+        """
+        material = json.dumps(
+            [CACHE_VERSION, bot_name, normalize_prompt(prompt), params or {}],
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached response; backend failures count as misses"""
+        if not self.enabled:
+            return None
+
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Response cache lookup failed: {str(e)}")
+            self._count('errors')
+            value = None
+
+        self._count('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        """Store a response; backend failures are logged and ignored"""
+        if not self.enabled:
+            return
+
+        try:
+            self.backend.set(key, value, self.ttl if ttl is None else ttl)
+            self._count('stores')
+        except Exception as e:
+            print(f"Response cache store failed: {str(e)}")
+            self._count('errors')
+
+    def clear(self):
+        """Remove all cached responses"""
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process"""
+        lookups = self.hits + self.misses
+        stats = {
+            'enabled': self.enabled,
+            'backend': self.backend.__class__.__name__,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'stores': self.stores,
+            'errors': self.errors
+        }
+
+        try:
+            stats['entries'] = self.backend.size()
+        except Exception:
+            stats['entries'] = None
+
+        if isinstance(self.backend, MemoryCacheBackend):
+            stats['max_entries'] = self.backend.max_entries
+            stats['evictions'] = self.backend.evictions
+
+        return stats
+
+
+# Singleton instance
+_cache_instance = None
+
+def get_response_cache(backend: str = 'memory',
+                       ttl: float = 3600,
+                       max_entries: int = 1000,
+                       collection=None,
+                       get_collection: Optional[Callable[[], Any]] = None) -> ResponseCache:
+    """
+    Get or create a ResponseCache singleton instance
+
+    Args:
+        backend: 'memory', 'mongodb' (shared, needs collection) or 'none'
+        ttl: Seconds a response stays valid
+        max_entries: LRU bound for the memory backend
+        collection: pymongo collection for the mongodb backend
+        get_collection: Alternatively, returns the collection of the current process
+
+    Returns:
+        ResponseCache instance
+    """
+    global _cache_instance
+
+    if _cache_instance is None:
+        if backend == 'mongodb':
+            if collection is None and get_collection is None:
+                raise ValueError("The mongodb response cache backend needs a collection")
+            cache_backend = MongoCacheBackend(collection, get_collection)
+        elif backend in ('memory', 'none'):
+            cache_backend = MemoryCacheBackend(max_entries)
+        else:
+            raise ValueError(f"Unknown response cache backend: {backend}")
+
+        _cache_instance = ResponseCache(cache_backend, ttl=ttl, enabled=backend != 'none')
+
+    return _cache_instance
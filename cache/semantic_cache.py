@@ -0,0 +1,307 @@
+"""
+Semantic response cache for Articuno.AI
+Serves stored answers for paraphrased prompts using text-embedding-004 similarity
+"""
+
+import importlib.util
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from .response_cache import normalize_prompt
+
+# RAG/ is not an importable package, so its embeddings module is loaded by path
+RAG_EMBEDDINGS_PATH = Path(__file__).resolve().parent.parent / "RAG" / "app" / "utils" / "embeddings.py"
+# Module name it is registered under, so Bikram.AI's RAG tool shares the same instance (and query cache)
+RAG_EMBEDDINGS_MODULE = "rag_embeddings"
+
+
+def load_rag_embeddings():
+    """
+    Load RAG/app/utils/embeddings.py once per process
+
+    Returns:
+        The embeddings module
+    """
+    module = sys.modules.get(RAG_EMBEDDINGS_MODULE)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(RAG_EMBEDDINGS_MODULE, RAG_EMBEDDINGS_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[RAG_EMBEDDINGS_MODULE] = module
+    return module
+
+
+def embedding_cache_stats() -> Dict[str, Any]:
+    """
+    Statistics of the query embedding cache, if the embeddings module is loaded
+
+    Returns:
+        EmbeddingCache.stats() or {'enabled': False}
+    """
+    module = sys.modules.get(RAG_EMBEDDINGS_MODULE)
+    if module is None or not hasattr(module, 'query_cache'):
+        return {'enabled': False}
+    return module.query_cache.stats()
+
+
+def load_embed_query() -> Callable[[str], List[float]]:
+    """
+    Load embed_query from RAG/app/utils/embeddings.py
+
+    Returns:
+        Function embedding a query with models/text-embedding-004
+    """
+    module = load_rag_embeddings()
+
+    # embed_query relies on the caller having configured Gemini
+    import google.generativeai as genai
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment variables.")
+    genai.configure(api_key=api_key)
+
+    return module.embed_query
+
+
+class VectorIndex:
+    """Fixed-size cosine similarity index; reuses expired slots first, then evicts the least recently used"""
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize the index
+
+        Args:
+            max_entries: Number of prompts kept for this bot
+        """
+        self.max_entries = max_entries
+        self.evictions = 0
+
+        # Allocated on first insert, once the embedding size is known
+        self._vectors: Optional[np.ndarray] = None
+        self._values: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._expires_at = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+
+    def live_count(self, now: float) -> int:
+        """Number of unexpired entries"""
+        return int(np.count_nonzero(self._expires_at > now))
+
+    def search(self, vector: np.ndarray, now: float) -> Tuple[Optional[int], float]:
+        """
+        Find the most similar unexpired entry
+
+        Args:
+            vector: Unit-length query embedding
+            now: Current monotonic time
+
+        Returns:
+            (slot, cosine similarity), or (None, 0.0) if the index is empty
+        """
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            return None, 0.0
+
+        live = self._expires_at > now
+        if not live.any():
+            return None, 0.0
+
+        scores = self._vectors @ vector
+        scores[~live] = -np.inf
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def get(self, slot: int, now: float) -> Optional[Dict[str, Any]]:
+        """Return the value in a slot and mark it as recently used"""
+        self._last_used[slot] = now
+        return self._values[slot]
+
+    def put(self, vector: np.ndarray, value: Dict[str, Any], expires_at: float, now: float, slot: Optional[int] = None):
+        """Store a value, in the given slot or in a free/evicted one"""
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            self._expires_at[:] = 0
+
+        if slot is None:
+            free = np.flatnonzero(self._expires_at <= now)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+        self._vectors[slot] = vector
+        self._values[slot] = value
+        self._expires_at[slot] = expires_at
+        self._last_used[slot] = now
+
+
+class SemanticCache:
+    """Per-bot nearest-neighbour cache of answers, keyed by prompt embeddings"""
+
+    def __init__(self,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None,
+                 threshold: float = 0.95,
+                 ttl: float = 3600,
+                 max_entries: int = 500,
+                 enabled: bool = True):
+        """
+        Initialize the cache
+
+        Args:
+            embed_fn: Text to embedding function (defaults to the RAG embed_query, loaded on first use)
+            threshold: Minimum cosine similarity for a hit
+            ttl: Seconds an answer stays valid
+            max_entries: Prompts kept per bot
+            enabled: Whether lookups and stores are performed at all
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+        self._embed_fn = embed_fn
+        self._indexes: Dict[str, VectorIndex] = {}
+        self._lock = threading.Lock()
+
+    def _embed(self, prompt: str) -> Optional[np.ndarray]:
+        """Embed a prompt as a unit vector"""
+        if self._embed_fn is None:
+            with self._lock:
+                if self._embed_fn is None:
+                    try:
+                        self._embed_fn = load_embed_query()
+                    except Exception as e:
+                        print(f"Semantic cache disabled, embeddings unavailable: {str(e)}")
+                        self.enabled = False
+                        return None
+
+        vector = np.asarray(self._embed_fn(normalize_prompt(prompt)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, bot_name: str, prompt: str) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        Find a stored answer to a similar prompt
+
+        Args:
+            bot_name: Bot the prompt is sent to
+            prompt: The user's message
+
+        Returns:
+            (stored answer or None, prompt embedding to pass to store on a miss)
+        """
+        if not self.enabled:
+            return None, None
+
+        try:
+            vector = self._embed(prompt)
+        except Exception as e:
+            print(f"Semantic cache lookup failed: {str(e)}")
+            with self._lock:
+                self.errors += 1
+            return None, None
+
+        if vector is None:
+            return None, None
+
+        now = time.monotonic()
+        with self._lock:
+            index = self._indexes.get(bot_name)
+            slot, score = index.search(vector, now) if index else (None, 0.0)
+
+            if slot is not None and score >= self.threshold:
+                self.hits += 1
+                return index.get(slot, now), vector
+
+            self.misses += 1
+
+        return None, vector
+
+    def store(self, bot_name: str, vector: Optional[np.ndarray], value: Dict[str, Any], ttl: Optional[float] = None):
+        """
+        Store an answer under the embedding returned by lookup
+
+        Args:
+            bot_name: Bot that produced the answer
+            vector: Prompt embedding from lookup
+            value: Answer to serve for similar prompts
+            ttl: Seconds the answer stays valid (defaults to the cache TTL)
+        """
+        if not self.enabled or vector is None:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            index = self._indexes.get(bot_name)
+            if index is None:
+                index = self._indexes[bot_name] = VectorIndex(self.max_entries)
+
+            # A concurrent request may already have stored a near-identical prompt
+            slot, score = index.search(vector, now)
+            index.put(vector, value, now + (self.ttl if ttl is None else ttl), now,
+                      slot=slot if slot is not None and score >= self.threshold else None)
+            self.stores += 1
+
+    def clear(self):
+        """Remove all stored answers"""
+        with self._lock:
+            self._indexes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and per-bot index sizes for this process"""
+        lookups = self.hits + self.misses
+        now = time.monotonic()
+        with self._lock:
+            bots = {name: index.live_count(now) for name, index in self._indexes.items()}
+            evictions = sum(index.evictions for index in self._indexes.values())
+
+        return {
+            'enabled': self.enabled,
+            'threshold': self.threshold,
+            'ttl': self.ttl,
+            'max_entries_per_bot': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'stores': self.stores,
+            'errors': self.errors,
+            'evictions': evictions,
+            'entries': bots
+        }
+
+
+# Singleton instance
+_semantic_cache_instance = None
+
+def get_semantic_cache(threshold: float = 0.95,
+                       ttl: float = 3600,
+                       max_entries: int = 500,
+                       enabled: bool = True) -> SemanticCache:
+    """
+    Get or create a SemanticCache singleton instance
+
+    Args:
+        threshold: Minimum cosine similarity for a hit
+        ttl: Seconds an answer stays valid
+        max_entries: Prompts kept per bot
+        enabled: Whether the cache is used at all
+
+    Returns:
+        SemanticCache instance
+    """
+    global _semantic_cache_instance
+
+    if _semantic_cache_instance is None:
+        _semantic_cache_instance = SemanticCache(threshold=threshold, ttl=ttl, max_entries=max_entries, enabled=enabled)
+
+    return _semantic_cache_instance
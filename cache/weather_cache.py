@@ -0,0 +1,238 @@
+"""
+Weather data cache for Articuno.AI
+Caches OpenWeather responses per location with separate TTLs per endpoint, and
+collapses concurrent identical lookups into a single upstream request
+"""
+
+import asyncio
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .response_cache import CacheBackend, MemoryCacheBackend
+
+# (HTTP status code, JSON body) as returned by OpenWeather
+WeatherResult = Tuple[int, Dict[str, Any]]
+
+
+class _FlightAbandoned(Exception):
+    """Set on an async flight whose leading request was cancelled, so a waiter takes over the fetch"""
+
+
+class _Flight:
+    """An upstream request that concurrent callers wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[WeatherResult] = None
+        self.error: Optional[BaseException] = None
+
+
+class WeatherCache:
+    """Per-location TTL cache with single-flight request coalescing"""
+
+    def __init__(self, ttls: Dict[str, float], backend: Optional[CacheBackend] = None, max_entries: int = 1000):
+        """
+        Initialize the cache
+
+        Args:
+            ttls: Seconds each kind of data stays valid, e.g. {'current': 600, 'forecast': 1800}
+            backend: Storage backend (defaults to an in-process LRU)
+            max_entries: LRU bound for the default backend
+        """
+        self.ttls = ttls
+        self.backend = backend or MemoryCacheBackend(max_entries)
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kind: str, location: Optional[str] = None, lat=None, lon=None) -> str:
+        """
+        Build the cache key for a lookup
+
+        Args:
+            kind: 'current' or 'forecast'
+            location: City name, normalized so "London" and " london, " share an entry
+            lat: Latitude, rounded to ~1 km when no location is given
+            lon: Longitude, rounded to ~1 km when no location is given
+
+        Returns:
+            Cache key
+        """
+        if location:
+            normalized = re.sub(r'\s*,\s*', ',', re.sub(r'\s+', ' ', location)).strip(' ,.;:!?').casefold()
+            return f"weather:{kind}:q:{normalized}"
+        try:
+            return f"weather:{kind}:ll:{float(lat):.2f},{float(lon):.2f}"
+        except (TypeError, ValueError):
+            # Let OpenWeather reject malformed coordinates
+            return f"weather:{kind}:ll:{lat},{lon}"
+
+    def _get_cached(self, key: str) -> Optional[WeatherResult]:
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            print(f"Weather cache lookup failed: {str(e)}")
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry['status'], entry['data']
+
+    def _store(self, key: str, kind: str, result: WeatherResult):
+        # Errors (unknown city, rate limits, ...) are not cached
+        if result[0] != 200:
+            return
+        try:
+            self.backend.set(key, {'status': result[0], 'data': result[1]}, self.ttls.get(kind, 600))
+        except Exception as e:
+            print(f"Weather cache store failed: {str(e)}")
+
+    def get_or_fetch(self, key: str, kind: str, fetch: Callable[[], WeatherResult]) -> WeatherResult:
+        """
+        Return cached data, or fetch it once for all concurrent callers
+
+        Args:
+            key: Key from make_key
+            kind: 'current' or 'forecast', selects the TTL
+            fetch: Performs the upstream request
+
+        Returns:
+            (status code, JSON body)
+        """
+        cached = self._get_cached(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+            self._store(key, kind, flight.result)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+    async def get_or_fetch_async(self, key: str, kind: str, fetch: Callable[[], Awaitable[WeatherResult]]) -> WeatherResult:
+        """
+        Async counterpart of get_or_fetch for callers on an event loop
+
+        Args:
+            key: Key from make_key
+            kind: 'current' or 'forecast', selects the TTL
+            fetch: Coroutine function performing the upstream request
+
+        Returns:
+            (status code, JSON body)
+        """
+        cached = self._get_cached(key)
+        if cached is not None:
+            return cached
+
+        while True:
+            future = self._async_flights.get(key)
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                # Shielded so one waiter being cancelled does not cancel the shared request
+                return await asyncio.shield(future)
+            except _FlightAbandoned:
+                # The leader was cancelled; the first waiter to wake leads the next attempt
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the error as retrieved even when nobody else was waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._async_flights[key] = future
+
+        try:
+            result = await fetch()
+            self._store(key, kind, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Only this caller was cancelled, the others retry instead of failing with it
+            future.set_exception(_FlightAbandoned())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._async_flights[key]
+
+    def clear(self):
+        """Remove all cached weather data"""
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/coalescing counters for this process"""
+        lookups = self.hits + self.misses
+        try:
+            entries = self.backend.size()
+        except Exception:
+            entries = None
+
+        return {
+            'ttls': self.ttls,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._flights) + len(self._async_flights),
+            'entries': entries
+        }
+
+
+# Singleton instance
+_weather_cache_instance = None
+
+def get_weather_cache(current_ttl: float = 600,
+                      forecast_ttl: float = 1800,
+                      max_entries: int = 1000) -> WeatherCache:
+    """
+    Get or create a WeatherCache singleton instance
+
+    Args:
+        current_ttl: Seconds current conditions stay valid
+        forecast_ttl: Seconds forecasts stay valid
+        max_entries: Locations kept before LRU eviction
+
+    Returns:
+        WeatherCache instance
+    """
+    global _weather_cache_instance
+
+    if _weather_cache_instance is None:
+        _weather_cache_instance = WeatherCache(
+            {'current': current_ttl, 'forecast': forecast_ttl},
+            max_entries=max_entries
+        )
+
+    return _weather_cache_instance
@@ -2,6 +2,29 @@
 Database package for Articuno.AI
 """
 
-from .db_manager import DatabaseManager, get_db_manager
+from .db_manager import DatabaseManager, MessageWriteBehind, build_client_options, get_db_manager
+from .async_db_manager import AsyncDatabaseManager, get_async_db_manager
+from .archive import SessionArchive, MongoSessionArchive, FileSessionArchive, SessionCompactor, create_session_archive
+from .transfer import export_history, import_history
+from .image_store import ImageStore, GridFSImageStore, FileImageStore, create_image_store, is_image_id
 
-__all__ = ['DatabaseManager', 'get_db_manager']
+__all__ = [
+    'DatabaseManager',
+    'MessageWriteBehind',
+    'get_db_manager',
+    'build_client_options',
+    'AsyncDatabaseManager',
+    'get_async_db_manager',
+    'ImageStore',
+    'GridFSImageStore',
+    'FileImageStore',
+    'create_image_store',
+    'is_image_id',
+    'SessionArchive',
+    'MongoSessionArchive',
+    'FileSessionArchive',
+    'SessionCompactor',
+    'create_session_archive',
+    'export_history',
+    'import_history'
+]
@@ -0,0 +1,353 @@
+"""
+Session archive for Articuno.AI
+Cold sessions are moved out of the messages collection into one compressed JSONL
+record per session, and brought back when the session is opened again
+"""
+
+import gzip
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import Binary, json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+
+try:
+    import zstandard
+except ImportError:  # Optional: archives fall back to gzip
+    zstandard = None
+
+# Compression level for zstd archives
+ZSTD_LEVEL = 10
+
+# Largest compressed archive stored as one MongoDB document (the limit is 16 MB)
+MAX_DOCUMENT_ARCHIVE_BYTES = 15 * 1024 * 1024
+
+# Collection of the mongodb archive backend
+ARCHIVE_COLLECTION = 'session_archive'
+
+# File extension of each codec in the filesystem archive
+CODEC_EXTENSIONS = {'zstd': '.jsonl.zst', 'gzip': '.jsonl.gz'}
+
+
+def compress(data: bytes) -> Tuple[str, bytes]:
+    """
+    Compress an archive payload with zstd when available, gzip otherwise
+
+    Args:
+        data: Uncompressed payload
+
+    Returns:
+        (codec name, compressed bytes)
+    """
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return 'gzip', gzip.compress(data)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    """
+    Decompress an archive payload
+
+    Args:
+        codec: Codec name returned by compress
+        data: Compressed bytes
+
+    Returns:
+        Uncompressed payload
+    """
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("This archive is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+
+def serialize_session(session: Dict[str, Any], messages: List[Dict[str, Any]]) -> bytes:
+    """
+    Write a session and its messages as JSONL: the session document first, then one message per line
+
+    Canonical extended JSON keeps ObjectIds, datetimes and binary fields exact.
+
+    Args:
+        session: Session document
+        messages: Message documents, oldest first
+
+    Returns:
+        JSONL bytes
+    """
+    lines = [json_util.dumps(session, json_options=CANONICAL_JSON_OPTIONS)]
+    lines.extend(json_util.dumps(message, json_options=CANONICAL_JSON_OPTIONS) for message in messages)
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def deserialize_session(data: bytes) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Read JSONL written by serialize_session
+
+    Args:
+        data: JSONL bytes
+
+    Returns:
+        (session document, message documents)
+    """
+    lines = [line for line in data.decode('utf-8').split('\n') if line]
+    if not lines:
+        raise ValueError("Empty session archive")
+    return json_util.loads(lines[0]), [json_util.loads(line) for line in lines[1:]]
+
+
+class SessionArchive:
+    """Interface for archived session storage"""
+
+    def put(self, session_id: str, payload: bytes, expires_at: Optional[datetime] = None):
+        """
+        Store the archive of a session, replacing any previous one
+
+        Args:
+            session_id: Session identifier
+            payload: JSONL from serialize_session (compressed here)
+            expires_at: Optional time after which the archive may be dropped
+        """
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Optional[bytes]:
+        """
+        Load the archive of a session
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            Uncompressed JSONL, or None if the session is not archived
+        """
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def session_ids(self) -> Iterator[str]:
+        """Iterate over the archived session ids"""
+        raise NotImplementedError
+
+
+class MongoSessionArchive(SessionArchive):
+    """Archives as compressed binary documents in a collection of the chat database"""
+
+    def __init__(self, db, collection_name: str = ARCHIVE_COLLECTION):
+        """
+        Initialize the archive
+
+        Args:
+            db: pymongo Database
+            collection_name: Archive collection name
+        """
+        self.collection = db[collection_name]
+        # Records of expiring (anonymous) sessions are removed by MongoDB once expires_at passes
+        self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    def put(self, session_id: str, payload: bytes, expires_at: Optional[datetime] = None):
+        codec, data = compress(payload)
+        if len(data) > MAX_DOCUMENT_ARCHIVE_BYTES:
+            raise ValueError(f"Session {session_id} is too large to archive in MongoDB ({len(data)} bytes)")
+        self.collection.replace_one(
+            {'_id': session_id},
+            {
+                '_id': session_id,
+                'codec': codec,
+                'data': Binary(data),
+                'size': len(payload),
+                'archived_at': datetime.utcnow(),
+                'expires_at': expires_at
+            },
+            upsert=True
+        )
+
+    def get(self, session_id: str) -> Optional[bytes]:
+        record = self.collection.find_one({'_id': session_id}, {'codec': 1, 'data': 1})
+        if record is None:
+            return None
+        return decompress(record['codec'], bytes(record['data']))
+
+    def delete(self, session_id: str):
+        self.collection.delete_one({'_id': session_id})
+
+    def session_ids(self) -> Iterator[str]:
+        for record in self.collection.find({}, {'_id': 1}):
+            yield record['_id']
+
+
+class FileSessionArchive(SessionArchive):
+    """Archives as .jsonl.zst (or .jsonl.gz) files under a local directory, sharded like the image store"""
+
+    def __init__(self, root: str):
+        """
+        Initialize the archive
+
+        Args:
+            root: Directory holding the archives
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, session_id: str, codec: str) -> str:
+        return os.path.join(self.root, session_id[:2], session_id + CODEC_EXTENSIONS[codec])
+
+    def put(self, session_id: str, payload: bytes, expires_at: Optional[datetime] = None):
+        # Expiry is left to purge_orphan_archives once the session stub is gone
+        codec, data = compress(payload)
+        path = self._path(session_id, codec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write under a temporary name so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def get(self, session_id: str) -> Optional[bytes]:
+        for codec in CODEC_EXTENSIONS:
+            try:
+                with open(self._path(session_id, codec), 'rb') as f:
+                    return decompress(codec, f.read())
+            except FileNotFoundError:
+                continue
+        return None
+
+    def delete(self, session_id: str):
+        for codec in CODEC_EXTENSIONS:
+            try:
+                os.remove(self._path(session_id, codec))
+            except FileNotFoundError:
+                pass
+
+    def session_ids(self) -> Iterator[str]:
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                for extension in CODEC_EXTENSIONS.values():
+                    if entry.name.endswith(extension):
+                        yield entry.name[:-len(extension)]
+
+
+def create_session_archive(backend: str = 'mongodb', db=None, path: Optional[str] = None) -> SessionArchive:
+    """
+    Create a SessionArchive
+
+    Args:
+        backend: 'mongodb' (needs db) or 'filesystem' (needs path)
+        db: pymongo Database for the mongodb backend
+        path: Directory for the filesystem backend
+
+    Returns:
+        SessionArchive instance
+    """
+    if backend == 'mongodb':
+        if db is None:
+            raise ValueError("The mongodb session archive needs a database")
+        return MongoSessionArchive(db)
+    if backend == 'filesystem':
+        if not path:
+            raise ValueError("The filesystem session archive needs a path")
+        return FileSessionArchive(path)
+    raise ValueError(f"Unknown session archive backend: {backend}")
+
+
+class SessionCompactor:
+    """
+    Background job that archives sessions idle for longer than cold_after seconds
+
+    Runs compact_sessions every interval seconds on a daemon thread. Sessions are
+    claimed before they are archived, so several workers can run a compactor each.
+    """
+
+    def __init__(self, db_manager, cold_after: float = 86400, interval: float = 3600, batch_size: int = 100):
+        """
+        Initialize the job and start its thread
+
+        Args:
+            db_manager: DatabaseManager to compact
+            cold_after: Seconds of inactivity after which a session is archived
+            interval: Seconds between compaction runs
+            batch_size: Most sessions archived per run
+        """
+        self.db_manager = db_manager
+        self.cold_after = cold_after
+        self.interval = interval
+        self.batch_size = batch_size
+
+        # Metrics
+        self.runs = 0
+        self.archived = 0
+        self.purged = 0
+        self.failures = 0
+        self.last_run = None
+
+        self._start()
+
+        # Threads do not survive fork(); each worker of a pre-fork server runs its own job
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        """(Re)create the thread for the current process"""
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="session-compactor", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def run_once(self) -> int:
+        """
+        Archive one batch of cold sessions and drop archives whose session expired
+
+        Returns:
+            Number of sessions archived
+        """
+        try:
+            archived = self.db_manager.compact_sessions(self.cold_after, limit=self.batch_size)
+            self.purged += self.db_manager.purge_orphan_archives()
+            self.archived += archived
+            return archived
+        except Exception as e:
+            self.failures += 1
+            print(f"Error compacting sessions: {str(e)}")
+            return 0
+        finally:
+            self.runs += 1
+            self.last_run = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get compaction statistics
+
+        Returns:
+            Dictionary with run, archive and failure counters
+        """
+        return {
+            'enabled': True,
+            'cold_after': self.cold_after,
+            'interval': self.interval,
+            'runs': self.runs,
+            'archived': self.archived,
+            'purged': self.purged,
+            'failures': self.failures,
+            'last_run': self.last_run
+        }
+
+    def close(self):
+        """Stop the job"""
+        self._stop.set()
@@ -0,0 +1,626 @@
+"""
+Async MongoDB Database Manager for Articuno.AI
+Same operations as DatabaseManager for asyncio code (the ASGI app), on PyMongo's
+native AsyncMongoClient
+"""
+
+from pymongo import AsyncMongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from gridfs import AsyncGridFSBucket
+from gridfs.errors import FileExists, NoFile
+from datetime import datetime
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from typing import Optional, List, Dict, Any
+
+from .archive import ARCHIVE_COLLECTION, FileSessionArchive, decompress, deserialize_session
+from .db_manager import (
+    CLAIM_FIELDS,
+    DATABASE_NAME,
+    DUPLICATE_KEY_ERROR,
+    INDEXES,
+    REHYDRATE_BATCH_SIZE,
+    REHYDRATE_CLAIM_POLL,
+    REHYDRATE_CLAIM_WAIT,
+    SESSION_STATS_PROJECTION,
+    SessionStatsBuilder,
+    build_claim_query,
+    build_claim_update,
+    build_client_options,
+    build_history_page,
+    build_history_query,
+    build_message_document,
+    build_search_query,
+    build_search_result,
+    build_session_document,
+    build_session_stats_pipeline,
+    build_session_updates,
+    format_session_stats,
+    html_to_text
+)
+from .image_store import STREAM_CHUNK_SIZE, FileImageStore, read_image_data
+
+
+class AsyncDatabaseManager:
+    """
+    Manages MongoDB operations for chat history from asyncio code
+
+    Methods mirror DatabaseManager and are coroutines. Messages are written directly
+    (there is no write-behind queue), so flush_writes is a no-op kept for parity.
+    Sessions are compacted by DatabaseManager only; an archived session that is opened
+    or gets a new message here is rehydrated, with the archive read directly or on a thread.
+    The client is created on first use in each process, so it is always bound to the
+    worker's own event loop and never inherited across a fork.
+    """
+
+    def __init__(self,
+                 connection_string: str = "mongodb://127.0.0.1:27017/",
+                 image_store: str = 'gridfs',
+                 image_store_path: Optional[str] = None,
+                 client_options: Optional[Dict[str, Any]] = None,
+                 session_archive: str = 'mongodb',
+                 session_archive_path: Optional[str] = None):
+        """
+        Initialize the manager (no connection is opened until the first operation)
+
+        Args:
+            connection_string: MongoDB connection string
+            image_store: Where chat images are kept: 'gridfs' or 'filesystem'
+            image_store_path: Directory for the filesystem image store
+            client_options: AsyncMongoClient pool and timeout options (see build_client_options)
+            session_archive: Where compacted sessions are kept: 'mongodb' or 'filesystem'
+            session_archive_path: Directory for the filesystem session archive
+        """
+        if image_store not in ('gridfs', 'filesystem'):
+            raise ValueError(f"Unknown image store backend: {image_store}")
+        if image_store == 'filesystem' and not image_store_path:
+            raise ValueError("The filesystem image store needs a path")
+        if session_archive not in ('mongodb', 'filesystem'):
+            raise ValueError(f"Unknown session archive backend: {session_archive}")
+        if session_archive == 'filesystem' and not session_archive_path:
+            raise ValueError("The filesystem session archive needs a path")
+
+        self.connection_string = connection_string
+        self.client_options = client_options if client_options is not None else build_client_options()
+        self.image_store_backend = image_store
+        self.image_store_path = image_store_path
+        self.session_archive_backend = session_archive
+        self.session_archive_path = session_archive_path
+
+        self._pid = None
+        self._client = None
+        self._bucket = None
+        self._file_images = None
+        self._file_archive = None
+        self._indexes = None
+
+    def _connection(self) -> AsyncMongoClient:
+        """Get the AsyncMongoClient of the current process, creating it on first use"""
+        if self._pid != os.getpid():
+            self._client = AsyncMongoClient(self.connection_string, **self.client_options)
+            db = self._client[DATABASE_NAME]
+            if self.image_store_backend == 'gridfs':
+                self._bucket = AsyncGridFSBucket(db, bucket_name='images')
+            else:
+                self._file_images = FileImageStore(self.image_store_path)
+            if self.session_archive_backend == 'filesystem':
+                self._file_archive = FileSessionArchive(self.session_archive_path)
+            self._indexes = None
+            self._pid = os.getpid()
+        return self._client
+
+    @property
+    def client(self) -> AsyncMongoClient:
+        return self._connection()
+
+    @property
+    def db(self):
+        return self._connection()[DATABASE_NAME]
+
+    @property
+    def sessions(self):
+        return self.db['sessions']
+
+    @property
+    def messages(self):
+        return self.db['messages']
+
+    @property
+    def users(self):
+        return self.db['users']
+
+    async def _ready(self):
+        """Create the indexes once per process before the first operation"""
+        self._connection()
+        if self._indexes is None:
+            self._indexes = asyncio.ensure_future(self._create_indexes())
+        try:
+            await asyncio.shield(self._indexes)
+        except Exception:
+            # Retry on the next operation
+            self._indexes = None
+            raise
+
+    async def _create_indexes(self):
+        """Create database indexes for optimal performance"""
+        for collection, keys, options in INDEXES:
+            await self.db[collection].create_index(keys, **options)
+
+    async def flush_writes(self, timeout: Optional[float] = 5.0, session_id: Optional[str] = None) -> bool:
+        """Nothing is buffered; kept for parity with DatabaseManager"""
+        return True
+
+    def get_write_stats(self) -> Dict[str, Any]:
+        """Get write-behind statistics (always disabled here)"""
+        return {'enabled': False}
+
+    async def create_session(self, user_id: Optional[str] = None, bot_name: str = "Articuno.AI") -> str:
+        """
+        Create a new chat session
+
+        Args:
+            user_id: Optional user identifier
+            bot_name: Name of the bot being used
+
+        Returns:
+            session_id: Unique session identifier
+        """
+        await self._ready()
+
+        session_data = build_session_document(user_id, bot_name)
+        await self.sessions.insert_one(session_data)
+        return session_data['session_id']
+
+    async def save_message(self,
+                           session_id: str,
+                           message: str,
+                           role: str = 'user',
+                           bot_name: str = "Articuno.AI",
+                           image_data: Optional[Dict] = None,
+                           response: Optional[str] = None,
+                           latency_ms: Optional[float] = None,
+                           tokens: Optional[Dict[str, int]] = None) -> str:
+        """
+        Save a message to the database
+
+        Args:
+            session_id: Session identifier
+            message: The message text
+            role: 'user' or 'assistant'
+            bot_name: Name of the bot
+            image_data: Optional image data dictionary
+            response: Optional AI response (if role is 'user')
+            latency_ms: Optional time the bot took to answer, in milliseconds
+            tokens: Optional token usage {'input': n, 'output': n}; estimated from the text when not given
+
+        Returns:
+            message_id: Unique message identifier
+        """
+        await self._ready()
+
+        # Keep only a reference to the image in the message
+        if image_data:
+            image_data = await self.store_image(image_data)
+
+        message_data = build_message_document(session_id, message, role, bot_name,
+                                              image_data, response, latency_ms, tokens)
+        await self.messages.insert_one(message_data)
+
+        # Update session activity, last_user_query and stats counters
+        for update_session_id, update_data in build_session_updates([message_data]).items():
+            session = await self.sessions.find_one_and_update(
+                {'session_id': update_session_id},
+                update_data,
+                projection={'_id': 0, 'archived': 1},
+                return_document=ReturnDocument.AFTER
+            )
+            # A message to an archived session (an old tab coming back) makes it live again
+            if session and session.get('archived'):
+                await self.rehydrate_session(update_session_id)
+
+        return message_data['message_id']
+
+    async def store_image(self, image_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Store a chat image in the image store
+
+        Args:
+            image_data: Image dictionary from the chat request, with a base64 data URL
+
+        Returns:
+            Image reference (sha256, content_type, format, size, width, height),
+            or None if the image could not be read
+        """
+        if image_data.get('sha256'):
+            # Already a reference
+            return image_data
+
+        self._connection()
+        try:
+            if self._bucket is None:
+                return await asyncio.to_thread(self._file_images.store_image_data, image_data)
+
+            data, reference = read_image_data(image_data)
+            image_id = hashlib.sha256(data).hexdigest()
+            if await self.db['images.files'].find_one({'_id': image_id}, {'_id': 1}) is None:
+                try:
+                    await self._bucket.upload_from_stream_with_id(
+                        image_id, image_id, data, metadata={'content_type': reference['content_type']}
+                    )
+                except FileExists:
+                    # Stored concurrently by another request
+                    pass
+            return {'sha256': image_id, **reference}
+        except ValueError as e:
+            print(f"Error storing image: {str(e)}")
+            return None
+
+    async def open_image(self, image_id: str):
+        """
+        Open a stored image for streaming
+
+        Args:
+            image_id: SHA-256 key from a message's image_data
+
+        Returns:
+            (async chunk iterator, content type, length), or None if not stored
+        """
+        self._connection()
+        if self._bucket is None:
+            opened = await asyncio.to_thread(self._file_images.open, image_id)
+            if opened is None:
+                return None
+            chunks, content_type, length = opened
+
+            async def file_chunks():
+                iterator = iter(chunks)
+                while True:
+                    chunk = await asyncio.to_thread(next, iterator, None)
+                    if chunk is None:
+                        break
+                    yield chunk
+
+            return file_chunks(), content_type, length
+
+        try:
+            grid_out = await self._bucket.open_download_stream(image_id)
+        except NoFile:
+            return None
+
+        async def grid_chunks():
+            try:
+                while True:
+                    chunk = await grid_out.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                await grid_out.close()
+
+        content_type = (grid_out.metadata or {}).get('content_type', 'application/octet-stream')
+        return grid_chunks(), content_type, grid_out.length
+
+    async def get_history_page(self,
+                               session_id: str,
+                               limit: int = 50,
+                               before: Optional[str] = None,
+                               after: Optional[str] = None,
+                               fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Retrieve one page of a session's history, oldest message first
+
+        Args:
+            session_id: Session identifier
+            limit: Maximum number of messages (capped at MAX_HISTORY_PAGE)
+            before: Cursor; return the messages just older than it
+            after: Cursor; return the messages just newer than it
+            fields: Message fields to return (subset of HISTORY_FIELDS, default all of them)
+
+        Returns:
+            Dictionary with 'messages', 'cursors' and 'has_more' (see DatabaseManager.get_history_page)
+
+        Raises:
+            ValueError: If a cursor or field is invalid
+        """
+        history_query = build_history_query(session_id, limit, before, after, fields)
+        await self._ready()
+
+        # Opening an archived session brings its messages back first
+        if not before and not after:
+            await self.rehydrate_session(session_id, only_if_archived=True)
+
+        cursor = self.messages.find(history_query['filter'], history_query['projection']) \
+            .sort(history_query['sort']).limit(history_query['limit'] + 1)
+        docs = await cursor.to_list(None)
+
+        return build_history_page(docs, history_query, before, after)
+
+    async def get_session_history(self, session_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Retrieve the most recent chat history for a session
+
+        Args:
+            session_id: Session identifier
+            limit: Maximum number of messages to retrieve
+
+        Returns:
+            List of message dictionaries, oldest first
+        """
+        return (await self.get_history_page(session_id, limit=limit))['messages']
+
+    async def get_user_sessions(self, user_id: str = 'anonymous', limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Get all sessions for a user
+
+        Args:
+            user_id: User identifier
+            limit: Maximum number of sessions to retrieve
+
+        Returns:
+            List of session dictionaries
+        """
+        await self._ready()
+        return await self.sessions.find({'user_id': user_id}, {'write_batches': 0}).sort('last_activity', -1).limit(limit).to_list(None)
+
+    async def get_recent_sessions(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Get recent sessions across all users
+
+        Args:
+            limit: Maximum number of sessions to retrieve
+
+        Returns:
+            List of session dictionaries
+        """
+        await self._ready()
+        return await self.sessions.find({}, {'write_batches': 0}).sort('last_activity', -1).limit(limit).to_list(None)
+
+    async def end_session(self, session_id: str):
+        """
+        Mark a session as ended
+
+        Args:
+            session_id: Session identifier
+        """
+        await self._ready()
+        await self.sessions.update_one(
+            {'session_id': session_id},
+            {'$set': {'status': 'ended', 'ended_at': datetime.utcnow()}}
+        )
+
+    async def delete_session(self, session_id: str):
+        """
+        Delete a session and all its messages
+
+        Args:
+            session_id: Session identifier
+        """
+        await self._ready()
+        await self.messages.delete_many({'session_id': session_id})
+        await self.sessions.delete_one({'session_id': session_id})
+        await self._archive_delete(session_id)
+
+    async def _archive_get(self, session_id: str) -> Optional[bytes]:
+        """Load a session's archive (see SessionArchive.get)"""
+        if self._file_archive is not None:
+            return await asyncio.to_thread(self._file_archive.get, session_id)
+        record = await self.db[ARCHIVE_COLLECTION].find_one({'_id': session_id}, {'codec': 1, 'data': 1})
+        if record is None:
+            return None
+        return await asyncio.to_thread(decompress, record['codec'], bytes(record['data']))
+
+    async def _archive_delete(self, session_id: str):
+        """Drop a session's archive"""
+        if self._file_archive is not None:
+            await asyncio.to_thread(self._file_archive.delete, session_id)
+        else:
+            await self.db[ARCHIVE_COLLECTION].delete_one({'_id': session_id})
+
+    async def _claim_session(self, session_id: str, **conditions) -> Optional[str]:
+        """Claim a session nobody else holds; returns the claim token, or None"""
+        claim = uuid.uuid4().hex
+        now = datetime.utcnow()
+        session = await self.sessions.find_one_and_update(
+            build_claim_query(session_id, now, **conditions),
+            build_claim_update(claim, now),
+            projection={'_id': 1}
+        )
+        return claim if session is not None else None
+
+    async def rehydrate_session(self, session_id: str, only_if_archived: bool = False,
+                                wait: float = REHYDRATE_CLAIM_WAIT) -> bool:
+        """
+        Restore an archived session's messages into the messages collection
+
+        Waits up to wait seconds while a compactor holds the session, since its archived
+        messages are still being deleted until the compactor lets go.
+
+        Args:
+            session_id: Session identifier
+            only_if_archived: Check the session's archived flag first and do nothing for live sessions
+            wait: Most seconds to wait for a claim held by another process
+
+        Returns:
+            True if messages were restored
+        """
+        await self._ready()
+
+        conditions = {'archived': True} if only_if_archived else {}
+        if only_if_archived and await self.sessions.find_one({'session_id': session_id, **conditions},
+                                                             {'_id': 1}) is None:
+            return False
+
+        deadline = time.monotonic() + wait
+        claim = await self._claim_session(session_id, **conditions)
+        while claim is None:
+            # Gone or already restored, or still held once the wait is over
+            if (time.monotonic() >= deadline
+                    or await self.sessions.find_one({'session_id': session_id, **conditions}, {'_id': 1}) is None):
+                return False
+            await asyncio.sleep(REHYDRATE_CLAIM_POLL)
+            claim = await self._claim_session(session_id, **conditions)
+
+        try:
+            payload = await self._archive_get(session_id)
+            if payload is not None:
+                _, messages = await asyncio.to_thread(deserialize_session, payload)
+                for start in range(0, len(messages), REHYDRATE_BATCH_SIZE):
+                    try:
+                        await self.messages.insert_many(messages[start:start + REHYDRATE_BATCH_SIZE], ordered=False)
+                    except BulkWriteError as e:
+                        # Left behind by a compactor whose claim ran out
+                        if any(error.get('code') != DUPLICATE_KEY_ERROR
+                               for error in e.details.get('writeErrors', [])):
+                            raise
+
+            result = await self.sessions.update_one(
+                {'session_id': session_id, 'archive_claim': claim},
+                {'$unset': {'archived': '', 'archived_at': '', 'archived_messages': '', **CLAIM_FIELDS}}
+            )
+        except BaseException:
+            # Also on cancellation, so the session is not held until the claim runs out
+            await asyncio.shield(self.sessions.update_one({'session_id': session_id, 'archive_claim': claim},
+                                                          {'$unset': CLAIM_FIELDS}))
+            raise
+
+        # The archive stays for whoever took over a claim that ran out
+        if payload is None or result.matched_count == 0:
+            return False
+        await self._archive_delete(session_id)
+        return True
+
+    async def get_session_stats(self, session_id: str) -> Dict[str, Any]:
+        """
+        Get statistics for a session with a single point read of its maintained counters
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            JSON-ready dictionary with session statistics
+        """
+        await self._ready()
+
+        session = await self.sessions.find_one({'session_id': session_id}, SESSION_STATS_PROJECTION)
+        if not session:
+            return {}
+
+        if not session.get('stats_exact'):
+            # Counters are rebuilt from the messages, so an archived session is brought back first
+            if session.get('archived'):
+                await self.rehydrate_session(session_id)
+            await self.rebuild_session_stats([session_id])
+            session = await self.sessions.find_one({'session_id': session_id}, SESSION_STATS_PROJECTION) or session
+
+        return format_session_stats(session_id, session)
+
+    async def rebuild_session_stats(self, session_ids: Optional[List[str]] = None, batch_size: int = 500) -> int:
+        """
+        Recompute session stats counters from the messages with one aggregation
+
+        Args:
+            session_ids: Sessions to rebuild, or None for every session with messages
+            batch_size: Sessions updated per bulk write
+
+        Returns:
+            Number of sessions rebuilt
+        """
+        await self._ready()
+
+        builder = SessionStatsBuilder(session_ids)
+        cursor = await self.messages.aggregate(build_session_stats_pipeline(session_ids), allowDiskUse=True)
+        async for row in cursor:
+            builder.add(row)
+
+        updates = builder.updates()
+        for start in range(0, len(updates), batch_size):
+            await self.sessions.bulk_write(updates[start:start + batch_size], ordered=False)
+
+        return len(updates)
+
+    async def search_messages(self, query: str, session_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Search messages and responses through the text index, best matches first
+
+        Args:
+            query: Search query
+            session_id: Optional session to search within
+            limit: Maximum number of results
+
+        Returns:
+            JSON-ready results with a highlighted snippet (see DatabaseManager.search_messages)
+        """
+        await self._ready()
+
+        search_query = build_search_query(query, session_id, limit)
+        cursor = self.messages.find(search_query['filter'], search_query['projection']) \
+            .sort(search_query['sort']).limit(search_query['limit'])
+
+        return [build_search_result(doc, search_query['terms']) async for doc in cursor]
+
+    async def backfill_search_text(self, batch_size: int = 500) -> int:
+        """
+        Add the plain-text response field to messages saved before search was indexed
+
+        Args:
+            batch_size: Messages updated per bulk write
+
+        Returns:
+            Number of messages updated
+        """
+        await self._ready()
+
+        updated = 0
+        batch = []
+        cursor = self.messages.find({'response_text': {'$exists': False}}, {'response': 1}).batch_size(batch_size)
+        async for doc in cursor:
+            batch.append(UpdateOne({'_id': doc['_id']},
+                                   {'$set': {'response_text': html_to_text(doc.get('response'))}}))
+            if len(batch) >= batch_size:
+                updated += (await self.messages.bulk_write(batch, ordered=False)).modified_count
+                batch = []
+        if batch:
+            updated += (await self.messages.bulk_write(batch, ordered=False)).modified_count
+
+        return updated
+
+    async def close(self):
+        """Close the database connection"""
+        if self._client is not None and self._pid == os.getpid():
+            await self._client.close()
+        self._client = None
+        self._pid = None
+
+    async def __aenter__(self):
+        """Async context manager entry"""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit"""
+        await self.close()
+
+
+# Singleton instance
+_async_db_instance = None
+
+
+def get_async_db_manager(connection_string: str = "mongodb://127.0.0.1:27017/", **options) -> AsyncDatabaseManager:
+    """
+    Get or create an AsyncDatabaseManager singleton instance
+
+    Args:
+        connection_string: MongoDB connection string
+        **options: Extra AsyncDatabaseManager arguments (image_store, client_options, ...)
+
+    Returns:
+        AsyncDatabaseManager instance
+    """
+    global _async_db_instance
+
+    if _async_db_instance is None:
+        _async_db_instance = AsyncDatabaseManager(connection_string, **options)
+
+    return _async_db_instance
@@ -3,46 +3,1213 @@ MongoDB Database Manager for Articuno.AI
 Handles user queries, chat history, and session management
 """
 
-from pymongo import MongoClient
-from datetime import datetime
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
+from bson import ObjectId
+from bson.errors import InvalidId
+from collections import Counter, deque
+from datetime import datetime, timedelta
+import atexit
+import base64
+import binascii
+import html
+import os
+import re
+import threading
+import time
 import uuid
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable
+
+from .archive import SessionArchive, create_session_archive, deserialize_session, serialize_session
+from .image_store import ImageStore, create_image_store
+
+# Database holding the chat collections
+DATABASE_NAME = 'ArticunoAI'
+
+# Duplicate key error code, returned when a retried batch was partly inserted before
+DUPLICATE_KEY_ERROR = 11000
+
+# Ids of the latest write-behind batches applied to a session, kept so a retried batch
+# never applies its session counters twice
+WRITE_BATCH_HISTORY = 10
+
+# Seconds a read waits for the write-behind messages of its session
+READ_FLUSH_TIMEOUT = 0.5
+
+# Message fields returned by session history unless others are asked for
+HISTORY_FIELDS = ('message_id', 'role', 'message', 'bot_name', 'timestamp', 'response', 'image_data')
+
+# Image fields returned with a message (base64 payloads saved inline by older versions are left out)
+IMAGE_REFERENCE_FIELDS = ('sha256', 'content_type', 'format', 'size', 'width', 'height')
+
+# Largest history page
+MAX_HISTORY_PAGE = 200
+
+# Relevance weights of the fields in the message text index
+SEARCH_WEIGHTS = {'message': 3, 'response_text': 1}
+
+# Name of the message text index
+SEARCH_INDEX_NAME = 'message_text_search'
+
+# Largest search result page and longest accepted query
+MAX_SEARCH_RESULTS = 100
+MAX_SEARCH_QUERY_CHARS = 256
+
+# Characters of context kept around the first match in a snippet
+SNIPPET_CHARS = 160
+
+# Indexes created on first use: (collection, keys, options)
+INDEXES = (
+    # Index on session_id for fast lookups
+    ('messages', 'session_id', {}),
+    # Index on timestamp for sorting
+    ('messages', 'timestamp', {}),
+    # Compound index for session queries and keyset-paginated history
+    ('messages', [('session_id', 1), ('timestamp', 1), ('_id', 1)], {}),
+    # Text index for ranked search over messages and their plain-text responses
+    ('messages', [('message', 'text'), ('response_text', 'text')],
+     {'weights': SEARCH_WEIGHTS, 'name': SEARCH_INDEX_NAME}),
+    # Index on user_id for user-specific queries
+    ('sessions', 'user_id', {}),
+    ('sessions', 'created_at', {}),
+    # Recent-session lists and the cold-session scan of compaction
+    ('sessions', 'last_activity', {}),
+    # Session point reads (stats, activity updates) by session_id
+    ('sessions', 'session_id', {})
+)
+
+# Session fields read for the stats endpoint
+SESSION_STATS_PROJECTION = {'_id': 0, 'bot_name': 1, 'created_at': 1, 'last_activity': 1,
+                            'status': 1, 'stats': 1, 'stats_exact': 1, 'archived': 1}
+
+# Name of the TTL index that expires archived anonymous sessions
+ANONYMOUS_TTL_INDEX_NAME = 'anonymous_session_ttl'
+
+# Seconds a compactor holds its claim on a session it is archiving
+ARCHIVE_CLAIM_SECONDS = 600
+
+# Claim fields unset when a session's claim is released
+CLAIM_FIELDS = {'archive_claim': '', 'archive_claimed_until': ''}
+
+# Seconds a rehydrate waits for a compactor to finish deleting a session's archived messages
+REHYDRATE_CLAIM_WAIT = 5.0
+
+# Seconds between attempts to claim a session while another process holds it
+REHYDRATE_CLAIM_POLL = 0.05
+
+# Messages restored per insert_many when a session is rehydrated
+REHYDRATE_BATCH_SIZE = 1000
+
+# Index options conflict error code, returned when an index exists with other options
+INDEX_OPTIONS_CONFLICT = 85
+
+# Rough characters per token, used when a backend does not report token usage
+CHARS_PER_TOKEN = 4
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+_SEARCH_TERM_RE = re.compile(r'"([^"]+)"|(?:(?<!\S)(-))?(\w+)')
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """
+    Build an opaque history cursor pointing at a message
+    
+    Args:
+        doc: Message document with timestamp and _id
+    
+    Returns:
+        URL-safe cursor string
+    """
+    raw = f"{doc['timestamp'].isoformat(timespec='milliseconds')}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """
+    Read a cursor built by encode_cursor
+    
+    Args:
+        cursor: Cursor string
+    
+    Returns:
+        (timestamp, ObjectId) of the message it points at
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        timestamp, object_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), ObjectId(object_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, InvalidId):
+        raise ValueError(f"Invalid history cursor: {cursor}")
+
+
+def to_json_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Make a projected document JSON-ready in one pass: drops _id and writes datetimes as ISO 8601 UTC
+    
+    Args:
+        doc: Document from MongoDB
+    
+    Returns:
+        Dictionary that json.dumps accepts as is
+    """
+    result = {}
+    for key, value in doc.items():
+        if key == '_id':
+            continue
+        if isinstance(value, datetime):
+            value = value.isoformat(timespec='milliseconds') + 'Z'
+        elif isinstance(value, ObjectId):
+            value = str(value)
+        result[key] = value
+    return result
+
+
+def html_to_text(markup: Optional[str]) -> str:
+    """
+    Strip tags and entities from an HTML response so it can be indexed as plain text
+    
+    Args:
+        markup: HTML (or plain) response text
+        
+    Returns:
+        Plain text with whitespace collapsed
+    """
+    if not markup:
+        return ''
+    return _SPACE_RE.sub(' ', html.unescape(_TAG_RE.sub(' ', markup))).strip()
+
+
+def search_terms(query: str) -> List[str]:
+    """
+    Pull the positive words and quoted phrases out of a $text search query
+    
+    Args:
+        query: Search query ("phrases" and -negated words follow MongoDB text search)
+        
+    Returns:
+        Terms to highlight, longest first
+    """
+    terms = set()
+    for phrase, negated, word in _SEARCH_TERM_RE.findall(query):
+        if phrase.strip():
+            terms.add(phrase.strip().lower())
+        elif word and not negated:
+            terms.add(word.lower())
+    return sorted(terms, key=len, reverse=True)
+
+
+def highlight_snippet(text: str, terms: List[str], width: int = SNIPPET_CHARS) -> Optional[str]:
+    """
+    Cut a window of text around the first search term and mark every term in it
+    
+    The text is HTML-escaped and matches are wrapped in <mark>, so the snippet can be
+    inserted as HTML. Terms match as word prefixes to approximate the stemming done
+    by the text index ("run" also marks "running").
+    
+    Args:
+        text: Plain text to cut the snippet from
+        terms: Terms from search_terms
+        width: Approximate snippet length in characters
+        
+    Returns:
+        Snippet HTML, or None if no term occurs in the text
+    """
+    if not text or not terms:
+        return None
+    
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\w*', re.IGNORECASE)
+    first = pattern.search(text)
+    if first is None:
+        return None
+    
+    start = max(0, first.start() - width // 3)
+    end = min(len(text), start + width)
+    # Do not cut words in half at either edge
+    if start > 0:
+        space = text.find(' ', start, first.start())
+        start = space + 1 if space != -1 else start
+    if end < len(text):
+        space = text.rfind(' ', first.end(), end)
+        end = space if space != -1 else end
+    window = text[start:end]
+    
+    parts = []
+    position = 0
+    for match in pattern.finditer(window):
+        parts.append(html.escape(window[position:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        position = match.end()
+    parts.append(html.escape(window[position:]))
+    
+    return ('…' if start > 0 else '') + ''.join(parts) + ('…' if end < len(text) else '')
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Estimate the token count of a text from its length
+    
+    Args:
+        text: Plain text
+    
+    Returns:
+        Approximate number of tokens
+    """
+    if not text:
+        return 0
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def stats_bot_key(bot_name: Optional[str]) -> str:
+    """Make a bot name usable as a field name under stats.bots (no dots or $)"""
+    return (bot_name or 'unknown').replace('.', '．').replace('$', '＄')
+
+
+def stats_bot_name(key: str) -> str:
+    """Reverse stats_bot_key"""
+    return key.replace('．', '.').replace('＄', '$')
+
+
+def empty_session_stats() -> Dict[str, Any]:
+    """Counters a new session starts with"""
+    return {
+        'messages': {'user': 0, 'assistant': 0},
+        'bots': {},
+        'tokens': {'input': 0, 'output': 0},
+        'latency_ms': {'total': 0.0, 'count': 0, 'max': 0.0}
+    }
+
+
+def message_stat_increments(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Counter increments a saved message adds to its session's stats
+    
+    A user message saved together with its AI response counts as one user and
+    one assistant message.
+    
+    Args:
+        doc: Message document
+    
+    Returns:
+        Dictionary of dotted stats field -> amount for $inc
+    """
+    increments = {f"stats.bots.{stats_bot_key(doc.get('bot_name'))}": 1}
+    
+    if doc['role'] == 'assistant':
+        increments['stats.messages.assistant'] = 1
+    else:
+        increments['stats.messages.user'] = 1
+        if doc.get('response'):
+            increments['stats.messages.assistant'] = 1
+    
+    tokens = doc.get('tokens') or {}
+    increments['stats.tokens.input'] = tokens.get('input', 0)
+    increments['stats.tokens.output'] = tokens.get('output', 0)
+    
+    if doc.get('latency_ms') is not None:
+        increments['stats.latency_ms.total'] = doc['latency_ms']
+        increments['stats.latency_ms.count'] = 1
+    
+    return increments
+
+
+def build_session_updates(message_docs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Merge the session updates for a list of messages into one update per session
+    
+    Args:
+        message_docs: Message documents in the order they were saved
+        
+    Returns:
+        Dictionary of session_id -> MongoDB update document
+    """
+    updates = {}
+    for doc in message_docs:
+        update = updates.setdefault(doc['session_id'], {'$set': {}, '$inc': {'message_count': 0}})
+        update['$inc']['message_count'] += 1
+        update['$set']['last_activity'] = doc['timestamp']
+        
+        # Maintained stats counters, so reading them is a single point read
+        for field, amount in message_stat_increments(doc).items():
+            update['$inc'][field] = update['$inc'].get(field, 0) + amount
+        if doc.get('latency_ms') is not None:
+            longest = update.setdefault('$max', {}).get('stats.latency_ms.max', 0.0)
+            update['$max']['stats.latency_ms.max'] = max(longest, doc['latency_ms'])
+        
+        # Update last_user_query if this is a user message
+        if doc['role'] == 'user':
+            update['$set']['last_user_query'] = doc['message']
+    return updates
+
+
+def build_client_options(max_pool_size: int = 50,
+                         min_pool_size: int = 0,
+                         max_idle_time_ms: int = 300000,
+                         server_selection_timeout_ms: int = 5000,
+                         connect_timeout_ms: int = 5000,
+                         timeout_ms: Optional[int] = None,
+                         write_concern: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build MongoClient keyword options for the connection pool and timeouts
+    
+    Args:
+        max_pool_size: Most connections per server (requests beyond it wait for one)
+        min_pool_size: Connections kept open while idle
+        max_idle_time_ms: Idle time after which a pooled connection is closed
+        server_selection_timeout_ms: How long an operation waits for a usable server
+        connect_timeout_ms: Timeout for opening a connection
+        timeout_ms: Optional overall time limit for each operation, so a stalled
+            server raises instead of hanging the request
+        write_concern: Optional write concern ('majority' or a number of nodes)
+        
+    Returns:
+        Dictionary of MongoClient options
+    
+    Raises:
+        ValueError: If the pool limits are inconsistent
+    """
+    if max_pool_size < 1:
+        raise ValueError("max_pool_size must be at least 1")
+    if min_pool_size < 0 or min_pool_size > max_pool_size:
+        raise ValueError("min_pool_size must be between 0 and max_pool_size")
+    
+    options = {
+        'maxPoolSize': max_pool_size,
+        'minPoolSize': min_pool_size,
+        'maxIdleTimeMS': max_idle_time_ms,
+        'serverSelectionTimeoutMS': server_selection_timeout_ms,
+        'connectTimeoutMS': connect_timeout_ms
+    }
+    if timeout_ms:
+        options['timeoutMS'] = timeout_ms
+    if write_concern:
+        options['w'] = int(write_concern) if str(write_concern).isdigit() else write_concern
+    return options
+
+
+def build_session_document(user_id: Optional[str], bot_name: str) -> Dict[str, Any]:
+    """
+    Build the document saved for a new chat session
+    
+    Args:
+        user_id: Optional user identifier
+        bot_name: Name of the bot being used
+        
+    Returns:
+        Session document with a new session_id
+    """
+    return {
+        'session_id': str(uuid.uuid4()),
+        'user_id': user_id or 'anonymous',
+        'bot_name': bot_name,
+        'created_at': datetime.utcnow(),
+        'last_activity': datetime.utcnow(),
+        'message_count': 0,
+        'status': 'active',
+        'last_user_query': None,  # Will be updated when first message is sent
+        'stats': empty_session_stats(),
+        # Counters have been maintained since the session started
+        'stats_exact': True
+    }
+
+
+def build_claim_query(session_id: str, now: datetime, **conditions) -> Dict[str, Any]:
+    """
+    Build the filter matching a session nobody holds a live claim on
+    
+    Args:
+        session_id: Session identifier
+        now: Current time; claims that ran out before it are taken over
+        **conditions: Further conditions on the session document
+    
+    Returns:
+        MongoDB filter for the sessions collection
+    """
+    query = {'session_id': session_id, 'archive_claimed_until': {'$not': {'$gt': now}}}
+    query.update(conditions)
+    return query
+
+
+def build_claim_update(claim: str, now: datetime) -> Dict[str, Any]:
+    """
+    Build the update that claims a session, or renews a claim, for ARCHIVE_CLAIM_SECONDS
+    
+    Args:
+        claim: Token identifying the holder of the claim
+        now: Current time
+    
+    Returns:
+        MongoDB update document
+    """
+    return {'$set': {'archive_claim': claim, 'archive_claimed_until': now + timedelta(seconds=ARCHIVE_CLAIM_SECONDS)}}
+
+
+def build_message_document(session_id: str,
+                           message: str,
+                           role: str,
+                           bot_name: str,
+                           image_data: Optional[Dict[str, Any]],
+                           response: Optional[str],
+                           latency_ms: Optional[float],
+                           tokens: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    """
+    Build the document saved for a chat message
+    
+    Args:
+        session_id: Session identifier
+        message: The message text
+        role: 'user' or 'assistant'
+        bot_name: Name of the bot
+        image_data: Image reference from the image store, if any
+        response: Optional AI response
+        latency_ms: Optional time the bot took to answer, in milliseconds
+        tokens: Optional token usage; estimated from the text when not given
+        
+    Returns:
+        Message document with a new message_id
+    """
+    response_text = html_to_text(response)
+    return {
+        'message_id': str(uuid.uuid4()),
+        'session_id': session_id,
+        'role': role,
+        'message': message,
+        'bot_name': bot_name,
+        'timestamp': datetime.utcnow(),
+        'image_data': image_data,
+        'response': response,
+        # Plain-text copy of the response for the search index
+        'response_text': response_text,
+        'tokens': tokens or {
+            'input': estimate_tokens(message),
+            'output': estimate_tokens(response_text)
+        },
+        'latency_ms': round(latency_ms, 1) if latency_ms is not None else None
+    }
+
+
+def build_history_query(session_id: str,
+                        limit: int,
+                        before: Optional[str],
+                        after: Optional[str],
+                        fields: Optional[List[str]]) -> Dict[str, Any]:
+    """
+    Build the find() arguments for one page of session history
+    
+    Args:
+        session_id: Session identifier
+        limit: Requested page size
+        before: Cursor; page of messages just older than it
+        after: Cursor; page of messages just newer than it
+        fields: Message fields to return (subset of HISTORY_FIELDS)
+        
+    Returns:
+        Dictionary with filter, projection, sort, limit (page size) and direction
+    
+    Raises:
+        ValueError: If a cursor or field is invalid
+    """
+    limit = max(1, min(limit, MAX_HISTORY_PAGE))
+    fields = list(fields or HISTORY_FIELDS)
+    unknown = [field for field in fields if field not in HISTORY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown history fields: {', '.join(unknown)}")
+    
+    # _id and timestamp are always read for the cursors
+    projection = {'_id': 1, 'timestamp': 1}
+    for field in fields:
+        if field == 'image_data':
+            projection.update({f'image_data.{key}': 1 for key in IMAGE_REFERENCE_FIELDS})
+        else:
+            projection[field] = 1
+    
+    query = {'session_id': session_id}
+    direction = -1
+    if before or after:
+        timestamp, object_id = decode_cursor(before or after)
+        op = '$lt' if before else '$gt'
+        query['$or'] = [
+            {'timestamp': {op: timestamp}},
+            {'timestamp': timestamp, '_id': {op: object_id}}
+        ]
+        direction = -1 if before else 1
+    
+    return {
+        'filter': query,
+        'projection': projection,
+        'sort': [('timestamp', direction), ('_id', direction)],
+        'limit': limit,
+        'direction': direction
+    }
+
+
+def build_history_page(docs: List[Dict[str, Any]],
+                       history_query: Dict[str, Any],
+                       before: Optional[str],
+                       after: Optional[str]) -> Dict[str, Any]:
+    """
+    Turn the documents read for a history query into a page
+    
+    Args:
+        docs: Up to limit + 1 documents in query order
+        history_query: Result of build_history_query
+        before: Cursor the page was asked for with
+        after: Cursor the page was asked for with
+        
+    Returns:
+        Dictionary with 'messages', 'cursors' and 'has_more'
+    """
+    limit = history_query['limit']
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if history_query['direction'] == -1:
+        docs.reverse()
+    
+    return {
+        'messages': [to_json_document(doc) for doc in docs],
+        'cursors': {
+            'before': encode_cursor(docs[0]) if docs else before,
+            'after': encode_cursor(docs[-1]) if docs else after
+        },
+        'has_more': has_more
+    }
+
+
+def build_search_query(query: str, session_id: Optional[str], limit: int) -> Dict[str, Any]:
+    """
+    Build the find() arguments of a ranked text search
+    
+    Args:
+        query: Search query
+        session_id: Optional session to search within
+        limit: Requested number of results
+        
+    Returns:
+        Dictionary with filter, projection, sort, limit and the terms to highlight
+    """
+    query = query.strip()[:MAX_SEARCH_QUERY_CHARS]
+    
+    search_filter = {'$text': {'$search': query}}
+    if session_id:
+        search_filter['session_id'] = session_id
+    
+    return {
+        'filter': search_filter,
+        'projection': {
+            '_id': 0,
+            'message_id': 1,
+            'session_id': 1,
+            'role': 1,
+            'bot_name': 1,
+            'timestamp': 1,
+            'message': 1,
+            'response_text': 1,
+            'score': {'$meta': 'textScore'}
+        },
+        'sort': [('score', {'$meta': 'textScore'}), ('timestamp', -1)],
+        'limit': max(1, min(limit, MAX_SEARCH_RESULTS)),
+        'terms': search_terms(query)
+    }
+
+
+def build_search_result(doc: Dict[str, Any], terms: List[str]) -> Dict[str, Any]:
+    """
+    Add the highlighted snippet to a search hit and make it JSON-ready
+    
+    Args:
+        doc: Document read with the search projection
+        terms: Terms from search_terms
+        
+    Returns:
+        Search result dictionary
+    """
+    response_text = doc.pop('response_text', None) or ''
+    snippet = highlight_snippet(doc.get('message') or '', terms)
+    doc['matched_field'] = 'message'
+    if snippet is None:
+        snippet = highlight_snippet(response_text, terms)
+        doc['matched_field'] = 'response'
+    if snippet is None:
+        # Matched through stemming only; show the start of the message
+        snippet = html.escape((doc.get('message') or response_text)[:SNIPPET_CHARS])
+        doc['matched_field'] = 'message' if doc.get('message') else 'response'
+    doc['snippet'] = snippet
+    doc['score'] = round(doc.get('score', 0.0), 4)
+    return to_json_document(doc)
+
+
+def format_session_stats(session_id: str, session: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the stats response from a session read with SESSION_STATS_PROJECTION
+    
+    Args:
+        session_id: Session identifier
+        session: Session document
+        
+    Returns:
+        JSON-ready dictionary with session statistics
+    """
+    stats = session.get('stats') or empty_session_stats()
+    messages = stats.get('messages', {})
+    tokens = stats.get('tokens', {})
+    latency = stats.get('latency_ms', {})
+    user_messages = messages.get('user', 0)
+    assistant_messages = messages.get('assistant', 0)
+    latency_count = latency.get('count', 0)
+    
+    return to_json_document({
+        'session_id': session_id,
+        'bot_name': session.get('bot_name'),
+        'created_at': session.get('created_at'),
+        'last_activity': session.get('last_activity'),
+        'total_messages': user_messages + assistant_messages,
+        'user_messages': user_messages,
+        'assistant_messages': assistant_messages,
+        'bots': {stats_bot_name(key): count for key, count in stats.get('bots', {}).items()},
+        'tokens': {
+            'input': tokens.get('input', 0),
+            'output': tokens.get('output', 0),
+            'total': tokens.get('input', 0) + tokens.get('output', 0)
+        },
+        'latency_ms': {
+            'average': round(latency.get('total', 0.0) / latency_count, 1) if latency_count else None,
+            'max': latency.get('max') if latency_count else None,
+            'total': round(latency.get('total', 0.0), 1)
+        },
+        'status': session.get('status')
+    })
+
+
+def build_session_stats_pipeline(session_ids: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """
+    Aggregation that recomputes stats counters per session and bot from the messages
+    
+    Messages without recorded token usage are estimated from their text.
+    
+    Args:
+        session_ids: Sessions to cover, or None for all of them
+        
+    Returns:
+        Aggregation pipeline
+    """
+    match = {'session_id': {'$in': session_ids}} if session_ids is not None else {}
+    return [
+        {'$match': match},
+        {'$group': {
+            '_id': {'session_id': '$session_id', 'bot_name': '$bot_name'},
+            'documents': {'$sum': 1},
+            'user': {'$sum': {'$cond': [{'$eq': ['$role', 'assistant']}, 0, 1]}},
+            'assistant': {'$sum': {'$cond': [
+                {'$or': [{'$eq': ['$role', 'assistant']}, {'$gt': ['$response', '']}]}, 1, 0
+            ]}},
+            'input_tokens': {'$sum': {'$ifNull': [
+                '$tokens.input',
+                {'$ceil': {'$divide': [{'$strLenCP': {'$ifNull': ['$message', '']}}, CHARS_PER_TOKEN]}}
+            ]}},
+            'output_tokens': {'$sum': {'$ifNull': [
+                '$tokens.output',
+                {'$ceil': {'$divide': [{'$strLenCP': {'$ifNull': ['$response_text', '']}}, CHARS_PER_TOKEN]}}
+            ]}},
+            'latency_total': {'$sum': {'$ifNull': ['$latency_ms', 0]}},
+            'latency_count': {'$sum': {'$cond': [{'$isNumber': '$latency_ms'}, 1, 0]}},
+            'latency_max': {'$max': '$latency_ms'}
+        }}
+    ]
+
+
+class SessionStatsBuilder:
+    """Folds rows of build_session_stats_pipeline into one stats update per session"""
+    
+    def __init__(self, session_ids: Optional[List[str]] = None):
+        """
+        Initialize the builder
+        
+        Args:
+            session_ids: Sessions asked for by id; they are reset even when they have no messages left
+        """
+        self.sessions = {session_id: (empty_session_stats(), 0) for session_id in session_ids or []}
+    
+    def add(self, row: Dict[str, Any]):
+        """Add one aggregation row"""
+        session_id = row['_id']['session_id']
+        stats, documents = self.sessions.get(session_id) or (empty_session_stats(), 0)
+        
+        stats['messages']['user'] += row['user']
+        stats['messages']['assistant'] += row['assistant']
+        bot_key = stats_bot_key(row['_id'].get('bot_name'))
+        stats['bots'][bot_key] = stats['bots'].get(bot_key, 0) + row['documents']
+        stats['tokens']['input'] += int(row['input_tokens'])
+        stats['tokens']['output'] += int(row['output_tokens'])
+        stats['latency_ms']['total'] += row['latency_total']
+        stats['latency_ms']['count'] += row['latency_count']
+        stats['latency_ms']['max'] = max(stats['latency_ms']['max'], row['latency_max'] or 0.0)
+        
+        self.sessions[session_id] = (stats, documents + row['documents'])
+    
+    def updates(self) -> List[UpdateOne]:
+        """Session updates that replace the counters (archived sessions, whose messages are gone, are left alone)"""
+        return [
+            UpdateOne({'session_id': session_id, 'archived': {'$ne': True}},
+                      {'$set': {'stats': stats, 'stats_exact': True, 'message_count': documents}})
+            for session_id, (stats, documents) in self.sessions.items()
+        ]
+
+
+class MessageWriteBehind:
+    """
+    Buffers saved messages and writes them to MongoDB in batches on a background thread
+    
+    A batch is flushed once batch_size messages are waiting or flush_interval seconds
+    after the first one arrived, with one insert_many for the messages and one
+    bulk_write for the session updates. A failed batch is retried as it was, and each
+    session update only applies if the session has not recorded the batch's id yet, so
+    a retry never counts a message twice. When the buffer is full, callers wait up to
+    enqueue_timeout seconds and are then told to write synchronously instead.
+    """
+    
+    def __init__(self,
+                 get_db: Callable[[], Any],
+                 batch_size: int = 100,
+                 flush_interval: float = 0.5,
+                 max_queue: int = 10000,
+                 enqueue_timeout: float = 1.0,
+                 restore_archived: Optional[Callable[[List[str]], Any]] = None):
+        """
+        Initialize the pipeline and start the writer thread
+        
+        Args:
+            get_db: Returns the chat database of the current process; called for every
+                batch, so a forked worker never writes through its parent's client
+            batch_size: Messages written per batch
+            flush_interval: Seconds a message may wait for its batch to fill
+            max_queue: Messages buffered before callers are slowed down
+            enqueue_timeout: Seconds a caller waits for room before writing synchronously
+            restore_archived: Called with the session ids of each written batch, to
+                rehydrate the ones that were archived
+        """
+        self.get_db = get_db
+        self.restore_archived = restore_archived
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        
+        # Back-pressure metrics
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.flush_errors = 0
+        self.blocked_enqueues = 0
+        self.sync_fallbacks = 0
+        self.max_depth = 0
+        self.last_flush_ms = None
+        
+        self._start()
+    
+    def _start(self):
+        """(Re)create the buffer and writer thread for the current process"""
+        self._pid = os.getpid()
+        self._pending = deque()
+        self._in_flight = 0
+        # (batch id, messages) of a batch that failed and is retried before anything else
+        self._retry = None
+        # Messages of each session not written yet
+        self._unwritten = Counter()
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="message-write-behind", daemon=True)
+        self._thread.start()
+    
+    def _check_fork(self):
+        # Threads do not survive fork(); a pre-fork server's workers each need their own writer
+        if self._pid != os.getpid():
+            self._start()
+    
+    def enqueue(self, message_doc: Dict[str, Any]) -> bool:
+        """
+        Buffer a message for the next batch
+        
+        Args:
+            message_doc: Message document to insert
+            
+        Returns:
+            True if buffered, False if the caller should write it synchronously
+        """
+        self._check_fork()
+        
+        with self._cond:
+            if len(self._pending) >= self.max_queue:
+                self.blocked_enqueues += 1
+                if not self._cond.wait_for(lambda: len(self._pending) < self.max_queue or self._closed,
+                                           self.enqueue_timeout):
+                    self.sync_fallbacks += 1
+                    return False
+            if self._closed:
+                return False
+            
+            self._pending.append(message_doc)
+            self._unwritten[message_doc['session_id']] += 1
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self._pending))
+            self._cond.notify_all()
+        
+        return True
+    
+    def _run(self):
+        """Writer thread: collect a batch, write it, repeat until closed and drained"""
+        while True:
+            with self._cond:
+                if self._retry is not None:
+                    batch_id, batch = self._retry
+                    self._retry = None
+                else:
+                    self._cond.wait_for(lambda: self._pending or self._closed)
+                    if not self._pending:
+                        return
+                    
+                    # Give the batch time to fill unless a flush was asked for
+                    deadline = time.monotonic() + self.flush_interval
+                    while len(self._pending) < self.batch_size and not (self._closed or self._flush_requested):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                    batch_id = uuid.uuid4().hex
+                self._in_flight = len(batch)
+                self._cond.notify_all()
+            
+            written = self._write(batch, batch_id)
+            
+            with self._cond:
+                self._in_flight = 0
+                if written:
+                    self._mark_written(batch)
+                else:
+                    # Retry the same batch, with the same id, ahead of newer messages
+                    self._retry = (batch_id, batch)
+                if not self._pending and self._retry is None:
+                    self._flush_requested = False
+                self._cond.notify_all()
+            
+            if not written:
+                if self._closed:
+                    # Leave the rest to close()
+                    return
+                time.sleep(min(5.0, 0.5 * 2 ** min(self.flush_errors, 4)))
+    
+    def _mark_written(self, batch: List[Dict[str, Any]]):
+        # Called with the condition held
+        for doc in batch:
+            self._unwritten[doc['session_id']] -= 1
+            if self._unwritten[doc['session_id']] <= 0:
+                del self._unwritten[doc['session_id']]
+    
+    def _write(self, batch: List[Dict[str, Any]], batch_id: str) -> bool:
+        """Insert a batch of messages and apply their session updates once"""
+        started = time.perf_counter()
+        try:
+            db = self.get_db()
+            try:
+                db['messages'].insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                # Messages already inserted by an earlier attempt are fine
+                details = e.details or {}
+                if details.get('writeConcernErrors') or any(
+                        error.get('code') != DUPLICATE_KEY_ERROR for error in details.get('writeErrors', [])):
+                    raise
+            
+            # Sessions that already recorded this batch (on an earlier attempt) are skipped
+            updates = build_session_updates(batch)
+            db['sessions'].bulk_write(
+                [UpdateOne({'session_id': session_id, 'write_batches': {'$ne': batch_id}},
+                           {**update, '$push': {'write_batches': {'$each': [batch_id], '$slice': -WRITE_BATCH_HISTORY}}})
+                 for session_id, update in updates.items()],
+                ordered=False
+            )
+        except PyMongoError as e:
+            print(f"Error writing message batch of {len(batch)}: {str(e)}")
+            self.flush_errors += 1
+            return False
+        
+        if self.restore_archived is not None:
+            try:
+                self.restore_archived(list(updates))
+            except Exception as e:
+                # The sessions stay flagged archived and are rehydrated when next opened
+                print(f"Error restoring archived sessions: {str(e)}")
+        
+        self.written += len(batch)
+        self.batches += 1
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+    
+    def flush(self, timeout: Optional[float] = None, session_id: Optional[str] = None) -> bool:
+        """
+        Write everything buffered so far
+        
+        Args:
+            timeout: Seconds to wait, None to wait until done
+            session_id: Only wait for the messages of this session
+            
+        Returns:
+            True if the buffer (or the session's messages) was drained in time
+        """
+        self._check_fork()
+        
+        if session_id is not None:
+            done = lambda: not self._unwritten.get(session_id)
+        else:
+            done = lambda: not self._pending and not self._in_flight and self._retry is None
+        
+        with self._cond:
+            if done():
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(done, timeout)
+    
+    def close(self, timeout: Optional[float] = 10.0):
+        """
+        Flush buffered messages and stop the writer thread
+        
+        Args:
+            timeout: Seconds to wait for the writer thread
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        
+        if self._pid == os.getpid() and self._thread.is_alive():
+            self._thread.join(timeout)
+        
+        with self._cond:
+            # The writer is gone (or stuck); make one last synchronous attempt
+            if not self._thread.is_alive():
+                if self._retry is not None and self._write(self._retry[1], self._retry[0]):
+                    self._mark_written(self._retry[1])
+                    self._retry = None
+                if self._pending and self._retry is None:
+                    batch = list(self._pending)
+                    if self._write(batch, uuid.uuid4().hex):
+                        self._mark_written(batch)
+                        self._pending.clear()
+            unwritten = len(self._pending) + (len(self._retry[1]) if self._retry else 0)
+            if unwritten:
+                print(f"Warning: {unwritten} message(s) could not be written before shutdown")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and back-pressure counters for this process"""
+        with self._cond:
+            depth = len(self._pending) + (len(self._retry[1]) if self._retry else 0)
+            in_flight = self._in_flight
+        
+        return {
+            'queue_depth': depth,
+            'in_flight': in_flight,
+            'max_queue': self.max_queue,
+            'max_depth': self.max_depth,
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'avg_batch_size': round(self.written / self.batches, 2) if self.batches else 0.0,
+            'last_flush_ms': self.last_flush_ms,
+            'flush_errors': self.flush_errors,
+            'blocked_enqueues': self.blocked_enqueues,
+            'sync_fallbacks': self.sync_fallbacks
+        }
+
 
 class DatabaseManager:
     """Manages MongoDB connections and operations for chat history"""
     
-    def __init__(self, connection_string: str = "mongodb://127.0.0.1:27017/"):
+    def __init__(self,
+                 connection_string: str = "mongodb://127.0.0.1:27017/",
+                 write_behind: bool = False,
+                 write_batch_size: int = 100,
+                 write_flush_interval: float = 0.5,
+                 write_queue_size: int = 10000,
+                 image_store: str = 'gridfs',
+                 image_store_path: Optional[str] = None,
+                 client_options: Optional[Dict[str, Any]] = None,
+                 session_archive: str = 'mongodb',
+                 session_archive_path: Optional[str] = None,
+                 anonymous_session_ttl: Optional[float] = None):
         """
         Initialize the database connection
         
         Args:
             connection_string: MongoDB connection string
+            write_behind: Save messages through a background batching writer
+            write_batch_size: Messages per batch for the write-behind writer
+            write_flush_interval: Seconds a message may wait for its batch
+            write_queue_size: Messages buffered before save_message slows down
+            image_store: Where chat images are kept: 'gridfs' or 'filesystem'
+            image_store_path: Directory for the filesystem image store
+            client_options: MongoClient pool and timeout options (see build_client_options)
+            session_archive: Where compacted sessions are kept: 'mongodb' or 'filesystem'
+            session_archive_path: Directory for the filesystem session archive
+            anonymous_session_ttl: Seconds an archived anonymous session is kept before it
+                expires (None or 0 keeps them forever)
         """
-        self.client = MongoClient(connection_string)
-        self.db = self.client['ArticunoAI']
+        self.connection_string = connection_string
+        self.client_options = client_options if client_options is not None else build_client_options()
+        self.image_store_backend = image_store
+        self.image_store_path = image_store_path
+        self.session_archive_backend = session_archive
+        self.session_archive_path = session_archive_path
+        self.anonymous_session_ttl = anonymous_session_ttl or None
         
-        # Collections
-        self.sessions = self.db['sessions']
-        self.messages = self.db['messages']
-        self.users = self.db['users']
+        # The client is opened lazily and again in each forked worker (see _connection),
+        # and indexes are created on first use, so nothing connects before a fork
+        self._lock = threading.Lock()
+        self._pid = None
+        self._client = None
+        self._images = None
+        self._archive = None
+        self._indexes_ready = False
         
-        # Create indexes for better performance
-        self._create_indexes()
+        # Optional write-behind pipeline for save_message
+        self.write_behind = None
+        if write_behind:
+            self.write_behind = MessageWriteBehind(
+                lambda: self.db,
+                batch_size=write_batch_size,
+                flush_interval=write_flush_interval,
+                max_queue=write_queue_size,
+                restore_archived=self.restore_archived_sessions
+            )
+            # Durable shutdown: buffered messages are written before the process exits
+            atexit.register(self.close)
     
-    def _create_indexes(self):
-        """Create database indexes for optimal performance"""
-        # Index on session_id for fast lookups
-        self.messages.create_index('session_id')
+    def _connection(self) -> MongoClient:
+        """
+        Get the MongoClient of the current process, creating it on first use
+        
+        MongoClient is not fork-safe, so a worker forked by a pre-fork server (Gunicorn)
+        opens its own client and pool instead of using the one inherited from the parent.
         
-        # Index on timestamp for sorting
-        self.messages.create_index('timestamp')
+        Indexes are created on the first connection of the first process that uses the database.
+        Other threads wait for them, so no query runs before the text and unique indexes exist.
         
-        # Compound index for session queries
-        self.messages.create_index([('session_id', 1), ('timestamp', -1)])
+        Returns:
+            MongoClient for this process
+        """
+        if self._pid == os.getpid() and self._indexes_ready:
+            return self._client
         
-        # Index on user_id for user-specific queries
-        self.sessions.create_index('user_id')
-        self.sessions.create_index('created_at')
+        with self._lock:
+            if self._pid != os.getpid():
+                self._client = MongoClient(self.connection_string, **self.client_options)
+                db = self._client[DATABASE_NAME]
+                
+                # Chat images, stored once by content hash and referenced from messages
+                self._images = create_image_store(self.image_store_backend, db=db, path=self.image_store_path)
+                
+                # Cold sessions, compacted out of the messages collection
+                self._archive = create_session_archive(self.session_archive_backend, db=db,
+                                                       path=self.session_archive_path)
+                self._pid = os.getpid()
+            if not self._indexes_ready:
+                # Published only once they exist; a failure is retried on the next operation
+                self._create_indexes(self._client[DATABASE_NAME])
+                self._indexes_ready = True
+        return self._client
+    
+    @property
+    def client(self) -> MongoClient:
+        return self._connection()
+    
+    @property
+    def db(self):
+        return self._connection()[DATABASE_NAME]
+    
+    @property
+    def sessions(self):
+        return self.db['sessions']
+    
+    @property
+    def messages(self):
+        return self.db['messages']
+    
+    @property
+    def users(self):
+        return self.db['users']
+    
+    @property
+    def images(self) -> ImageStore:
+        self._connection()
+        return self._images
+    
+    @property
+    def archive(self) -> SessionArchive:
+        self._connection()
+        return self._archive
+    
+    def flush_writes(self, timeout: Optional[float] = 5.0, session_id: Optional[str] = None) -> bool:
+        """
+        Write any messages still buffered by the write-behind pipeline
+        
+        Reads call this first, for their own session and with a short timeout, so a
+        session's history includes its latest turn without a read ever waiting long
+        on a stalled writer.
+        
+        Args:
+            timeout: Seconds to wait
+            session_id: Only wait for the messages of this session
+            
+        Returns:
+            True if nothing (of the session) is left buffered
+        """
+        if self.write_behind is None:
+            return True
+        return self.write_behind.flush(timeout, session_id)
+    
+    def get_write_stats(self) -> Dict[str, Any]:
+        """
+        Get write-behind pipeline statistics
+        
+        Returns:
+            Dictionary with queue depth and back-pressure counters
+        """
+        if self.write_behind is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.write_behind.stats()}
+    
+    def _create_indexes(self, db):
+        """Create database indexes for optimal performance (on db, as this runs under the connection lock)"""
+        for collection, keys, options in INDEXES:
+            db[collection].create_index(keys, **options)
+        self._create_ttl_index(db)
+    
+    def _create_ttl_index(self, db):
+        """Create, retune or drop the TTL index that expires archived anonymous sessions"""
+        if not self.anonymous_session_ttl:
+            if ANONYMOUS_TTL_INDEX_NAME in db.sessions.index_information():
+                db.sessions.drop_index(ANONYMOUS_TTL_INDEX_NAME)
+            return
+        
+        ttl = int(self.anonymous_session_ttl)
+        try:
+            db.sessions.create_index(
+                'archived_at',
+                name=ANONYMOUS_TTL_INDEX_NAME,
+                expireAfterSeconds=ttl,
+                partialFilterExpression={'user_id': 'anonymous', 'archived': True}
+            )
+        except OperationFailure as e:
+            if e.code != INDEX_OPTIONS_CONFLICT:
+                raise
+            # The TTL changed since the index was created
+            db.command('collMod', 'sessions',
+                       index={'name': ANONYMOUS_TTL_INDEX_NAME, 'expireAfterSeconds': ttl})
     
     def create_session(self, user_id: Optional[str] = None, bot_name: str = "Articuno.AI") -> str:
         """
@@ -55,21 +1222,10 @@ class DatabaseManager:
         Returns:
             session_id: Unique session identifier
         """
-        session_id = str(uuid.uuid4())
-        
-        session_data = {
-            'session_id': session_id,
-            'user_id': user_id or 'anonymous',
-            'bot_name': bot_name,
-            'created_at': datetime.utcnow(),
-            'last_activity': datetime.utcnow(),
-            'message_count': 0,
-            'status': 'active',
-            'last_user_query': None  # Will be updated when first message is sent
-        }
+        session_data = build_session_document(user_id, bot_name)
         
         self.sessions.insert_one(session_data)
-        return session_id
+        return session_data['session_id']
     
     def save_message(self, 
                     session_id: str, 
@@ -77,7 +1233,9 @@ class DatabaseManager:
                     role: str = 'user',
                     bot_name: str = "Articuno.AI",
                     image_data: Optional[Dict] = None,
-                    response: Optional[str] = None) -> str:
+                    response: Optional[str] = None,
+                    latency_ms: Optional[float] = None,
+                    tokens: Optional[Dict[str, int]] = None) -> str:
         """
         Save a message to the database
         
@@ -88,58 +1246,154 @@ class DatabaseManager:
             bot_name: Name of the bot
             image_data: Optional image data dictionary
             response: Optional AI response (if role is 'user')
-            
+            latency_ms: Optional time the bot took to answer, in milliseconds
+            tokens: Optional token usage {'input': n, 'output': n}; estimated from the text when not given
+        
         Returns:
             message_id: Unique message identifier
         """
-        message_id = str(uuid.uuid4())
-        
-        message_data = {
-            'message_id': message_id,
-            'session_id': session_id,
-            'role': role,
-            'message': message,
-            'bot_name': bot_name,
-            'timestamp': datetime.utcnow(),
-            'image_data': image_data,
-            'response': response
-        }
+        # Keep only a reference to the image in the message
+        if image_data:
+            image_data = self.store_image(image_data)
         
-        self.messages.insert_one(message_data)
+        message_data = build_message_document(session_id, message, role, bot_name,
+                                              image_data, response, latency_ms, tokens)
+        message_id = message_data['message_id']
         
-        # Update session activity and last_user_query if this is a user message
-        update_data = {
-            '$set': {'last_activity': datetime.utcnow()},
-            '$inc': {'message_count': 1}
-        }
+        # Batched in the background when write-behind is on; written right away otherwise
+        if self.write_behind is not None and self.write_behind.enqueue(message_data):
+            return message_id
         
-        # Update last_user_query if this is a user message
-        if role == 'user':
-            update_data['$set']['last_user_query'] = message
+        self.messages.insert_one(message_data)
         
-        self.sessions.update_one(
-            {'session_id': session_id},
-            update_data
-        )
+        # Update session activity, last_user_query and stats counters
+        for update_session_id, update_data in build_session_updates([message_data]).items():
+            session = self.sessions.find_one_and_update(
+                {'session_id': update_session_id},
+                update_data,
+                projection={'_id': 0, 'archived': 1},
+                return_document=ReturnDocument.AFTER
+            )
+            # A message to an archived session (an old tab coming back) makes it live again
+            if session and session.get('archived'):
+                self.rehydrate_session(update_session_id)
         
         return message_id
     
+    def store_image(self, image_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Store a chat image in the image store
+        
+        Args:
+            image_data: Image dictionary from the chat request, with a base64 data URL
+            
+        Returns:
+            Image reference (sha256, content_type, format, size, width, height),
+            or None if the image could not be read
+        """
+        if image_data.get('sha256'):
+            # Already a reference
+            return image_data
+        
+        try:
+            return self.images.store_image_data(image_data)
+        except ValueError as e:
+            print(f"Error storing image: {str(e)}")
+            return None
+    
+    def open_image(self, image_id: str):
+        """
+        Open a stored image for streaming
+        
+        Args:
+            image_id: SHA-256 key from a message's image_data
+            
+        Returns:
+            (chunk iterator, content type, length), or None if not stored
+        """
+        return self.images.open(image_id)
+    
+    def offload_inline_images(self, batch_size: int = 100) -> int:
+        """
+        Move base64 images saved inline by older versions into the image store
+        
+        Args:
+            batch_size: Messages rewritten per bulk_write
+            
+        Returns:
+            Number of messages rewritten
+        """
+        self.flush_writes()
+        
+        cursor = self.messages.find(
+            {'image_data.data': {'$exists': True}},
+            {'_id': 1, 'image_data': 1}
+        ).batch_size(batch_size)
+        
+        updates = []
+        migrated = 0
+        for doc in cursor:
+            updates.append(UpdateOne({'_id': doc['_id']}, {'$set': {'image_data': self.store_image(doc['image_data'])}}))
+            if len(updates) >= batch_size:
+                migrated += self.messages.bulk_write(updates, ordered=False).modified_count
+                updates = []
+        if updates:
+            migrated += self.messages.bulk_write(updates, ordered=False).modified_count
+        
+        return migrated
+    
+    def get_history_page(self,
+                         session_id: str,
+                         limit: int = 50,
+                         before: Optional[str] = None,
+                         after: Optional[str] = None,
+                         fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Retrieve one page of a session's history, oldest message first
+        
+        Pages are keyed on (timestamp, _id), so each one is a bounded index range scan
+        however long the session is. Without a cursor the most recent messages are returned.
+        
+        Args:
+            session_id: Session identifier
+            limit: Maximum number of messages (capped at MAX_HISTORY_PAGE)
+            before: Cursor; return the messages just older than it
+            after: Cursor; return the messages just newer than it
+            fields: Message fields to return (subset of HISTORY_FIELDS, default all of them)
+        
+        Returns:
+            Dictionary with 'messages' (JSON-ready), 'cursors' ({'before', 'after'} of the
+            first and last message) and 'has_more' (more messages past this page)
+        
+        Raises:
+            ValueError: If a cursor or field is invalid
+        """
+        self.flush_writes(READ_FLUSH_TIMEOUT, session_id)
+        
+        history_query = build_history_query(session_id, limit, before, after, fields)
+        
+        # Opening an archived session brings its messages back first
+        if not before and not after:
+            self.rehydrate_session(session_id, only_if_archived=True)
+        
+        docs = list(self.messages.find(history_query['filter'], history_query['projection'])
+                    .sort(history_query['sort'])
+                    .limit(history_query['limit'] + 1))
+        
+        return build_history_page(docs, history_query, before, after)
+        
     def get_session_history(self, session_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
-        Retrieve chat history for a session
+        Retrieve the most recent chat history for a session
         
         Args:
             session_id: Session identifier
             limit: Maximum number of messages to retrieve
-            
+        
         Returns:
-            List of message dictionaries
+            List of message dictionaries, oldest first
         """
-        messages = self.messages.find(
-            {'session_id': session_id}
-        ).sort('timestamp', 1).limit(limit)
-        
-        return list(messages)
+        return self.get_history_page(session_id, limit=limit)['messages']
     
     def get_user_sessions(self, user_id: str = 'anonymous', limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -152,8 +1406,11 @@ class DatabaseManager:
         Returns:
             List of session dictionaries
         """
+        self.flush_writes(READ_FLUSH_TIMEOUT)
+        
         sessions = self.sessions.find(
-            {'user_id': user_id}
+            {'user_id': user_id},
+            {'write_batches': 0}
         ).sort('last_activity', -1).limit(limit)
         
         return list(sessions)
@@ -168,7 +1425,9 @@ class DatabaseManager:
         Returns:
             List of session dictionaries
         """
-        sessions = self.sessions.find().sort('last_activity', -1).limit(limit)
+        self.flush_writes(READ_FLUSH_TIMEOUT)
+        
+        sessions = self.sessions.find({}, {'write_batches': 0}).sort('last_activity', -1).limit(limit)
         return list(sessions)
     
     def end_session(self, session_id: str):
@@ -195,41 +1454,330 @@ class DatabaseManager:
         Args:
             session_id: Session identifier
         """
+        self.flush_writes(session_id=session_id)
+        
         self.messages.delete_many({'session_id': session_id})
         self.sessions.delete_one({'session_id': session_id})
+        self.archive.delete(session_id)
+    
+    def _claim_session(self, session_id: str, **conditions) -> Optional[str]:
+        """
+        Claim a session nobody else holds, so archiving and rehydrating never overlap
+        
+        Args:
+            session_id: Session identifier
+            **conditions: Further conditions the session must meet
+            
+        Returns:
+            Token of the claim, or None if the session is held or does not match
+        """
+        claim = uuid.uuid4().hex
+        now = datetime.utcnow()
+        session = self.sessions.find_one_and_update(
+            build_claim_query(session_id, now, **conditions),
+            build_claim_update(claim, now),
+            projection={'_id': 1}
+        )
+        return claim if session is not None else None
+    
+    def _renew_claim(self, session_id: str, claim: str) -> bool:
+        """Extend a claim; False if it ran out and another process took the session over"""
+        result = self.sessions.update_one({'session_id': session_id, 'archive_claim': claim},
+                                          build_claim_update(claim, datetime.utcnow()))
+        return result.matched_count > 0
+    
+    def _release_claim(self, session_id: str, claim: str):
+        """Let go of a claim if it is still held"""
+        self.sessions.update_one({'session_id': session_id, 'archive_claim': claim}, {'$unset': CLAIM_FIELDS})
+    
+    def archive_session(self, session_id: str, claim: Optional[str] = None) -> bool:
+        """
+        Move a session's messages into the session archive
+        
+        The session document stays behind as a small stub flagged archived, with its
+        stats counters, so session lists and stats keep working. If the session gets
+        a new message while it is being archived, the archive is dropped instead.
+        
+        The session is claimed until its archived messages are deleted, so a rehydrate
+        waits for the deletes instead of restoring messages that are about to go.
+        
+        Args:
+            session_id: Session identifier
+            claim: Token of a claim the caller already holds on the session
+            
+        Returns:
+            True if the session was archived
+        """
+        self.flush_writes(session_id=session_id)
+        
+        if claim is None:
+            claim = self._claim_session(session_id, archived={'$ne': True})
+            if claim is None:
+                return False
+        try:
+            return self._archive_claimed_session(session_id, claim)
+        finally:
+            self._release_claim(session_id, claim)
+    
+    def _archive_claimed_session(self, session_id: str, claim: str) -> bool:
+        """Archive a session the caller holds the claim on"""
+        session = self.sessions.find_one({'session_id': session_id, 'archive_claim': claim})
+        if session is None or session.get('archived'):
+            return False
+        
+        # Counters of sessions older than them are rebuilt while the messages are still here
+        if not session.get('stats_exact'):
+            self.rebuild_session_stats([session_id])
+            session = self.sessions.find_one({'session_id': session_id, 'archive_claim': claim})
+            if session is None or session.get('archived'):
+                return False
+        for field in CLAIM_FIELDS:
+            session.pop(field, None)
+        
+        messages = list(self.messages.find({'session_id': session_id}).sort([('timestamp', 1), ('_id', 1)]))
+        
+        archived_at = datetime.utcnow()
+        expires_at = None
+        if self.anonymous_session_ttl and session.get('user_id') == 'anonymous':
+            expires_at = archived_at + timedelta(seconds=self.anonymous_session_ttl)
+        self.archive.put(session_id, serialize_session(session, messages), expires_at=expires_at)
+        
+        # Only flag the session if nothing was written to it meanwhile
+        result = self.sessions.update_one(
+            {'session_id': session_id, 'last_activity': session['last_activity'],
+             'archived': {'$ne': True}, 'archive_claim': claim},
+            {'$set': {'archived': True, 'archived_at': archived_at, 'archived_messages': len(messages)}}
+        )
+        if result.modified_count == 0:
+            self.archive.delete(session_id)
+            return False
+        
+        message_ids = [message['_id'] for message in messages]
+        for start in range(0, len(message_ids), REHYDRATE_BATCH_SIZE):
+            # A rehydrate that took over an expired claim keeps the rest, and the archive restores them
+            if not self._renew_claim(session_id, claim):
+                break
+            self.messages.delete_many({'_id': {'$in': message_ids[start:start + REHYDRATE_BATCH_SIZE]}})
+        
+        return True
+    
+    def compact_sessions(self, cold_after: float = 86400, limit: int = 100) -> int:
+        """
+        Archive sessions that have been idle for longer than cold_after seconds
+        
+        Each session is claimed first, so compactors in several workers never archive
+        the same session at once.
+        
+        Args:
+            cold_after: Seconds of inactivity after which a session is cold
+            limit: Most sessions archived in this call
+            
+        Returns:
+            Number of sessions archived
+        """
+        self.flush_writes()
+        
+        archived = 0
+        for _ in range(limit):
+            claim = uuid.uuid4().hex
+            now = datetime.utcnow()
+            session = self.sessions.find_one_and_update(
+                {
+                    'last_activity': {'$lt': now - timedelta(seconds=cold_after)},
+                    'archived': {'$ne': True},
+                    'archive_claimed_until': {'$not': {'$gt': now}}
+                },
+                build_claim_update(claim, now),
+                projection={'_id': 0, 'session_id': 1}
+            )
+            if session is None:
+                break
+            
+            try:
+                if self.archive_session(session['session_id'], claim=claim):
+                    archived += 1
+            except Exception as e:
+                # The claim is released and a later run retries the session
+                print(f"Error archiving session {session['session_id']}: {str(e)}")
+        
+        return archived
+    
+    def rehydrate_session(self, session_id: str, only_if_archived: bool = False,
+                          wait: float = REHYDRATE_CLAIM_WAIT) -> bool:
+        """
+        Restore an archived session's messages into the messages collection
+        
+        The session is claimed while its messages are restored. If a compactor holds it,
+        this waits up to wait seconds for the compactor to finish deleting the archived
+        messages, and otherwise leaves the session archived for a later call.
+        
+        Args:
+            session_id: Session identifier
+            only_if_archived: Check the session's archived flag first (a point read on an
+                indexed field) and do nothing for live sessions
+            wait: Most seconds to wait for a claim held by another process
+            
+        Returns:
+            True if messages were restored
+        """
+        conditions = {'archived': True} if only_if_archived else {}
+        if only_if_archived and self.sessions.find_one({'session_id': session_id, **conditions},
+                                                       {'_id': 1}) is None:
+            return False
+        
+        deadline = time.monotonic() + wait
+        claim = self._claim_session(session_id, **conditions)
+        while claim is None:
+            # Gone or already restored, or still held once the wait is over
+            if (time.monotonic() >= deadline
+                    or self.sessions.find_one({'session_id': session_id, **conditions}, {'_id': 1}) is None):
+                return False
+            time.sleep(REHYDRATE_CLAIM_POLL)
+            claim = self._claim_session(session_id, **conditions)
+        
+        try:
+            payload = self.archive.get(session_id)
+            if payload is not None:
+                _, messages = deserialize_session(payload)
+                for start in range(0, len(messages), REHYDRATE_BATCH_SIZE):
+                    try:
+                        self.messages.insert_many(messages[start:start + REHYDRATE_BATCH_SIZE], ordered=False)
+                    except BulkWriteError as e:
+                        # Left behind by a compactor whose claim ran out
+                        if any(error.get('code') != DUPLICATE_KEY_ERROR
+                               for error in e.details.get('writeErrors', [])):
+                            raise
+            
+            result = self.sessions.update_one(
+                {'session_id': session_id, 'archive_claim': claim},
+                {'$unset': {'archived': '', 'archived_at': '', 'archived_messages': '', **CLAIM_FIELDS}}
+            )
+        except Exception:
+            self._release_claim(session_id, claim)
+            raise
+        
+        # The archive stays for whoever took over a claim that ran out
+        if payload is None or result.matched_count == 0:
+            return False
+        self.archive.delete(session_id)
+        return True
+    
+    def restore_archived_sessions(self, session_ids: List[str]) -> int:
+        """
+        Rehydrate the sessions among session_ids that are archived
+        
+        Called after messages are written, so a session that gets a new message is never
+        left archived, where the TTL index or the archive's expiry would drop it.
+        
+        Args:
+            session_ids: Sessions that were just written to
+            
+        Returns:
+            Number of sessions rehydrated
+        """
+        archived = self.sessions.distinct('session_id', {'session_id': {'$in': session_ids}, 'archived': True})
+        for session_id in archived:
+            self.rehydrate_session(session_id)
+        return len(archived)
+    
+    def purge_orphan_archives(self, batch_size: int = 500) -> int:
+        """
+        Drop archives whose session no longer exists (expired by the TTL index or deleted)
+        
+        Args:
+            batch_size: Archives checked per sessions query
+            
+        Returns:
+            Number of archives dropped
+        """
+        purged = 0
+        batch = []
+        
+        def purge(session_ids):
+            live = set(self.sessions.distinct('session_id', {'session_id': {'$in': session_ids}}))
+            dropped = 0
+            for session_id in session_ids:
+                if session_id not in live:
+                    self.archive.delete(session_id)
+                    dropped += 1
+            return dropped
+        
+        for session_id in self.archive.session_ids():
+            batch.append(session_id)
+            if len(batch) >= batch_size:
+                purged += purge(batch)
+                batch = []
+        if batch:
+            purged += purge(batch)
+        
+        return purged
     
     def get_session_stats(self, session_id: str) -> Dict[str, Any]:
         """
         Get statistics for a session
         
+        Counters are maintained on the session document by save_message, so this is a
+        single point read. Sessions created before the counters existed are rebuilt
+        from their messages on first read.
+        
         Args:
             session_id: Session identifier
             
         Returns:
-            Dictionary with session statistics
+            JSON-ready dictionary with session statistics
         """
-        session = self.sessions.find_one({'session_id': session_id})
+        self.flush_writes(READ_FLUSH_TIMEOUT, session_id)
+        
+        session = self.sessions.find_one({'session_id': session_id}, SESSION_STATS_PROJECTION)
         if not session:
             return {}
         
-        message_count = self.messages.count_documents({'session_id': session_id})
-        user_messages = self.messages.count_documents({'session_id': session_id, 'role': 'user'})
-        assistant_messages = self.messages.count_documents({'session_id': session_id, 'role': 'assistant'})
+        if not session.get('stats_exact'):
+            # Counters are rebuilt from the messages, so an archived session is brought back first
+            if session.get('archived'):
+                self.rehydrate_session(session_id)
+            self.rebuild_session_stats([session_id])
+            session = self.sessions.find_one({'session_id': session_id}, SESSION_STATS_PROJECTION) or session
         
-        return {
-            'session_id': session_id,
-            'bot_name': session.get('bot_name'),
-            'created_at': session.get('created_at'),
-            'last_activity': session.get('last_activity'),
-            'total_messages': message_count,
-            'user_messages': user_messages,
-            'assistant_messages': assistant_messages,
-            'status': session.get('status')
-        }
+        return format_session_stats(session_id, session)
+    
+    def rebuild_session_stats(self, session_ids: Optional[List[str]] = None, batch_size: int = 500) -> int:
+        """
+        Recompute session stats counters from the messages with one aggregation
+        
+        Backfills sessions saved before the counters existed and repairs drifted ones.
+        Messages without recorded token usage are estimated from their text. Archived
+        sessions are skipped, since their messages are in the archive.
+        
+        Args:
+            session_ids: Sessions to rebuild, or None for every session with messages
+            batch_size: Sessions updated per bulk write
+            
+        Returns:
+            Number of sessions rebuilt
+        """
+        if session_ids is None:
+            self.flush_writes()
+        else:
+            for session_id in session_ids:
+                self.flush_writes(READ_FLUSH_TIMEOUT, session_id)
+        
+        builder = SessionStatsBuilder(session_ids)
+        for row in self.messages.aggregate(build_session_stats_pipeline(session_ids), allowDiskUse=True):
+            builder.add(row)
+        
+        updates = builder.updates()
+        for start in range(0, len(updates), batch_size):
+            self.sessions.bulk_write(updates[start:start + batch_size], ordered=False)
+        
+        return len(updates)
     
     def search_messages(self, query: str, session_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
         """
-        Search for messages containing specific text
+        Search messages and responses through the text index, best matches first
+        
+        The query follows MongoDB text search: words match in any order (stemmed),
+        "quoted phrases" must appear as written and -words exclude messages.
         
         Args:
             query: Search query
@@ -237,20 +1785,57 @@ class DatabaseManager:
             limit: Maximum number of results
             
         Returns:
-            List of matching messages
+            JSON-ready results with message_id, session_id, role, bot_name, timestamp,
+            message, score, the field that matched and a highlighted snippet
+        """
+        self.flush_writes(READ_FLUSH_TIMEOUT, session_id)
+        
+        search_query = build_search_query(query, session_id, limit)
+        cursor = self.messages.find(search_query['filter'], search_query['projection']).sort(
+            search_query['sort']
+        ).limit(search_query['limit'])
+        
+        return [build_search_result(doc, search_query['terms']) for doc in cursor]
+    
+    def backfill_search_text(self, batch_size: int = 500) -> int:
+        """
+        Add the plain-text response field to messages saved before search was indexed
+        
+        Args:
+            batch_size: Messages updated per bulk write
+            
+        Returns:
+            Number of messages updated
         """
-        search_filter = {'message': {'$regex': query, '$options': 'i'}}
+        self.flush_writes()
+        
+        updated = 0
+        batch = []
+        cursor = self.messages.find(
+            {'response_text': {'$exists': False}},
+            {'response': 1}
+        ).batch_size(batch_size)
         
-        if session_id:
-            search_filter['session_id'] = session_id
+        for doc in cursor:
+            batch.append(UpdateOne({'_id': doc['_id']},
+                                   {'$set': {'response_text': html_to_text(doc.get('response'))}}))
+            if len(batch) >= batch_size:
+                updated += self.messages.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            updated += self.messages.bulk_write(batch, ordered=False).modified_count
         
-        messages = self.messages.find(search_filter).sort('timestamp', -1).limit(limit)
-        return list(messages)
+        return updated
     
     def close(self):
-        """Close the database connection"""
-        if self.client:
-            self.client.close()
+        """Flush buffered messages and close the database connection"""
+        if self.write_behind is not None:
+            self.write_behind.close()
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
     
     def __enter__(self):
         """Context manager entry"""
@@ -264,12 +1849,13 @@ class DatabaseManager:
 # Singleton instance
 _db_instance = None
 
-def get_db_manager(connection_string: str = "mongodb://127.0.0.1:27017/") -> DatabaseManager:
+def get_db_manager(connection_string: str = "mongodb://127.0.0.1:27017/", **options) -> DatabaseManager:
     """
     Get or create a DatabaseManager singleton instance
     
     Args:
         connection_string: MongoDB connection string
+        **options: Extra DatabaseManager arguments (write_behind, write_batch_size, ...)
         
     Returns:
         DatabaseManager instance
@@ -277,6 +1863,6 @@ def get_db_manager(connection_string: str = "mongodb://127.0.0.1:27017/") -> Dat
     global _db_instance
     
     if _db_instance is None:
-        _db_instance = DatabaseManager(connection_string)
+        _db_instance = DatabaseManager(connection_string, **options)
     
     return _db_instance
@@ -0,0 +1,343 @@
+"""
+Content-addressed image store for Articuno.AI
+Chat images are stored once, keyed by the SHA-256 of their bytes, so messages only
+carry a small reference instead of a base64 data URL
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import struct
+import tempfile
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import gridfs
+from gridfs.errors import FileExists, NoFile
+
+# Bytes read per chunk when streaming an image back
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Image types accepted from clients and served inline; anything else could be rendered
+# as a document (text/html, image/svg+xml) from the app's own origin
+ALLOWED_IMAGE_TYPES = ('image/png', 'image/jpeg', 'image/gif', 'image/webp')
+
+_DATA_URL_RE = re.compile(r'^data:(?P<type>[\w.+-]+/[\w.+-]+)?(?:;[^,;]*)*?;base64,', re.IGNORECASE)
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def is_image_id(image_id: str) -> bool:
+    """Whether a string looks like an image key (lowercase hex SHA-256)"""
+    return bool(image_id and _SHA256_RE.match(image_id))
+
+
+def parse_data_url(data_url: str) -> Tuple[Optional[str], bytes]:
+    """
+    Decode a base64 data URL, e.g. "data:image/png;base64,iVBOR..."
+
+    Args:
+        data_url: Data URL (or bare base64)
+
+    Returns:
+        (content type or None, decoded bytes)
+
+    Raises:
+        ValueError: If the payload is not valid base64
+    """
+    match = _DATA_URL_RE.match(data_url)
+    content_type = match.group('type') if match else None
+    payload = data_url[match.end():] if match else data_url
+    try:
+        return content_type, base64.b64decode(payload, validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid image data: {str(e)}")
+
+
+def read_image_data(image_data: Dict[str, Any]) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Decode a chat image and describe it for the message reference
+
+    Args:
+        image_data: Image dictionary from the chat request ({'data': data URL, 'format': ...})
+
+    Returns:
+        (image bytes, reference fields without the sha256: content_type, format, size
+        and width/height when known)
+
+    Raises:
+        ValueError: If the image data is missing, not valid base64, or not a PNG, JPEG,
+            GIF or WebP image matching its declared type
+    """
+    declared_type, data = parse_data_url(image_data.get('data') or '')
+    if not data:
+        raise ValueError("Image data is empty")
+
+    # The type is taken from the bytes, never from the client
+    content_type = sniff_image_type(data)
+    if content_type is None:
+        raise ValueError("Unsupported image type (expected PNG, JPEG, GIF or WebP)")
+    if declared_type:
+        declared_type = declared_type.lower().replace('image/jpg', 'image/jpeg')
+        if declared_type != content_type:
+            raise ValueError(f"Image data is {content_type}, not {declared_type}")
+
+    reference = {
+        'content_type': content_type,
+        'format': content_type.split('/')[-1],
+        'size': len(data)
+    }
+
+    dimensions = image_dimensions(data)
+    if dimensions:
+        reference['width'], reference['height'] = dimensions
+
+    return data, reference
+
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    """
+    Identify an allowed image type from the file's leading magic bytes
+
+    Args:
+        data: Image bytes
+
+    Returns:
+        One of ALLOWED_IMAGE_TYPES, or None if the bytes are not a PNG, JPEG, GIF or WebP
+    """
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read width and height from a PNG, GIF, JPEG or WebP header
+
+    Args:
+        data: Image bytes
+
+    Returns:
+        (width, height), or None if the format is not recognized
+    """
+    try:
+        if data[:8] == b'\x89PNG\r\n\x1a\n':
+            return struct.unpack('>II', data[16:24])
+        if data[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', data[6:10])
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            chunk = data[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', data[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b'VP8L':
+                bits = struct.unpack('<I', data[21:25])[0]
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b'VP8X':
+                return (int.from_bytes(data[24:27], 'little') + 1,
+                        int.from_bytes(data[27:30], 'little') + 1)
+        if data[:2] == b'\xff\xd8':
+            # Walk the JPEG segments up to the first start-of-frame marker
+            offset = 2
+            while offset + 9 < len(data):
+                if data[offset] != 0xFF:
+                    return None
+                marker = data[offset + 1]
+                if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                    offset += 2
+                    continue
+                length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+                if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+                    return width, height
+                offset += 2 + length
+    except struct.error:
+        pass
+    return None
+
+
+class ImageStore:
+    """Interface for image blob storage"""
+
+    def exists(self, image_id: str) -> bool:
+        raise NotImplementedError
+
+    def _write(self, image_id: str, data: bytes, content_type: str):
+        raise NotImplementedError
+
+    def open(self, image_id: str) -> Optional[Tuple[Iterator[bytes], str, int]]:
+        """
+        Open a stored image for streaming
+
+        Args:
+            image_id: SHA-256 key
+
+        Returns:
+            (chunk iterator, content type, length in bytes), or None if not stored
+        """
+        raise NotImplementedError
+
+    def put(self, data: bytes, content_type: str = 'application/octet-stream') -> str:
+        """
+        Store image bytes once
+
+        Args:
+            data: Image bytes
+            content_type: MIME type served back with the image
+
+        Returns:
+            SHA-256 key of the image
+        """
+        image_id = hashlib.sha256(data).hexdigest()
+        if not self.exists(image_id):
+            self._write(image_id, data, content_type)
+        return image_id
+
+    def store_image_data(self, image_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Store a chat image and build the reference saved with the message
+
+        Args:
+            image_data: Image dictionary from the chat request ({'data': data URL, 'format': ...})
+
+        Returns:
+            Reference with sha256, content_type, format, size and width/height when known
+        """
+        data, reference = read_image_data(image_data)
+        return {'sha256': self.put(data, reference['content_type']), **reference}
+
+
+class GridFSImageStore(ImageStore):
+    """Images in a GridFS bucket of the chat database, with the SHA-256 as file _id"""
+
+    def __init__(self, db, bucket_name: str = 'images'):
+        """
+        Initialize the store
+
+        Args:
+            db: pymongo Database
+            bucket_name: GridFS bucket name
+        """
+        self.bucket = gridfs.GridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f"{bucket_name}.files"]
+
+    def exists(self, image_id: str) -> bool:
+        return self.files.find_one({'_id': image_id}, {'_id': 1}) is not None
+
+    def _write(self, image_id: str, data: bytes, content_type: str):
+        try:
+            self.bucket.upload_from_stream_with_id(image_id, image_id, data,
+                                                   metadata={'content_type': content_type})
+        except FileExists:
+            # Stored concurrently by another request
+            pass
+
+    def open(self, image_id: str) -> Optional[Tuple[Iterator[bytes], str, int]]:
+        try:
+            grid_out = self.bucket.open_download_stream(image_id)
+        except NoFile:
+            return None
+
+        def chunks():
+            try:
+                while True:
+                    chunk = grid_out.readchunk()
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                grid_out.close()
+
+        content_type = (grid_out.metadata or {}).get('content_type', 'application/octet-stream')
+        return chunks(), content_type, grid_out.length
+
+
+class FileImageStore(ImageStore):
+    """Images as files under a local directory, sharded by the first two hex digits"""
+
+    def __init__(self, root: str):
+        """
+        Initialize the store
+
+        Args:
+            root: Directory holding the images
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, image_id: str) -> str:
+        return os.path.join(self.root, image_id[:2], image_id)
+
+    def exists(self, image_id: str) -> bool:
+        return os.path.isfile(self._path(image_id))
+
+    def _write(self, image_id: str, data: bytes, content_type: str):
+        path = self._path(image_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # The type goes first, so an image that exists always has one
+        with open(path + '.type', 'w', encoding='utf-8') as f:
+            f.write(content_type)
+
+        # Write under a temporary name so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def open(self, image_id: str) -> Optional[Tuple[Iterator[bytes], str, int]]:
+        path = self._path(image_id)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+        try:
+            with open(path + '.type', encoding='utf-8') as type_file:
+                content_type = type_file.read().strip()
+        except OSError:
+            content_type = 'application/octet-stream'
+
+        def chunks():
+            with f:
+                while True:
+                    chunk = f.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return chunks(), content_type, os.fstat(f.fileno()).st_size
+
+
+def create_image_store(backend: str = 'gridfs', db=None, path: Optional[str] = None) -> ImageStore:
+    """
+    Create an ImageStore
+
+    Args:
+        backend: 'gridfs' (needs db) or 'filesystem' (needs path)
+        db: pymongo Database for the gridfs backend
+        path: Directory for the filesystem backend
+
+    Returns:
+        ImageStore instance
+    """
+    if backend == 'gridfs':
+        if db is None:
+            raise ValueError("The gridfs image store needs a database")
+        return GridFSImageStore(db)
+    if backend == 'filesystem':
+        if not path:
+            raise ValueError("The filesystem image store needs a path")
+        return FileImageStore(path)
+    raise ValueError(f"Unknown image store backend: {backend}")
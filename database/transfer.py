@@ -0,0 +1,225 @@
+"""
+Bulk export and import of chat history for Articuno.AI
+History is streamed as NDJSON, one record per line: each session is followed by its
+messages and the images they reference. Values are canonical extended JSON, so
+ObjectIds, datetimes and binary data survive the round trip exactly.
+"""
+
+import base64
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from bson import json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from pymongo.errors import BulkWriteError
+
+from .archive import deserialize_session
+from .db_manager import DUPLICATE_KEY_ERROR, READ_FLUSH_TIMEOUT
+
+# Documents fetched per cursor round trip while exporting, and inserted per batch while importing
+TRANSFER_BATCH_SIZE = 500
+
+# Record types of an export
+RECORD_TYPES = ('session', 'message', 'image')
+
+# Session fields that only describe the archive a session is in, not the session itself
+ARCHIVE_FIELDS = ('archived', 'archived_at', 'archived_messages', 'archive_claim', 'archive_claimed_until')
+
+
+def _record_line(record_type: str, data: Dict[str, Any]) -> bytes:
+    return (json_util.dumps({'type': record_type, 'data': data}, json_options=CANONICAL_JSON_OPTIONS) + '\n').encode('utf-8')
+
+
+def export_history(db_manager,
+                   session_ids: Optional[List[str]] = None,
+                   user_id: Optional[str] = None,
+                   since: Optional[datetime] = None,
+                   include_images: bool = True,
+                   batch_size: int = TRANSFER_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Stream chat history as NDJSON lines
+
+    Sessions and messages are read through batched cursors, so memory stays flat
+    however much history there is. Messages of archived sessions are read from the
+    session archive and exported as live messages.
+
+    Args:
+        db_manager: DatabaseManager to export from
+        session_ids: Optional sessions to export
+        user_id: Optional user whose sessions are exported
+        since: Optional; only sessions active at or after this time
+        include_images: Also export the image blobs messages refer to
+        batch_size: Documents per cursor batch
+
+    Returns:
+        Iterator of NDJSON lines (bytes, newline-terminated)
+    """
+    db_manager.flush_writes(READ_FLUSH_TIMEOUT)
+
+    session_filter = {}
+    if session_ids is not None:
+        session_filter['session_id'] = {'$in': session_ids}
+    if user_id:
+        session_filter['user_id'] = user_id
+    if since:
+        session_filter['last_activity'] = {'$gte': since}
+
+    sessions = db_manager.sessions.find(session_filter).sort('_id', 1).batch_size(batch_size)
+    for session in sessions:
+        archived = session.get('archived')
+        for field in ARCHIVE_FIELDS:
+            session.pop(field, None)
+        yield _record_line('session', session)
+
+        if archived:
+            payload = db_manager.archive.get(session['session_id'])
+            messages = iter(deserialize_session(payload)[1] if payload else [])
+        else:
+            messages = db_manager.messages.find({'session_id': session['session_id']}) \
+                .sort([('timestamp', 1), ('_id', 1)]).batch_size(batch_size)
+
+        # Images are written once per session, before the first message that uses them
+        exported_images = set()
+        for message in messages:
+            image_id = (message.get('image_data') or {}).get('sha256')
+            if include_images and image_id and image_id not in exported_images:
+                exported_images.add(image_id)
+                stored = db_manager.open_image(image_id)
+                if stored is not None:
+                    chunks, content_type, _ = stored
+                    yield _record_line('image', {
+                        'sha256': image_id,
+                        'content_type': content_type,
+                        'data': base64.b64encode(b''.join(chunks)).decode('ascii')
+                    })
+            yield _record_line('message', message)
+
+
+def read_checkpoint(checkpoint_path: Optional[str]) -> int:
+    """
+    Read the number of input lines a previous import already committed
+
+    Args:
+        checkpoint_path: Checkpoint file, or None
+
+    Returns:
+        Line count (0 without a checkpoint)
+    """
+    if not checkpoint_path:
+        return 0
+    try:
+        with open(checkpoint_path, encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(checkpoint_path: Optional[str], lines: int):
+    """Atomically record that the first `lines` input lines are committed"""
+    if not checkpoint_path:
+        return
+    directory = os.path.dirname(os.path.abspath(checkpoint_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(str(lines))
+    os.replace(temp_path, checkpoint_path)
+
+
+def insert_ordered(collection, docs: List[Dict[str, Any]]) -> int:
+    """
+    Insert documents with ordered insert_many, skipping ones that already exist
+
+    Args:
+        collection: pymongo collection
+        docs: Documents with their _id
+
+    Returns:
+        Number of documents inserted
+    """
+    inserted = 0
+    while docs:
+        try:
+            collection.insert_many(docs, ordered=True)
+            return inserted + len(docs)
+        except BulkWriteError as e:
+            details = e.details or {}
+            errors = details.get('writeErrors', [])
+            if details.get('writeConcernErrors') or not errors or errors[0].get('code') != DUPLICATE_KEY_ERROR:
+                raise
+            # An ordered batch stops at its first error: skip the duplicate and carry on after it
+            failed = errors[0]['index']
+            inserted += details.get('nInserted', failed)
+            docs = docs[failed + 1:]
+    return inserted
+
+
+def import_history(db_manager,
+                   lines: Iterable[bytes],
+                   checkpoint_path: Optional[str] = None,
+                   batch_size: int = TRANSFER_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Load NDJSON written by export_history
+
+    Records are inserted in ordered insert_many batches. After each batch the number
+    of committed input lines is saved to checkpoint_path, so an interrupted import
+    run again with the same checkpoint skips straight to where it stopped. Records
+    that already exist (same _id) are skipped.
+
+    Args:
+        db_manager: DatabaseManager to import into
+        lines: NDJSON lines (for example an open file)
+        checkpoint_path: Optional checkpoint file for resuming
+        batch_size: Records per insert batch
+
+    Returns:
+        Counters: sessions, messages and images imported, lines skipped from the checkpoint
+
+    Raises:
+        ValueError: On a malformed line (the checkpoint still covers every batch before it)
+    """
+    db_manager.flush_writes()
+
+    committed = read_checkpoint(checkpoint_path)
+    counts = {'sessions': 0, 'messages': 0, 'images': 0, 'resumed_after': committed}
+    sessions, messages = [], []
+    line_number = 0
+
+    def flush():
+        # Sessions go first, so a message is never stored without its session
+        counts['sessions'] += insert_ordered(db_manager.sessions, sessions) if sessions else 0
+        counts['messages'] += insert_ordered(db_manager.messages, messages) if messages else 0
+        sessions.clear()
+        messages.clear()
+        write_checkpoint(checkpoint_path, line_number)
+
+    for line_number, line in enumerate(lines, start=1):
+        if line_number <= committed or not line.strip():
+            continue
+
+        try:
+            record = json_util.loads(line)
+            record_type, data = record['type'], record['data']
+            if record_type not in RECORD_TYPES:
+                raise ValueError(f"unknown record type {record_type}")
+        except (ValueError, KeyError, TypeError) as e:
+            # Commit what came before the bad line, so a fixed file resumes right at it
+            bad_line = line_number
+            line_number -= 1
+            flush()
+            raise ValueError(f"Malformed record on line {bad_line}: {str(e)}")
+
+        if record_type == 'session':
+            sessions.append(data)
+        elif record_type == 'message':
+            messages.append(data)
+        else:
+            db_manager.images.put(base64.b64decode(data['data']), data.get('content_type') or 'application/octet-stream')
+            counts['images'] += 1
+
+        if len(sessions) + len(messages) >= batch_size:
+            flush()
+
+    flush()
+    return counts
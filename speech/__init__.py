@@ -0,0 +1,39 @@
+"""
+Speech package for Articuno.AI voice input
+"""
+
+from .transcoder import (
+    AudioDecodeError,
+    SAMPLE_RATE,
+    SAMPLE_WIDTH,
+    decode_to_pcm,
+    get_ffmpeg_path,
+    sniff_container
+)
+from .engines import (
+    GoogleEngine,
+    SpeechNotRecognizedError,
+    TranscriptionEngine,
+    TranscriptionServiceError,
+    VoskEngine,
+    get_transcription_engine
+)
+from .jobs import QueueFullError, TranscriptionJob, TranscriptionJobQueue
+
+__all__ = [
+    'AudioDecodeError',
+    'SAMPLE_RATE',
+    'SAMPLE_WIDTH',
+    'decode_to_pcm',
+    'get_ffmpeg_path',
+    'sniff_container',
+    'GoogleEngine',
+    'SpeechNotRecognizedError',
+    'TranscriptionEngine',
+    'TranscriptionServiceError',
+    'VoskEngine',
+    'get_transcription_engine',
+    'QueueFullError',
+    'TranscriptionJob',
+    'TranscriptionJobQueue'
+]
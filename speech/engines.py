@@ -0,0 +1,154 @@
+"""
+Speech recognition engines for Articuno.AI voice input
+
+Engines turn the PCM produced by speech/transcoder.py into text. 'google' sends
+it to the Google Web Speech API; 'vosk' recognizes it locally on the CPU with a
+downloaded Vosk model (https://alphacephei.com/vosk/models), so no audio leaves
+the server and there is no network round-trip.
+"""
+
+import json
+import os
+import threading
+
+import speech_recognition as sr
+
+from .transcoder import SAMPLE_RATE, SAMPLE_WIDTH
+
+# Bytes of PCM fed to a local recognizer at a time (one second of audio)
+VOSK_CHUNK_BYTES = SAMPLE_RATE * SAMPLE_WIDTH
+
+
+class SpeechNotRecognizedError(Exception):
+    """Raised when the audio holds no recognizable speech"""
+
+    def __init__(self, message="Speech Recognition could not understand the audio"):
+        super().__init__(message)
+
+
+class TranscriptionServiceError(Exception):
+    """Raised when the recognition service cannot be reached or fails"""
+    pass
+
+
+class TranscriptionEngine:
+    """Interface for speech recognition engines"""
+
+    name = "base"
+
+    def transcribe(self, pcm_data: bytes) -> str:
+        """
+        Recognize speech
+
+        Args:
+            pcm_data: 16 kHz mono signed 16-bit little-endian samples
+
+        Returns:
+            The transcribed text
+
+        Raises:
+            SpeechNotRecognizedError: If no speech was recognized
+            TranscriptionServiceError: If the engine failed
+        """
+        raise NotImplementedError
+
+
+class GoogleEngine(TranscriptionEngine):
+    """Google Web Speech API through SpeechRecognition (remote)"""
+
+    name = "google"
+
+    def __init__(self, language: str = "en-US"):
+        """
+        Initialize the engine
+
+        Args:
+            language: BCP-47 language tag of the speech
+        """
+        self.language = language
+
+    def transcribe(self, pcm_data: bytes) -> str:
+        recognizer = sr.Recognizer()
+        try:
+            return recognizer.recognize_google(sr.AudioData(pcm_data, SAMPLE_RATE, SAMPLE_WIDTH), language=self.language)
+        except sr.UnknownValueError:
+            raise SpeechNotRecognizedError()
+        except sr.RequestError as e:
+            raise TranscriptionServiceError(f"Could not request results from Speech Recognition service: {str(e)}")
+
+
+class VoskEngine(TranscriptionEngine):
+    """Offline recognition with a local Vosk (Kaldi) model"""
+
+    name = "vosk"
+
+    def __init__(self, model_path: str):
+        """
+        Load the model
+
+        Args:
+            model_path: Directory of an unpacked Vosk model, e.g. vosk-model-small-en-us-0.15
+        """
+        try:
+            import vosk
+        except ImportError:
+            raise ValueError("The vosk speech engine needs the vosk package: pip install vosk")
+
+        if not model_path or not os.path.isdir(model_path):
+            raise ValueError(f"Vosk model directory not found: {model_path}. Set VOSK_MODEL_PATH.")
+
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        # The model is read-only and shared by all worker threads; recognizers are per clip
+        self._model = vosk.Model(model_path)
+
+    def transcribe(self, pcm_data: bytes) -> str:
+        try:
+            recognizer = self._vosk.KaldiRecognizer(self._model, SAMPLE_RATE)
+
+            # Each completed utterance is returned by Result(), the tail by FinalResult()
+            segments = []
+            for offset in range(0, len(pcm_data), VOSK_CHUNK_BYTES):
+                if recognizer.AcceptWaveform(pcm_data[offset:offset + VOSK_CHUNK_BYTES]):
+                    segments.append(json.loads(recognizer.Result()).get("text", ""))
+            segments.append(json.loads(recognizer.FinalResult()).get("text", ""))
+        except Exception as e:
+            raise TranscriptionServiceError(f"Local speech recognition failed: {str(e)}")
+
+        text = " ".join(segment for segment in segments if segment).strip()
+        if not text:
+            raise SpeechNotRecognizedError()
+        return text
+
+
+# Singleton instance
+_engine_instance = None
+_engine_lock = threading.Lock()
+
+def get_transcription_engine(engine: str = "google",
+                             language: str = "en-US",
+                             model_path: str = None) -> TranscriptionEngine:
+    """
+    Get or create a TranscriptionEngine singleton instance
+
+    Args:
+        engine: 'google' (remote) or 'vosk' (offline, needs model_path)
+        language: Speech language for the google engine
+        model_path: Vosk model directory for the vosk engine
+
+    Returns:
+        TranscriptionEngine instance
+    """
+    global _engine_instance
+
+    if _engine_instance is None:
+        with _engine_lock:
+            if _engine_instance is None:
+                if engine == "google":
+                    _engine_instance = GoogleEngine(language)
+                elif engine == "vosk":
+                    _engine_instance = VoskEngine(model_path)
+                else:
+                    raise ValueError(f"Unknown speech engine: {engine}")
+
+    return _engine_instance
@@ -0,0 +1,142 @@
+"""
+Transcription job queue for Articuno.AI voice input
+
+Clips are decoded and recognized on a fixed pool of worker threads instead of
+the web worker that received them. The number of waiting clips is capped, so a
+burst of voice input is rejected early instead of piling up, and every clip gets
+a job id its result can be polled or streamed by.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when too many clips are already waiting"""
+    pass
+
+
+class TranscriptionJob:
+    """A clip submitted for transcription"""
+
+    def __init__(self, job_id: str, future: Future):
+        self.id = job_id
+        self.future = future
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        """'queued', 'running', 'done' or 'error'"""
+        if not self.future.done():
+            return "running" if self.future.running() else "queued"
+        return "error" if self.future.exception() is not None else "done"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable job state"""
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+        if job["status"] == "done":
+            job["transcription"] = self.future.result()
+        elif job["status"] == "error":
+            job["error"] = str(self.future.exception())
+        return job
+
+
+class TranscriptionJobQueue:
+    """Bounded worker pool running transcriptions, with results kept for polling"""
+
+    def __init__(self,
+                 handler: Callable[[bytes], str],
+                 workers: int = 2,
+                 max_queue: int = 16,
+                 result_ttl: float = 300):
+        """
+        Initialize the queue
+
+        Args:
+            handler: Turns an uploaded clip into text, raising on failure
+            workers: Clips transcribed at the same time
+            max_queue: Clips allowed to wait for a free worker
+            result_ttl: Seconds finished jobs stay available for polling
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+
+        self.submitted = 0
+        self.rejected = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe")
+        self._jobs: "OrderedDict[str, TranscriptionJob]" = OrderedDict()
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        """Forget finished jobs older than result_ttl"""
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _finished(self, job: TranscriptionJob):
+        with self._lock:
+            job.finished_at = time.time()
+            self._active -= 1
+
+    def submit(self, audio_data: bytes) -> TranscriptionJob:
+        """
+        Queue a clip for transcription
+
+        Args:
+            audio_data: Uploaded audio file
+
+        Returns:
+            The queued job
+
+        Raises:
+            QueueFullError: If max_queue clips are already waiting
+        """
+        with self._lock:
+            self._prune(time.time())
+            if self._active >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise QueueFullError("Too many voice clips are waiting to be transcribed, please try again shortly")
+
+            self._active += 1
+            self.submitted += 1
+            job = TranscriptionJob(uuid.uuid4().hex, self._executor.submit(self.handler, audio_data))
+            self._jobs[job.id] = job
+
+        job.future.add_done_callback(lambda _: self._finished(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        """Return a job by id, or None if it is unknown or expired"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and counters for this process"""
+        with self._lock:
+            active = self._active
+            tracked = len(self._jobs)
+
+        return {
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'active': active,
+            'queued': max(0, active - self.workers),
+            'tracked_jobs': tracked,
+            'submitted': self.submitted,
+            'rejected': self.rejected
+        }
@@ -0,0 +1,163 @@
+"""
+In-memory audio transcoding for Articuno.AI voice input
+
+Uploads are decoded once, straight to the 16 kHz mono 16-bit PCM that speech
+recognition expects. The container is sniffed from its magic bytes, so ffmpeg
+does not have to probe for it, and audio goes through ffmpeg's stdin/stdout
+without touching the disk. WAV uploads that are already in the target format
+skip ffmpeg entirely.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import threading
+import wave
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Format handed to the recognizer
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # bytes, signed 16-bit little endian
+CHANNELS = 1
+
+# Seconds ffmpeg may spend on one clip
+TRANSCODE_TIMEOUT = float(os.getenv("TRANSCODE_TIMEOUT", "30"))
+
+# Common install locations on Windows, checked when ffmpeg is not on PATH
+WINDOWS_FFMPEG_PATHS = [
+    r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
+    r"C:\ffmpeg\bin\ffmpeg.exe",
+    os.path.expanduser("~") + r"\ffmpeg\bin\ffmpeg.exe"
+]
+
+
+class AudioDecodeError(Exception):
+    """Raised when an upload cannot be decoded to PCM"""
+    pass
+
+
+def sniff_container(data: bytes) -> Optional[str]:
+    """
+    Identify the audio container from its magic bytes
+
+    Args:
+        data: Start of the uploaded file
+
+    Returns:
+        ffmpeg demuxer name, or None if the format is not recognized
+    """
+    head = data[:12]
+
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "matroska"  # WebM (Chrome/Firefox MediaRecorder) and MKV
+    if head.startswith(b"OggS"):
+        return "ogg"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "wav"
+    if head.startswith(b"fLaC"):
+        return "flac"
+    if head[4:8] == b"ftyp":
+        return "mov"  # MP4/M4A (Safari MediaRecorder)
+    if head.startswith(b"ID3"):
+        return "mp3"
+    if len(head) >= 2 and head[0] == 0xFF:
+        if head[1] & 0xF6 == 0xF0:
+            return "aac"  # ADTS, layer bits 00
+        if head[1] & 0xE0 == 0xE0:
+            return "mp3"  # MPEG audio frame sync
+    return None
+
+
+# Resolved ffmpeg executable
+_ffmpeg_path = None
+_ffmpeg_lock = threading.Lock()
+
+def get_ffmpeg_path() -> str:
+    """
+    Locate ffmpeg: FFMPEG_PATH, then PATH, then the usual Windows install folders
+
+    Returns:
+        Path of the ffmpeg executable
+
+    Raises:
+        AudioDecodeError: If ffmpeg cannot be found
+    """
+    global _ffmpeg_path
+
+    if _ffmpeg_path is None:
+        with _ffmpeg_lock:
+            if _ffmpeg_path is None:
+                candidates = [os.getenv("FFMPEG_PATH"), shutil.which("ffmpeg")] + WINDOWS_FFMPEG_PATHS
+                path = next((c for c in candidates if c and os.path.isfile(c)), None)
+                if path is None:
+                    raise AudioDecodeError("FFmpeg not found. Install it or set FFMPEG_PATH.")
+                print(f"FFmpeg found at: {path}")
+                _ffmpeg_path = path
+
+    return _ffmpeg_path
+
+
+def _read_target_wav(data: bytes) -> Optional[bytes]:
+    """Frames of a WAV file already at SAMPLE_RATE/SAMPLE_WIDTH/CHANNELS, else None"""
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            if (wav.getframerate(), wav.getsampwidth(), wav.getnchannels()) != (SAMPLE_RATE, SAMPLE_WIDTH, CHANNELS):
+                return None
+            return wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        # Compressed or unusual WAV variants are left to ffmpeg
+        return None
+
+
+def decode_to_pcm(data: bytes) -> bytes:
+    """
+    Decode an uploaded clip to raw PCM in memory
+
+    Args:
+        data: Uploaded audio file
+
+    Returns:
+        16 kHz mono signed 16-bit little-endian samples
+
+    Raises:
+        AudioDecodeError: If the clip cannot be decoded or holds no audio
+    """
+    container = sniff_container(data)
+
+    if container == "wav":
+        frames = _read_target_wav(data)
+        if frames:
+            return frames
+
+    command = [get_ffmpeg_path(), "-hide_banner", "-loglevel", "error"]
+    if container:
+        command += ["-f", container]
+    command += [
+        "-i", "pipe:0",
+        "-vn",
+        "-ac", str(CHANNELS),
+        "-ar", str(SAMPLE_RATE),
+        "-acodec", "pcm_s16le",
+        "-f", "s16le",
+        "pipe:1"
+    ]
+
+    try:
+        result = subprocess.run(command, input=data, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise AudioDecodeError(f"FFmpeg did not finish within {TRANSCODE_TIMEOUT}s")
+    except OSError as e:
+        raise AudioDecodeError(f"Could not run FFmpeg: {str(e)}")
+
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", errors="replace").strip()[-500:]
+        raise AudioDecodeError(f"FFmpeg could not decode {container or 'unknown'} audio: {message}")
+    if not result.stdout:
+        raise AudioDecodeError("No audio found in the uploaded file")
+
+    return result.stdout
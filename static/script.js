@@ -1246,7 +1246,8 @@ function addMessageToHistory(message, isUser = false, image = null, targetChatHi
         imageContainer.className = "message-image-container";
 
         const messageImage = document.createElement("img");
-        messageImage.src = image.dataUrl;
+        // New uploads carry a data URL; saved history references the stored image by hash
+        messageImage.src = image.dataUrl || (image.sha256 ? `/api/images/${image.sha256}` : image.data);
         messageImage.className = "message-image";
         messageImage.alt = "Uploaded image";
 
@@ -5,6 +5,8 @@ Run this to verify your MongoDB setup is working correctly
 
 import sys
 import os
+import threading
+import time
 from datetime import datetime
 
 # Add parent directory to path
@@ -127,6 +129,51 @@ def test_search(db):
         print(f"✗ Failed to search messages: {e}")
         return False
 
+def test_archive_rehydrate_race(db):
+    """Test that a rehydrate during archiving never loses messages"""
+    print("\n--- Testing Archive / Rehydrate Interleaving ---")
+    session_id = None
+    renew_claim = db._renew_claim
+    try:
+        session_id = db.create_session(user_id="test_user", bot_name="Test Bot")
+        for i in range(5):
+            db.save_message(session_id=session_id, message=f"Archive test message {i}",
+                            role="user", bot_name="Test Bot")
+        db.flush_writes()
+        
+        # Rehydrate between the archiver's delete batches
+        deleting = threading.Event()
+        def renew_slowly(claimed_session_id, claim):
+            deleting.set()
+            time.sleep(0.2)
+            return renew_claim(claimed_session_id, claim)
+        db._renew_claim = renew_slowly
+        
+        archiver = threading.Thread(target=db.archive_session, args=(session_id,))
+        archiver.start()
+        if not deleting.wait(5):
+            print("✗ Session was not archived")
+            return False
+        db.rehydrate_session(session_id, only_if_archived=True)
+        archiver.join()
+        db._renew_claim = renew_claim
+        
+        # Restore whatever is left archived, as opening the session would
+        db.rehydrate_session(session_id, only_if_archived=True)
+        history = db.get_session_history(session_id)
+        if len(history) != 5:
+            print(f"✗ Expected 5 messages after rehydrating, found {len(history)}")
+            return False
+        print("✓ No messages lost when rehydrating during archiving")
+        return True
+    except Exception as e:
+        print(f"✗ Failed archive / rehydrate test: {e}")
+        return False
+    finally:
+        db._renew_claim = renew_claim
+        if session_id:
+            db.delete_session(session_id)
+
 def cleanup(db, session_id):
     """Clean up test data"""
     print("\n--- Cleaning Up Test Data ---")
@@ -160,6 +207,7 @@ def main():
     test_list_sessions(db)
     test_session_stats(db, session_id)
     test_search(db)
+    test_archive_rehydrate_race(db)
     
     # Ask before cleanup
     print("\n" + "=" * 60)